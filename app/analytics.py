@@ -0,0 +1,107 @@
+"""Spending statistics computed with NumPy over a user's daily per-category totals."""
+import calendar
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta
+
+PERCENTILES = (50, 75, 90, 95)
+CACHE_SIZE = 256
+
+# (user_id, data_version, budget, params...) -> result; see repo.touch_data_version
+_cache: OrderedDict = OrderedDict()
+_lock = threading.Lock()  # endpoints call this from the threadpool
+
+
+def cached(key: tuple, compute):
+    """compute() runs outside the lock; two threads missing the same key both compute it."""
+    with _lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+    result = compute()
+    with _lock:
+        _cache[key] = result
+        if len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return result
+
+
+def _rolling_mean(x, window: int):
+    """Trailing mean; the first window-1 days average over the days available."""
+    import numpy as np
+
+    csum = np.cumsum(x, dtype=np.float64)
+    out = csum.copy()
+    out[window:] = csum[window:] - csum[:-window]
+    counts = np.minimum(np.arange(1, len(x) + 1), window)
+    return out / counts
+
+
+def compute(
+    rows: list[tuple[date, str, int]],
+    start: date,
+    today: date,
+    budget: int | None,
+    series_days: int,
+) -> dict:
+    """`rows` are (day, category, total) for start..today, as returned by
+    repo.get_daily_category_totals."""
+    import numpy as np
+
+    n_days = (today - start).days + 1
+    categories = sorted({name for _, name, _ in rows})
+    cat_index = {name: i for i, name in enumerate(categories)}
+
+    # days × categories matrix of totals
+    matrix = np.zeros((n_days, len(categories)), dtype=np.int64)
+    if rows:
+        day_idx = np.fromiter(((d - start).days for d, _, _ in rows), dtype=np.int64, count=len(rows))
+        cat_idx = np.fromiter((cat_index[name] for _, name, _ in rows), dtype=np.int64, count=len(rows))
+        amounts = np.fromiter((total for _, _, total in rows), dtype=np.int64, count=len(rows))
+        np.add.at(matrix, (day_idx, cat_idx), amounts)
+    daily = matrix.sum(axis=1)
+
+    avg7 = _rolling_mean(daily, 7)
+    avg30 = _rolling_mean(daily, 30)
+    first = max(n_days - series_days, 0)
+    series = [
+        {"date": (start + timedelta(days=i)).isoformat(), "total": int(daily[i]),
+         "avg_7d": round(float(avg7[i])), "avg_30d": round(float(avg30[i]))}
+        for i in range(first, n_days)
+    ]
+
+    # Month-to-date vs the same days of the previous month
+    month_start = today.replace(day=1)
+    prev_start = (month_start - timedelta(days=1)).replace(day=1)
+    prev_len = min(today.day, calendar.monthrange(prev_start.year, prev_start.month)[1])
+    cur = matrix[(month_start - start).days:].sum(axis=0)
+    p0 = (prev_start - start).days
+    prev = matrix[p0:p0 + prev_len].sum(axis=0)
+    order = np.argsort(-cur, kind="stable")
+    month_over_month = [
+        {"category_name": categories[i], "current": int(cur[i]), "previous": int(prev[i]),
+         "delta": int(cur[i] - prev[i]),
+         "delta_pct": round(float((cur[i] - prev[i]) / prev[i] * 100), 1) if prev[i] else None}
+        for i in order
+        if cur[i] or prev[i]
+    ]
+
+    pct_values = np.percentile(daily, PERCENTILES) if n_days else np.zeros(len(PERCENTILES))
+    percentiles = {f"p{p}": round(float(v)) for p, v in zip(PERCENTILES, pct_values)}
+
+    month_to_date = int(cur.sum())
+    days_in_month = calendar.monthrange(today.year, today.month)[1]
+    projected = round(month_to_date + float(avg30[-1]) * (days_in_month - today.day))
+    projection = {
+        "month_to_date": month_to_date,
+        "projected": projected,
+        "budget": budget,
+        "projected_remaining": budget - projected if budget else None,
+    }
+
+    return {
+        "series": series,
+        "month_over_month": month_over_month,
+        "daily_percentiles": percentiles,
+        "projection": projection,
+    }
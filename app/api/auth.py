@@ -4,13 +4,12 @@ import time
 from datetime import datetime, timezone, timedelta
 
 import jwt
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException
 
 from app.config import TELEGRAM_TOKEN, JWT_SECRET, JWT_ALGORITHM, JWT_EXPIRE_DAYS
-from app.api.deps import get_db
 from app.api.schemas import TelegramAuthPayload, TokenOut, UserOut
 from app.db import repo
+from app.db.session import UserSession
 
 router = APIRouter()
 
@@ -27,7 +26,7 @@ def _verify_telegram_hash(payload: TelegramAuthPayload) -> bool:
 
 
 @router.post("/telegram", response_model=TokenOut)
-def telegram_auth(payload: TelegramAuthPayload, db: Session = Depends(get_db)):
+def telegram_auth(payload: TelegramAuthPayload):
     # Reject if auth_date is older than 24 hours
     if time.time() - payload.auth_date > 86400:
         raise HTTPException(status_code=401, detail="Auth data expired")
@@ -35,7 +34,8 @@ def telegram_auth(payload: TelegramAuthPayload, db: Session = Depends(get_db)):
     if not _verify_telegram_hash(payload):
         raise HTTPException(status_code=401, detail="Invalid hash")
 
-    user = repo.get_user(db, payload.id)
+    with UserSession(payload.id) as db:
+        user = repo.get_user(db, payload.id)
     if not user:
         raise HTTPException(status_code=403, detail="User not registered. Start the bot first.")
 
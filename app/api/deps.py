@@ -2,31 +2,62 @@ import jwt
 from fastapi import Depends, HTTPException
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from app.config import JWT_SECRET, JWT_ALGORITHM
-from app.db.session import SessionLocal
+from app.db.session import ReadSession, UserSession
 from app.db import repo
 from app.db.models import User
 
 bearer = HTTPBearer()
 
 
-def get_db():
-    db = SessionLocal()
+def get_token_user_id(credentials: HTTPAuthorizationCredentials = Depends(bearer)) -> int:
+    try:
+        payload = jwt.decode(credentials.credentials, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        return int(payload["sub"])
+    except (jwt.PyJWTError, KeyError, ValueError):
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+
+def get_db(user_id: int = Depends(get_token_user_id)):
+    """Session on the caller's database (their shard when sharded)."""
+    db = UserSession(user_id)
     try:
         yield db
     finally:
         db.close()
 
 
-def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(bearer),
-    db=Depends(get_db),
-) -> User:
-    try:
-        payload = jwt.decode(credentials.credentials, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        user_id = int(payload["sub"])
-    except (jwt.PyJWTError, KeyError, ValueError):
-        raise HTTPException(status_code=401, detail="Invalid token")
+def _load_user(db, user_id: int) -> User:
     user = repo.get_user(db, user_id)
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
     return user
+
+
+def get_current_user(
+    user_id: int = Depends(get_token_user_id),
+    db=Depends(get_db),
+) -> User:
+    return _load_user(db, user_id)
+
+
+def get_read_db(user_id: int = Depends(get_token_user_id)):
+    """Session for read-only endpoints; may be served by a replica (see ReadSession)."""
+    db = ReadSession(user_id)
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_read_user(
+    user_id: int = Depends(get_token_user_id),
+    db=Depends(get_read_db),
+) -> User:
+    """get_current_user for read-only endpoints: loaded through their read session,
+    so they never touch the primary."""
+    try:
+        return _load_user(db, user_id)
+    except HTTPException:
+        # A replica may not have replicated a brand-new account yet.
+        with UserSession(user_id) as primary:
+            return _load_user(primary, user_id)
@@ -0,0 +1,35 @@
+import orjson
+from fastapi.responses import Response
+
+
+class RawJSONResponse(Response):
+    """Serializes plain dicts/lists with orjson in one pass.
+
+    Returning a Response from an endpoint makes FastAPI skip response_model
+    validation, so use this only for payloads built straight from DB rows whose
+    shape already matches the declared schema (response_model stays for OpenAPI).
+    """
+
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content)
+
+
+def rows_to_dicts(fields: tuple[str, ...], rows) -> list[dict]:
+    return [dict(zip(fields, row)) for row in rows]
+
+
+def rows_to_columns(fields: tuple[str, ...], rows, lookup: tuple[str, str, str] | None = None) -> dict:
+    """Columnar layout: {"columns": {field: [value per row, ...]}}; keys aren't repeated per row.
+
+    With lookup=(key_field, value_field, name), the value column is dropped and sent
+    once as {name: {key: value}} instead, e.g. category names by category id.
+    """
+    columns = {field: list(values) for field, values in zip(fields, zip(*rows))} if rows else {f: [] for f in fields}
+    out = {"columns": columns}
+    if lookup:
+        key_field, value_field, name = lookup
+        values = columns.pop(value_field)
+        out[name] = {str(k): v for k, v in zip(columns[key_field], values) if k is not None}
+    return out
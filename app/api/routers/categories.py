@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 
-from app.api.deps import get_db, get_current_user
+from app.api.deps import get_db, get_read_db, get_read_user, get_current_user
 from app.api.schemas import CategoryOut, CategoryCreate
 from app.db import repo
 from app.db.models import User
@@ -10,7 +10,7 @@ router = APIRouter()
 
 
 @router.get("", response_model=list[CategoryOut])
-def list_categories(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def list_categories(user: User = Depends(get_read_user), db: Session = Depends(get_read_db)):
     return repo.get_categories(db, user.id)
 
 
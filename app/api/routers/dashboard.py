@@ -0,0 +1,70 @@
+import calendar
+import hashlib
+from datetime import date
+
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.responses import Response
+from sqlalchemy.orm import Session
+
+from app.api.deps import get_read_db, get_read_user
+from app.api.responses import RawJSONResponse
+from app.api.schemas import DashboardOut
+from app.db import repo
+from app.db.models import User
+from app.ratelimit import limit
+
+router = APIRouter()
+
+TREND_MONTHS = 6
+
+
+def _add_months(d: date, months: int) -> date:
+    y, m = divmod(d.year * 12 + d.month - 1 + months, 12)
+    return date(y, m + 1, 1)
+
+
+@router.get("", response_model=DashboardOut, dependencies=[Depends(limit("reports"))])
+def get_dashboard(
+    request: Request,
+    year: int = Query(..., ge=2000, le=2100),
+    month: int = Query(..., ge=1, le=12),
+    user: User = Depends(get_read_user),
+    db: Session = Depends(get_read_db),
+):
+    today = date.today()
+    # Everything the payload depends on; the data version changes with every write.
+    version = repo.get_data_version(db, user.id)
+    etag = '"' + hashlib.md5(f"{user.id}:{version}:{user.budget}:{year}-{month}:{today}".encode()).hexdigest() + '"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    month_start = date(year, month, 1)
+    month_end = date(year, month, calendar.monthrange(year, month)[1])
+    trend_start = _add_months(today.replace(day=1), -(TREND_MONTHS - 1))
+    rows = repo.get_dashboard_rollup(db, user.id, [(month_start, month_end), (trend_start, today)])
+
+    selected = month_start.strftime("%Y-%m")
+    trend_first, trend_last = trend_start.strftime("%Y-%m"), today.strftime("%Y-%m")
+    summary: dict[str, int] = {}
+    monthly: dict[str, int] = {}
+    expense_count = 0
+    for key, cat_name, total, count in rows:
+        if key == selected:
+            summary[cat_name] = summary.get(cat_name, 0) + total
+            expense_count += count
+        if trend_first <= key <= trend_last:
+            monthly[key] = monthly.get(key, 0) + total
+
+    payload = {
+        "summary": [
+            {"category_name": name, "total": total}
+            for name, total in sorted(summary.items(), key=lambda item: -item[1])
+        ],
+        "monthly": [
+            {"month": date(int(key[:4]), int(key[5:]), 1).strftime("%b %Y"), "total": monthly[key]}
+            for key in sorted(monthly)
+        ],
+        "expense_count": expense_count,
+        "budget": user.budget,
+    }
+    return RawJSONResponse(payload, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
@@ -0,0 +1,43 @@
+import orjson
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+
+from app import events
+from app.api.deps import get_token_user_id
+from app.config import EVENTS_HEARTBEAT_SECONDS
+from app.db import repo
+from app.db.session import UserSession
+
+router = APIRouter()
+
+
+async def _stream(sub: events.Subscription):
+    try:
+        yield b"retry: 5000\n\nevent: ready\ndata: {}\n\n"
+        while True:
+            changed = await sub.next(EVENTS_HEARTBEAT_SECONDS)
+            if changed is None:
+                yield b": ping\n\n"  # keeps proxies from closing an idle stream
+            else:
+                yield b"event: change\ndata: " + orjson.dumps({"changed": sorted(changed)}) + b"\n\n"
+    finally:
+        events.unsubscribe(sub)
+
+
+@router.get("")
+async def stream_events(user_id: int = Depends(get_token_user_id)):
+    """Server-sent events: `change` with the tables that changed for the user,
+    e.g. {"changed": ["expenses"]}, so the client refetches only those views."""
+    # Checked in a short-lived session: the stream itself must not hold a DB connection.
+    with UserSession(user_id) as db:
+        if repo.get_user(db, user_id) is None:
+            raise HTTPException(status_code=401, detail="User not found")
+    try:
+        sub = events.subscribe(user_id)
+    except events.TooManySubscribers:
+        raise HTTPException(status_code=503, detail="Too many event streams", headers={"Retry-After": "30"})
+    return StreamingResponse(
+        _stream(sub),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
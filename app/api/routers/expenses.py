@@ -1,18 +1,44 @@
-from datetime import date
+import json
+import os
+from datetime import date, timedelta
+from typing import Literal
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
 
-from app.api.deps import get_db, get_current_user
+from app.api.deps import get_db, get_read_db, get_read_user, get_current_user, get_token_user_id
+from app.api.responses import RawJSONResponse, rows_to_columns, rows_to_dicts
+from app.api.uploads import receive_upload
+from app import analytics, periods
+from app.ratelimit import Overloaded, limit
 from app.api.schemas import (
-    ExpenseOut, ExpenseListOut, ExpenseCreate, ExpenseUpdate,
-    SummaryItem, MonthlyTotalItem,
+    ExpenseOut, ExpenseCreatedOut, ExpenseListOut, ExpenseCreate, ExpenseUpdate,
+    SummaryItem, PeriodSummaryOut, MonthlyTotalItem, ImportResultOut, StagedRowListOut, AnalyticsOut,
 )
+from app.config import MAX_IMPORT_BYTES
 from app.db import repo
+from app.db.session import UserSession
+from app.imports import IMPORTERS, detect_format, pipeline, pool
 from app.db.models import User, Expense
 
 router = APIRouter()
 
+COLUMNS_LAYOUT_DOC = (
+    '"columns" returns {"columns": {field: [one value per row]}, "total": ...} instead of '
+    '"items"; category names are sent once, in "categories" keyed by category id'
+)
+
+# The body is parsed by receive_upload, so the form is described here for OpenAPI.
+IMPORT_FORM = {"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+    "type": "object",
+    "required": ["file"],
+    "properties": {
+        "file": {"type": "string", "format": "binary"},
+        "format": {"type": "string", "description": f"One of: {', '.join(IMPORTERS)}. Detected when omitted."},
+        "options": {"type": "string", "description": 'JSON, e.g. {"columns": {"date": "Date", "amount": "Sum"}}'},
+    },
+}}}}}
+
 
 def _expense_to_schema(e: Expense) -> ExpenseOut:
     return ExpenseOut(
@@ -20,31 +46,73 @@ def _expense_to_schema(e: Expense) -> ExpenseOut:
         amount=e.amount,
         expense_date=e.expense_date,
         category_id=e.category_id,
-        category_name=e.category.name if e.category else None,
+        category_name=e.category.name if e.category and e.category.deleted_at is None else None,
         note=e.note,
         import_ref=e.import_ref,
     )
 
 
-@router.get("/summary", response_model=list[SummaryItem])
+@router.get("/summary", response_model=list[SummaryItem], dependencies=[Depends(limit("reports"))])
 def get_summary(
     start_date: date = Query(...),
     end_date: date = Query(...),
-    user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    user: User = Depends(get_read_user),
+    db: Session = Depends(get_read_db),
 ):
     rows = repo.get_expenses_summary(db, user.id, start_date, end_date)
-    return [SummaryItem(category_name=name, total=total) for name, total in rows]
+    return RawJSONResponse(rows_to_dicts(("category_name", "total"), rows))
 
 
-@router.get("/monthly-totals", response_model=list[MonthlyTotalItem])
+@router.get("/summaries", response_model=list[PeriodSummaryOut], dependencies=[Depends(limit("reports"))])
+def get_summaries(
+    period: list[str] = Query(
+        ..., max_length=12,
+        description="today, this_week, this_month, last_month or YYYY-MM-DD..YYYY-MM-DD; repeatable",
+    ),
+    user: User = Depends(get_read_user),
+    db: Session = Depends(get_read_db),
+):
+    today = date.today()
+    try:
+        resolved = [periods.resolve(p, today) for p in period]
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    results = repo.get_multi_period_summary(db, user.id, [(start, end) for start, end, _ in resolved])
+    return RawJSONResponse([
+        {
+            "period": name,
+            "start_date": start,
+            "end_date": end,
+            "items": rows_to_dicts(("category_name", "total"), rows),
+        }
+        for name, (start, end, _), rows in zip(period, resolved, results)
+    ])
+
+
+@router.get("/monthly-totals", response_model=list[MonthlyTotalItem], dependencies=[Depends(limit("reports"))])
 def get_monthly_totals(
     months: int = Query(6, ge=1, le=24),
-    user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    user: User = Depends(get_read_user),
+    db: Session = Depends(get_read_db),
 ):
     rows = repo.get_expenses_monthly_totals(db, user.id, months)
-    return [MonthlyTotalItem(month=month, total=total) for month, total in rows]
+    return RawJSONResponse(rows_to_dicts(("month", "total"), rows))
+
+
+@router.get("/analytics", response_model=AnalyticsOut, dependencies=[Depends(limit("reports"))])
+def get_analytics(
+    days: int = Query(365, ge=62, le=3660, description="History window ending today"),
+    series_days: int = Query(90, ge=7, le=366, description="Days of daily series to return"),
+    user: User = Depends(get_read_user),
+    db: Session = Depends(get_read_db),
+):
+    today = date.today()
+    start = today - timedelta(days=days - 1)
+    key = (user.id, repo.get_data_version(db, user.id), user.budget, today, days, series_days)
+    result = analytics.cached(key, lambda: analytics.compute(
+        repo.get_daily_category_totals(db, user.id, start, today), start, today, user.budget, series_days,
+    ))
+    return RawJSONResponse(result)
 
 
 @router.get("", response_model=ExpenseListOut)
@@ -54,17 +122,79 @@ def list_expenses(
     category_id: int | None = Query(None),
     start_date: date | None = Query(None),
     end_date: date | None = Query(None),
-    user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    q: str | None = Query(None, max_length=200, description="Full-text search in notes (word prefixes)"),
+    layout: Literal["rows", "columns"] = Query("rows", description=COLUMNS_LAYOUT_DOC),
+    user: User = Depends(get_read_user),
+    db: Session = Depends(get_read_db),
 ):
-    items, total = repo.get_expenses_paginated(db, user.id, page, page_size, category_id, start_date, end_date)
-    return ExpenseListOut(items=[_expense_to_schema(e) for e in items], total=total)
+    rows, total = repo.get_expenses_paginated(db, user.id, page, page_size, category_id, start_date, end_date, q)
+    if layout == "columns":
+        lookup = ("category_id", "category_name", "categories")
+        return RawJSONResponse({**rows_to_columns(repo.EXPENSE_ROW_FIELDS, rows, lookup), "total": total})
+    return RawJSONResponse({"items": rows_to_dicts(repo.EXPENSE_ROW_FIELDS, rows), "total": total})
 
 
-@router.post("", response_model=ExpenseOut, status_code=201)
+@router.post("", response_model=ExpenseCreatedOut, status_code=201)
 def create_expense(body: ExpenseCreate, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
     expense = repo.create_expense(db, user.id, body.category_id, body.amount, body.expense_date, body.note)
-    return _expense_to_schema(expense)
+    out = ExpenseCreatedOut(**_expense_to_schema(expense).model_dump())
+    status = repo.get_budget_status(db, user, expense.expense_date, expense.amount)
+    if status:
+        out.budget_remaining, out.budget_threshold = status
+    return out
+
+
+@router.post("/import", response_model=ImportResultOut, dependencies=[Depends(limit("import"))], openapi_extra=IMPORT_FORM)
+async def import_expenses(request: Request, user_id: int = Depends(get_token_user_id)):
+    # Checked in a short-lived session: a get_db session would stay checked out for
+    # the whole upload and import.
+    with UserSession(user_id) as db:
+        if repo.get_user(db, user_id) is None:
+            raise HTTPException(status_code=401, detail="User not found")
+    upload = await receive_upload(request, MAX_IMPORT_BYTES)
+    try:
+        requested_format = upload.fields.get("format") or None
+        if requested_format is not None and requested_format not in IMPORTERS:
+            raise HTTPException(status_code=400, detail=f"Unknown format '{requested_format}'")
+        options = upload.fields.get("options")
+        try:
+            parsed_options = json.loads(options) if options else None
+        except ValueError:
+            raise HTTPException(status_code=422, detail="options must be valid JSON")
+
+        fmt = requested_format or detect_format(upload.filename, pipeline.read_head(upload.path))
+        if fmt is None:
+            raise HTTPException(status_code=400, detail="Unrecognized file format")
+        counts = await pipeline.run_import(user_id, upload.path, fmt, parsed_options)
+    except pool.ParseError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Overloaded:
+        raise HTTPException(status_code=503, detail="Too many imports in progress", headers={"Retry-After": "30"})
+    finally:
+        os.unlink(upload.path)
+
+    return ImportResultOut(
+        format=fmt,
+        imported=counts["imported"],
+        duplicates=counts["duplicates"],
+        unmatched=counts["unmatched"],
+    )
+
+
+@router.get("/unmatched", response_model=StagedRowListOut)
+def list_unmatched(
+    page: int = Query(1, ge=1),
+    page_size: int = Query(50, ge=1, le=200),
+    layout: Literal["rows", "columns"] = Query("rows", description=COLUMNS_LAYOUT_DOC),
+    user: User = Depends(get_read_user),
+    db: Session = Depends(get_read_db),
+):
+    """Imported rows no mapping matched yet; adding a matching mapping imports them."""
+    rows, total = repo.get_staged_rows(db, user.id, page, page_size)
+    fields = ("id", "service", "amount", "expense_date", "import_ref")
+    if layout == "columns":
+        return RawJSONResponse({**rows_to_columns(fields, rows), "total": total})
+    return RawJSONResponse({"items": rows_to_dicts(fields, rows), "total": total})
 
 
 @router.patch("/{expense_id}", response_model=ExpenseOut)
@@ -1,7 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 
-from app.api.deps import get_db, get_current_user
+from app.api.deps import get_db, get_read_db, get_read_user, get_current_user
+from app.api.responses import RawJSONResponse, rows_to_dicts
 from app.api.schemas import MappingOut, MappingCreate
 from app.db import repo
 from app.db.models import User, ServiceMapping
@@ -19,8 +20,9 @@ def _mapping_to_schema(m: ServiceMapping) -> MappingOut:
 
 
 @router.get("", response_model=list[MappingOut])
-def list_mappings(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    return [_mapping_to_schema(m) for m in repo.get_service_mappings(db, user.id)]
+def list_mappings(user: User = Depends(get_read_user), db: Session = Depends(get_read_db)):
+    rows = repo.get_service_mapping_rows(db, user.id)
+    return RawJSONResponse(rows_to_dicts(("id", "keyword", "category_id", "category_name"), rows))
 
 
 @router.post("", response_model=MappingOut, status_code=201)
@@ -1,19 +1,58 @@
-from fastapi import APIRouter, Depends
+from datetime import date
+
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
-from app.api.deps import get_db, get_current_user
-from app.api.schemas import UserOut, UserUpdate
-from app.db import repo
+from app.api.deps import get_db, get_current_user, get_read_user, get_token_user_id
+from app.api.schemas import UserOut, UserUpdate, RestoreResultOut
+from app.db import backup, repo
 from app.db.models import User
+from app.db.session import UserSession
+from app.ratelimit import limit
 
 router = APIRouter()
 
 
 @router.get("/me", response_model=UserOut)
-def get_me(user: User = Depends(get_current_user)):
+def get_me(user: User = Depends(get_read_user)):
     return user
 
 
 @router.put("/me", response_model=UserOut)
 def update_me(body: UserUpdate, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
     return repo.update_user_budget(db, user.id, body.budget)
+
+
+@router.get("/me/backup", dependencies=[Depends(limit("reports"))])
+def backup_me(user_id: int = Depends(get_token_user_id)):
+    """Gzipped NDJSON archive of the account, streamed (see app/db/backup.py)."""
+    # Checked in a short-lived session: dump() opens and closes its own for the
+    # stream, which a dependency's session would otherwise sit beside until the end.
+    with UserSession(user_id) as db:
+        user = repo.get_user(db, user_id)
+        if user is None:
+            raise HTTPException(status_code=401, detail="User not found")
+        username = user.username
+    filename = f"fintrack-{username}-{date.today().isoformat()}.ndjson.gz"
+    return StreamingResponse(
+        backup.dump(user_id),
+        media_type="application/gzip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.post("/me/restore", response_model=RestoreResultOut, dependencies=[Depends(limit("import"))])
+def restore_me(
+    file: UploadFile = File(...),
+    replace: bool = Query(False, description="Delete the account's categories, mappings and expenses first"),
+    user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    if not replace and repo.has_expenses(db, user.id):
+        raise HTTPException(status_code=409, detail="Account already has expenses; restore with replace=true")
+    try:
+        counts = backup.restore(db, user.id, file.file, replace)
+    except backup.BackupError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return RestoreResultOut(**counts)
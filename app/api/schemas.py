@@ -36,6 +36,12 @@ class UserUpdate(BaseModel):
     budget: int | None = None
 
 
+class RestoreResultOut(BaseModel):
+    categories: int
+    mappings: int
+    expenses: int
+
+
 # ── Categories ────────────────────────────────────────────────────────────────
 
 class CategoryOut(BaseModel):
@@ -82,6 +88,11 @@ class ExpenseOut(BaseModel):
         from_attributes = True
 
 
+class ExpenseCreatedOut(ExpenseOut):
+    budget_remaining: int | None = None    # for the expense's month; None without a budget
+    budget_threshold: int | None = None    # budget % this expense pushed spend past (80/100)
+
+
 class ExpenseListOut(BaseModel):
     items: list[ExpenseOut]
     total: int
@@ -101,11 +112,78 @@ class ExpenseUpdate(BaseModel):
     note: str | None = None
 
 
+class ImportResultOut(BaseModel):
+    format: str
+    imported: int
+    duplicates: int
+    unmatched: int
+
+
+class StagedRowOut(BaseModel):
+    id: int
+    service: str
+    amount: int
+    expense_date: date
+    import_ref: str
+
+
+class StagedRowListOut(BaseModel):
+    items: list[StagedRowOut]
+    total: int
+
+
 class SummaryItem(BaseModel):
     category_name: str
     total: int
 
 
+class PeriodSummaryOut(BaseModel):
+    period: str
+    start_date: date
+    end_date: date
+    items: list[SummaryItem]
+
+
 class MonthlyTotalItem(BaseModel):
     month: str
     total: int
+
+
+# ── Dashboard ─────────────────────────────────────────────────────────────────
+
+class DashboardOut(BaseModel):
+    summary: list[SummaryItem]           # selected month, by category
+    monthly: list[MonthlyTotalItem]      # last 6 months up to the current one
+    expense_count: int                   # selected month
+    budget: int | None
+
+
+# ── Analytics ─────────────────────────────────────────────────────────────────
+
+class DailyPoint(BaseModel):
+    date: date
+    total: int
+    avg_7d: int
+    avg_30d: int
+
+
+class CategoryDelta(BaseModel):
+    category_name: str
+    current: int                 # this month to date
+    previous: int                # same days of the previous month
+    delta: int
+    delta_pct: float | None
+
+
+class Projection(BaseModel):
+    month_to_date: int
+    projected: int               # month-to-date + 30-day average × days left
+    budget: int | None
+    projected_remaining: int | None
+
+
+class AnalyticsOut(BaseModel):
+    series: list[DailyPoint]
+    month_over_month: list[CategoryDelta]
+    daily_percentiles: dict[str, int]
+    projection: Projection
@@ -0,0 +1,127 @@
+"""Multipart upload straight to a named temp file.
+
+FastAPI's File() parameters make Starlette spool the whole body before the
+endpoint runs, and the import workers (another process) need a path, which
+meant writing every upload twice. This reads request.stream() instead: the
+file part goes to disk as it arrives and the body is cut off past `max_bytes`.
+"""
+import os
+import tempfile
+from dataclasses import dataclass, field
+
+from fastapi import HTTPException, Request
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+MAX_FIELD_BYTES = 64 * 1024
+
+
+@dataclass
+class Upload:
+    path: str | None = None  # caller unlinks it
+    filename: str = ""
+    fields: dict[str, str] = field(default_factory=dict)
+
+
+class _Receiver:
+    """MultipartParser callbacks; keeps the first file part and the text fields."""
+
+    def __init__(self, upload: Upload):
+        self.upload = upload
+        self.file = None
+        self.header_name = self.header_value = b""
+        self.disposition = b""
+        self.name = ""
+        self.data = bytearray()
+        self.writing = False
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        }
+
+    def on_part_begin(self) -> None:
+        self.disposition = b""
+        self.data = bytearray()
+        self.writing = False
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self.header_name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self.header_value += data[start:end]
+
+    def on_header_end(self) -> None:
+        if self.header_name.lower() == b"content-disposition":
+            self.disposition = self.header_value
+        self.header_name = self.header_value = b""
+
+    def on_headers_finished(self) -> None:
+        _, options = parse_options_header(self.disposition)
+        self.name = options.get(b"name", b"").decode("utf-8", "replace")
+        if b"filename" in options and self.file is None:
+            self.upload.filename = options[b"filename"].decode("utf-8", "replace")
+            self.file = tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(self.upload.filename)[1])
+            self.upload.path = self.file.name
+            self.writing = True
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self.writing:
+            self.file.write(data[start:end])
+            return
+        self.data += data[start:end]
+        if len(self.data) > MAX_FIELD_BYTES:
+            raise HTTPException(status_code=413, detail=f"Form field '{self.name}' too large")
+
+    def on_part_end(self) -> None:
+        if self.writing:
+            self.writing = False
+        elif self.name:
+            self.upload.fields[self.name] = self.data.decode("utf-8", "replace")
+
+
+async def receive_upload(request: Request, max_bytes: int) -> Upload:
+    """Parses a multipart/form-data body with one file field. Raises 413 from the
+    Content-Length header before reading anything when it is over `max_bytes`,
+    and again if the body turns out longer; 400 when it isn't multipart or has no file."""
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > max_bytes:
+        raise HTTPException(status_code=413, detail="File too large")
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data upload")
+
+    upload = Upload()
+    receiver = _Receiver(upload)
+    parser = MultipartParser(params[b"boundary"], receiver.callbacks())
+    size = 0
+    try:
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > max_bytes:
+                raise HTTPException(status_code=413, detail="File too large")
+            parser.write(chunk)
+        parser.finalize()
+    except MultipartParseError:
+        _discard(receiver)
+        raise HTTPException(status_code=400, detail="Malformed multipart body")
+    except BaseException:
+        _discard(receiver)
+        raise
+    if upload.path is None:
+        raise HTTPException(status_code=400, detail="No file in the upload")
+    receiver.file.close()
+    return upload
+
+
+def _discard(receiver: _Receiver) -> None:
+    if receiver.file is not None:
+        receiver.file.close()
+        os.unlink(receiver.upload.path)
+
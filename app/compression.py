@@ -0,0 +1,99 @@
+"""Content-Encoding negotiation, shared by the SPA bundle and API responses."""
+import gzip
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # optional; gzip is always available
+    brotli = None
+
+MIN_COMPRESS_SIZE = 1024
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)  # preference order
+
+# Dynamic responses are compressed per request, so favour speed over ratio.
+BROTLI_QUALITY = 4
+GZIP_LEVEL = 6
+
+
+def accepted_encodings(header: str) -> set[str]:
+    accepted = set()
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        params = params.replace(" ", "")
+        if params.startswith("q="):
+            try:
+                if float(params[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        if coding:
+            accepted.add(coding.lower())
+    return accepted
+
+
+def compress(body: bytes, coding: str) -> bytes:
+    if coding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def _strip_etag_suffixes(header: str) -> str:
+    for coding in ENCODINGS:
+        header = header.replace(f'-{coding}"', '"')
+    return header
+
+
+class CompressionMiddleware:
+    """Compresses responses under `prefixes` of at least MIN_COMPRESS_SIZE bytes with
+    br or gzip, as the client's Accept-Encoding allows. Streamed responses (event
+    streams, backups) and ones that already have a Content-Encoding pass through.
+
+    A compressed response's ETag gets a "-br"/"-gzip" suffix, so caches keep the
+    variants apart; the suffix is stripped from If-None-Match on the way in, so
+    endpoints keep comparing against their own ETags.
+    """
+
+    def __init__(self, app, prefixes: tuple = ("/api/",), minimum_size: int = MIN_COMPRESS_SIZE):
+        self.app = app
+        self.prefixes = prefixes
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.prefixes):
+            return await self.app(scope, receive, send)
+        request_headers = Headers(scope=scope)
+        accepted = accepted_encodings(request_headers.get("accept-encoding", ""))
+        coding = next((c for c in ENCODINGS if c in accepted), None)
+        if "if-none-match" in request_headers:
+            headers = MutableHeaders(scope=scope)
+            headers["if-none-match"] = _strip_etag_suffixes(headers["if-none-match"])
+
+        start = None
+
+        async def send_compressed(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if start is None or message["type"] != "http.response.body":
+                return await send(message)
+            headers = MutableHeaders(raw=start["headers"])
+            body = message.get("body", b"")
+            if (not message.get("more_body") and "content-encoding" not in headers
+                    and headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+                    and len(body) >= self.minimum_size):
+                headers.add_vary_header("Accept-Encoding")
+                if coding is not None:
+                    body = compress(body, coding)
+                    headers["Content-Encoding"] = coding
+                    headers["Content-Length"] = str(len(body))
+                    if etag := headers.get("etag"):
+                        headers["ETag"] = f'{etag[:-1]}-{coding}"'
+                    message = {**message, "body": body}
+            await send(start)
+            start = None
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
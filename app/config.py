@@ -4,7 +4,77 @@ from dotenv import load_dotenv
 load_dotenv()
 
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org")  # or a local Bot API server
 DATABASE_URL = os.getenv("DATABASE_URL")
 JWT_SECRET = os.getenv("JWT_SECRET", "dev-secret-change-in-production")
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRE_DAYS = 7
+
+# Run CREATE TABLE IF NOT EXISTS in the app lifespan. Turn off once the schema is
+# managed out of band (`python -m app.db.session` creates it on demand).
+INIT_DB_ON_STARTUP = os.getenv("INIT_DB_ON_STARTUP", "true").lower() == "true"
+
+# Bot updates arrive via POST /webhook ("webhook") or are long-polled with
+# getUpdates from the app lifespan ("polling"), which needs no public HTTPS.
+TELEGRAM_MODE = os.getenv("TELEGRAM_MODE", "webhook")
+POLL_TIMEOUT = int(os.getenv("POLL_TIMEOUT", "30"))  # seconds Telegram holds an empty getUpdates
+POLL_BATCH_SIZE = int(os.getenv("POLL_BATCH_SIZE", "100"))  # Bot API maximum
+# Chats handled at once. Each holds a pooled DB connection across its Bot API calls,
+# so keep this under the engine's pool size + overflow (15) minus API traffic.
+POLL_CONCURRENCY = int(os.getenv("POLL_CONCURRENCY", "8"))
+
+# Deleted categories: their expenses are moved to Uncategorized in the background,
+# CATEGORY_PURGE_BATCH rows per transaction; pending deletions are checked for
+# every CATEGORY_PURGE_INTERVAL seconds.
+CATEGORY_PURGE_BATCH = int(os.getenv("CATEGORY_PURGE_BATCH", "1000"))
+CATEGORY_PURGE_INTERVAL = float(os.getenv("CATEGORY_PURGE_INTERVAL", "5"))
+
+# Scheduled digests: sent once a day at DIGEST_HOUR (server local time) to
+# subscribed users; weekly ones on Sundays, monthly ones on the last day.
+DIGESTS_ENABLED = os.getenv("DIGESTS_ENABLED", "true").lower() == "true"
+DIGEST_HOUR = int(os.getenv("DIGEST_HOUR", "21"))
+DIGEST_SEND_RATE = float(os.getenv("DIGEST_SEND_RATE", "25"))  # messages/sec, Bot API allows ~30
+
+# File imports: parsed in a process pool, stored in batches.
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", "2"))
+MAX_CONCURRENT_IMPORTS = int(os.getenv("MAX_CONCURRENT_IMPORTS", "2"))
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "500"))
+IMPORT_PROGRESS_INTERVAL = float(os.getenv("IMPORT_PROGRESS_INTERVAL", "10"))  # seconds
+MAX_IMPORT_BYTES = int(os.getenv("MAX_IMPORT_BYTES", str(50 * 1024 * 1024)))  # whole upload request body
+
+# Throttling, per worker process. Token buckets as "rate/sec:burst" per user and
+# route class; least recently seen users are evicted past RATE_LIMIT_MAX_KEYS.
+def _bucket(name: str, default: str) -> tuple[float, float]:
+    rate, burst = os.getenv(name, default).split(":")
+    return float(rate), float(burst)
+
+
+RATE_LIMITS = {
+    "api": _bucket("RATE_LIMIT_API", "10:40"),
+    "reports": _bucket("RATE_LIMIT_REPORTS", "1:10"),   # summaries, analytics, dashboard
+    "import": _bucket("RATE_LIMIT_IMPORT", "0.02:3"),   # one per 50s after a burst of 3
+    "bot": _bucket("RATE_LIMIT_BOT", "2:10"),           # webhook updates / getUpdates batches per chat
+}
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "10000"))
+MAX_QUEUED_IMPORTS = int(os.getenv("MAX_QUEUED_IMPORTS", "8"))  # beyond this, new imports are shed
+MAX_IN_FLIGHT_REQUESTS = int(os.getenv("MAX_IN_FLIGHT_REQUESTS", "200"))
+
+# Optional read replicas (comma-separated URLs) for summaries, lists and reports.
+# A user's reads stay on the primary for READ_STICKY_SECONDS after they write, and
+# a replica that fails to connect is skipped for REPLICA_RETRY_SECONDS.
+READ_REPLICA_URLS = [u.strip() for u in os.getenv("READ_REPLICA_URLS", "").split(",") if u.strip()]
+READ_STICKY_SECONDS = float(os.getenv("READ_STICKY_SECONDS", "5"))
+REPLICA_RETRY_SECONDS = float(os.getenv("REPLICA_RETRY_SECONDS", "30"))
+
+# Postgres tablespace that `python -m app.db.partitions compact` moves old year partitions to.
+ARCHIVE_TABLESPACE = os.getenv("ARCHIVE_TABLESPACE")
+
+# SQLite only: spread users over this many database files (by user id hash) so
+# writes from different users don't share one file lock. Changing it requires
+# `python -m app.db.shards rebalance <old count>`.
+DATABASE_SHARDS = int(os.getenv("DATABASE_SHARDS", "1"))
+
+# Server-sent change events (GET /api/events), per worker process.
+MAX_EVENT_CONNECTIONS = int(os.getenv("MAX_EVENT_CONNECTIONS", "5000"))
+MAX_EVENT_CONNECTIONS_PER_USER = int(os.getenv("MAX_EVENT_CONNECTIONS_PER_USER", "5"))
+EVENTS_HEARTBEAT_SECONDS = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", "25"))
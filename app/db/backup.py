@@ -0,0 +1,233 @@
+"""Per-user backup archive: one gzip stream of NDJSON lines.
+
+    {"format": "fintrack-backup", "version": 1, "created_at": ...}
+    {"section": "categories", "columns": ["id", "name"]}
+    [12, "Groceries"]
+    ...
+
+A header line per table, then one JSON array per row. One stream with
+sections (rather than a tar/zip of per-table files) can be written without
+knowing any member's size up front, so dump() never holds more than a batch.
+"""
+import io
+import zlib
+from datetime import date, datetime, timezone
+from typing import BinaryIO, Iterator
+
+import orjson
+from sqlalchemy import delete, select, update
+
+from . import repo
+from .models import Category, Expense, ImportRef, ServiceMapping, StagedImportRow, User
+from .session import ReadSession, mark_written
+
+FORMAT = "fintrack-backup"
+VERSION = 1
+BATCH_SIZE = 5000
+CHUNK_SIZE = 64 * 1024
+
+EXPENSE_COLUMNS = ("category_id", "amount", "expense_date", "note", "import_ref", "created_at")
+
+
+class BackupError(ValueError):
+    pass
+
+
+def _sections(user_id: int) -> list[tuple[str, object]]:
+    # Order matters: restore needs categories before the rows that reference them.
+    return [
+        ("user", select(User.first_name, User.last_name, User.budget).where(User.id == user_id)),
+        ("categories", select(Category.id, Category.name)
+            .where(Category.user_id == user_id, Category.deleted_at.is_(None)).order_by(Category.id)),
+        ("service_mappings", select(ServiceMapping.keyword, ServiceMapping.category_id)
+            .where(ServiceMapping.user_id == user_id).order_by(ServiceMapping.id)),
+        ("expenses", select(*(getattr(Expense, c) for c in EXPENSE_COLUMNS))
+            .where(Expense.user_id == user_id).order_by(Expense.id)),
+    ]
+
+
+def _records(db, user_id: int) -> Iterator:
+    yield {"format": FORMAT, "version": VERSION, "created_at": datetime.now(timezone.utc)}
+    for name, stmt in _sections(user_id):
+        yield {"section": name, "columns": [c.key for c in stmt.selected_columns]}
+        # yield_per streams from a server-side cursor where the driver has one
+        for batch in db.execute(stmt.execution_options(yield_per=BATCH_SIZE)).partitions():
+            yield from (tuple(row) for row in batch)
+
+
+def dump(user_id: int) -> Iterator[bytes]:
+    """Gzip-compressed archive chunks; owns its (read) session for the stream's lifetime."""
+    db = ReadSession(user_id)
+    try:
+        compressor = zlib.compressobj(wbits=31)  # gzip container
+        buffer = bytearray()
+        for record in _records(db, user_id):
+            buffer += orjson.dumps(record)
+            buffer += b"\n"
+            if len(buffer) >= CHUNK_SIZE:
+                if out := compressor.compress(buffer):
+                    yield out
+                buffer.clear()
+        yield compressor.compress(buffer) + compressor.flush()
+    finally:
+        db.close()
+
+
+def _lines(fileobj: BinaryIO) -> Iterator[bytes]:
+    decompressor = zlib.decompressobj(wbits=47)  # gzip or zlib header
+    pending = b""
+    try:
+        while chunk := fileobj.read(CHUNK_SIZE):
+            pending += decompressor.decompress(chunk)
+            *lines, pending = pending.split(b"\n")
+            yield from lines
+        pending += decompressor.flush()
+    except zlib.error:
+        raise BackupError("File is not a gzip archive")
+    if pending:
+        yield pending
+
+
+def _insert_expenses(db, rows: list[tuple]) -> None:
+    """rows: (user_id, category_id, amount, expense_date, note, import_ref, created_at).
+    Rows without created_at get the column default rather than NULL."""
+    columns = ("user_id",) + EXPENSE_COLUMNS
+    stamped = [row for row in rows if row[6]]
+    unstamped = [row[:6] for row in rows if not row[6]]
+    for batch, batch_columns in ((stamped, columns), (unstamped, columns[:6])):
+        if batch:
+            _insert_rows(db, batch_columns, batch)
+
+
+def _csv_field(value) -> str:
+    # COPY reads an unquoted empty field as NULL and a quoted one as "", so every
+    # value is quoted and only None is left bare.
+    if value is None:
+        return ""
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def _insert_rows(db, columns: tuple[str, ...], rows: list[tuple]) -> None:
+    if db.get_bind().dialect.name == "postgresql":
+        cursor = db.connection().connection.cursor()  # psycopg2, inside the session's transaction
+        buffer = io.StringIO()
+        buffer.writelines(",".join(map(_csv_field, row)) + "\n" for row in rows)
+        buffer.seek(0)
+        try:
+            cursor.copy_expert(f"COPY expenses ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+        finally:
+            cursor.close()
+        return
+    parse = {"expense_date": date.fromisoformat, "created_at": datetime.fromisoformat}
+    db.execute(Expense.__table__.insert(), [
+        {column: parse[column](value) if column in parse else value for column, value in zip(columns, row)}
+        for row in rows
+    ])
+
+
+def _unimported(db, user_id: int, rows: list[tuple]) -> list[tuple]:
+    """Drops rows whose import_ref was imported already (or earlier in the archive)
+    and claims the refs of the rest, as an import would."""
+    refs = {row[5] for row in rows if row[5] is not None}
+    if not refs:
+        return rows
+    claimed = set(db.execute(
+        repo._insert(db)(ImportRef).values([{"user_id": user_id, "import_ref": ref} for ref in refs])
+        .on_conflict_do_nothing(index_elements=[ImportRef.user_id, ImportRef.import_ref])
+        .returning(ImportRef.import_ref)
+    ).scalars())
+    kept = []
+    for row in rows:
+        if row[5] is None:
+            kept.append(row)
+        elif row[5] in claimed:
+            claimed.discard(row[5])
+            kept.append(row)
+    return kept
+
+
+def clear(db, user_id: int) -> None:
+    """Deletes the user's expenses (and their import refs), staged import rows,
+    mappings and categories (no commit)."""
+    db.execute(delete(Expense).where(Expense.user_id == user_id))
+    db.execute(delete(ImportRef).where(ImportRef.user_id == user_id))
+    db.execute(delete(StagedImportRow).where(StagedImportRow.user_id == user_id))
+    db.execute(delete(ServiceMapping).where(ServiceMapping.user_id == user_id))
+    db.execute(delete(Category).where(Category.user_id == user_id))
+
+
+def restore(db, user_id: int, fileobj: BinaryIO, replace: bool = False) -> dict:
+    """Loads an archive from dump() into the user's account in one transaction.
+    Categories and mappings are merged by name/keyword (category ids remapped) and
+    imported expenses whose import_ref the account already has are skipped; with `replace`, the account's existing data is deleted first.
+    Raises BackupError for anything that isn't a version-1 archive."""
+    lines = _lines(fileobj)
+    try:
+        header = orjson.loads(next(lines, b"null"))
+    except orjson.JSONDecodeError:
+        raise BackupError("Not a FinTrack backup")
+    if not isinstance(header, dict) or header.get("format") != FORMAT:
+        raise BackupError("Not a FinTrack backup")
+    if header.get("version") != VERSION:
+        raise BackupError(f"Unsupported backup version {header.get('version')}")
+
+    if replace:
+        clear(db, user_id)
+    counts = {"categories": 0, "mappings": 0, "expenses": 0}
+    category_ids: dict[int, int] = {}  # id in the archive -> id here
+    section, pending = None, []
+    try:
+        for line in lines:
+            if not line.strip():
+                continue
+            record = orjson.loads(line)
+            if isinstance(record, dict):
+                section = record.get("section")
+                continue
+            if section == "user":
+                first_name, last_name, budget = record
+                db.execute(update(User).where(User.id == user_id).values(
+                    first_name=first_name, last_name=last_name, budget=budget,
+                ))
+            elif section == "categories":
+                old_id, name = record
+                category = repo.get_category_by_name(db, user_id, name)
+                if category is None:
+                    category = Category(user_id=user_id, name=name)
+                    db.add(category)
+                    db.flush()
+                    counts["categories"] += 1
+                category_ids[old_id] = category.id
+            elif section == "service_mappings":
+                keyword, old_category_id = record
+                if old_category_id in category_ids:
+                    stmt = repo._insert(db)(ServiceMapping).values(
+                        user_id=user_id, keyword=keyword, category_id=category_ids[old_category_id],
+                    ).on_conflict_do_nothing(index_elements=[ServiceMapping.user_id, ServiceMapping.keyword])
+                    counts["mappings"] += db.execute(stmt).rowcount
+            elif section == "expenses":
+                category_id, *rest = record
+                pending.append((user_id, category_ids.get(category_id), *rest))
+                if len(pending) >= BATCH_SIZE:
+                    pending = _unimported(db, user_id, pending)
+                    _insert_expenses(db, pending)
+                    counts["expenses"] += len(pending)
+                    pending = []
+            else:
+                raise BackupError(f"Unknown section {section!r}")
+        if pending:
+            pending = _unimported(db, user_id, pending)
+            _insert_expenses(db, pending)
+            counts["expenses"] += len(pending)
+    except BackupError:
+        db.rollback()
+        raise
+    except (ValueError, TypeError) as e:  # orjson.JSONDecodeError is a ValueError
+        db.rollback()
+        raise BackupError(f"Corrupt backup: {e}")
+
+    for table in ("users", "categories", "service_mappings"):
+        mark_written(db, user_id, table)
+    repo.touch_data_version(db, user_id)
+    repo.rebuild_monthly_spend(db, user_id)  # commits
+    return counts
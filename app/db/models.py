@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Date, ForeignKey, Integer, BigInteger, String, Float, Boolean, DateTime, Text, func
+from sqlalchemy import Column, Date, ForeignKey, Integer, BigInteger, String, Float, Boolean, DateTime, Text, UniqueConstraint, Index, func
 from sqlalchemy.orm import relationship, declarative_base
 
 Base = declarative_base()
@@ -16,16 +16,29 @@ class User(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 
+# Uniqueness added after the first release is declared as unique indexes rather
+# than constraints, so session.create_indexes() can add it to existing tables.
+# Likewise columns added later are nullable, so session.add_missing_columns() can.
+
 class Category(Base):
     __tablename__ = "categories"
+    __table_args__ = (Index("uq_categories_user_name", "user_id", "name", unique=True),)
 
     id = Column(Integer, primary_key=True)
     user_id = Column(BigInteger, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     name = Column(String, nullable=False)
+    # Set by repo.remove_category: hidden at once, then purge.py moves its expenses
+    # to Uncategorized in batches and deletes the row.
+    deleted_at = Column(DateTime(timezone=True), nullable=True)
 
 
 class Expense(Base):
+    """Partitioned by year on Postgres (see partitions.py, which owns its DDL there)."""
     __tablename__ = "expenses"
+    __table_args__ = (
+        Index("ix_expenses_user_date", "user_id", "expense_date"),
+        Index("ix_expenses_category_id", "category_id"),
+    )
 
     id = Column(Integer, primary_key=True)
     user_id = Column(BigInteger, ForeignKey("users.id"), nullable=False)
@@ -40,8 +53,19 @@ class Expense(Base):
     category = relationship("Category")
 
 
+class ImportRef(Base):
+    """import_refs of the user's imported expenses: the one key every import dedupe
+    claims or checks. A table of its own because a unique index on the partitioned
+    `expenses` would have to include expense_date (see partitions.py)."""
+    __tablename__ = "import_refs"
+
+    user_id = Column(BigInteger, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    import_ref = Column(String, primary_key=True)
+
+
 class ServiceMapping(Base):
     __tablename__ = "service_mappings"
+    __table_args__ = (Index("uq_service_mappings_user_keyword", "user_id", "keyword", unique=True),)
 
     id = Column(Integer, primary_key=True)
     user_id = Column(BigInteger, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
@@ -49,3 +73,47 @@ class ServiceMapping(Base):
     category_id = Column(Integer, ForeignKey("categories.id", ondelete="CASCADE"), nullable=False)
 
     category = relationship("Category")
+
+
+class DigestSubscription(Base):
+    __tablename__ = "digest_subscriptions"
+    __table_args__ = (UniqueConstraint("user_id", "period"),)
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(BigInteger, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    period = Column(String, nullable=False)      # "day" | "week" | "month"
+
+
+class MonthlySpend(Base):
+    """Running per-user total for each calendar month, maintained by repo on every
+    expense write so budget checks never have to SUM the month's expenses."""
+    __tablename__ = "monthly_spend"
+
+    user_id = Column(BigInteger, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    month = Column(Date, primary_key=True)       # first day of the month
+    total = Column(BigInteger, nullable=False, default=0)
+
+
+class StagedImportRow(Base):
+    """Imported row that no service mapping matched yet. Promoted to an Expense
+    by repo.add_service_mapping once a keyword matches its service."""
+    __tablename__ = "staged_import_rows"
+    __table_args__ = (UniqueConstraint("user_id", "import_ref"),)
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(BigInteger, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    service = Column(String, nullable=False)
+    service_key = Column(String, nullable=False)  # service lowercased in Python (SQLite lower() is ASCII-only)
+    amount = Column(Integer, nullable=False)
+    expense_date = Column(Date, nullable=False)
+    import_ref = Column(String, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class DataVersion(Base):
+    """Per-user counter bumped with every change to the user's expenses or
+    categories; used as a cache key / ETag for derived data."""
+    __tablename__ = "data_versions"
+
+    user_id = Column(BigInteger, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
@@ -0,0 +1,183 @@
+"""Time partitioning of `expenses` by year.
+
+Postgres: `expenses` is a declaratively partitioned table (RANGE on
+expense_date) with one partition per year plus a DEFAULT partition. install()
+keeps partitions from last year through next year, and moves rows that landed
+in DEFAULT (old imports, a process that outlived New Year) into a partition of
+their own. The planner prunes partitions for any query bounded on expense_date,
+so nothing in repo needs to know about them.
+SQLite: not partitioned, and cold years are not archived (no per-year tables or
+attached archive database). The (user_id, expense_date) index gives per-user
+date-range queries a bounded access path, and compact() only VACUUMs the file.
+tests/test_partitions_postgres.py runs the Postgres DDL (set TEST_POSTGRES_URL).
+
+    python -m app.db.partitions ensure              # create upcoming partitions
+    python -m app.db.partitions compact 2023        # compact/archive years < 2023
+    python -m app.db.partitions convert             # partition a pre-existing table
+"""
+import argparse
+import logging
+import re
+from datetime import date
+
+from sqlalchemy import text
+
+from app.config import ARCHIVE_TABLESPACE
+from .models import Base
+
+log = logging.getLogger(__name__)
+
+PARENT = "expenses"
+DEFAULT_PARTITION = "expenses_default"
+COLUMNS = "id, user_id, category_id, amount, expense_date, note, import_ref, created_at"
+
+# Mirrors models.Expense; the partition key has to be part of the primary key.
+_PG_PARENT_DDL = [
+    f"""CREATE TABLE {PARENT} (
+        id SERIAL NOT NULL,
+        user_id BIGINT NOT NULL REFERENCES users (id),
+        category_id INTEGER REFERENCES categories (id) ON DELETE SET NULL,
+        amount INTEGER NOT NULL,
+        expense_date DATE NOT NULL,
+        note TEXT,
+        import_ref VARCHAR,
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+        PRIMARY KEY (id, expense_date)
+    ) PARTITION BY RANGE (expense_date)""",
+    f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {PARENT} DEFAULT",
+]
+
+
+def partition_name(year: int) -> str:
+    return f"{PARENT}_y{year}"
+
+
+def regular_tables(engine) -> list:
+    """Tables for create_all; on Postgres install() creates `expenses` itself."""
+    if engine.dialect.name == "postgresql":
+        return [t for t in Base.metadata.sorted_tables if t.name != PARENT]
+    return Base.metadata.sorted_tables
+
+
+def _pg_is_partitioned(conn) -> bool | None:
+    """None when the table doesn't exist yet."""
+    return conn.execute(
+        text("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(:name)"), {"name": PARENT}
+    ).scalar()
+
+
+def _pg_partition_years(conn) -> list[int]:
+    names = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(:name)"
+    ), {"name": PARENT}).scalars()
+    return sorted(int(m.group(1)) for n in names if (m := re.fullmatch(rf"{PARENT}_y(\d{{4}})", n)))
+
+
+def _pg_ensure_year(conn, year: int) -> None:
+    name = partition_name(year)
+    if conn.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar():
+        return
+    start, end = date(year, 1, 1), date(year + 1, 1, 1)
+    # Attaching fails while DEFAULT still holds rows of the new range, so move them first.
+    conn.execute(text(f"CREATE TABLE {name} (LIKE {PARENT} INCLUDING DEFAULTS)"))
+    conn.execute(text(
+        f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE expense_date >= :start AND expense_date < :end "
+        f"RETURNING {COLUMNS}) INSERT INTO {name} ({COLUMNS}) SELECT {COLUMNS} FROM moved"
+    ), {"start": start, "end": end})
+    conn.execute(text(f"ALTER TABLE {PARENT} ATTACH PARTITION {name} FOR VALUES FROM ('{start}') TO ('{end}')"))
+
+
+def ensure_partitions(conn) -> None:
+    """Postgres: partitions for last year through next year, plus any year found in DEFAULT."""
+    this_year = date.today().year
+    years = set(range(this_year - 1, this_year + 2))
+    years.update(int(y) for y in conn.execute(
+        text(f"SELECT DISTINCT extract(year FROM expense_date) FROM {DEFAULT_PARTITION}")
+    ).scalars())
+    for year in sorted(years):
+        _pg_ensure_year(conn, year)
+
+
+def install(engine) -> None:
+    """Postgres: creates the partitioned table and upcoming partitions. Idempotent;
+    indexes on it come from the models (session.create_indexes) and search.install()."""
+    with engine.begin() as conn:
+        if engine.dialect.name == "postgresql":
+            partitioned = _pg_is_partitioned(conn)
+            if partitioned is None:
+                for ddl in _PG_PARENT_DDL:
+                    conn.execute(text(ddl))
+                partitioned = True
+            if partitioned:
+                ensure_partitions(conn)
+            else:
+                log.warning("%s is not partitioned; run `python -m app.db.partitions convert`", PARENT)
+
+
+def compact(engine, before_year: int) -> list[str]:
+    """Postgres: moves partitions of years before `before_year` to ARCHIVE_TABLESPACE
+    (when set) and rewrites them compactly. SQLite: VACUUM the whole file.
+    Rows stay queryable either way. Returns what was compacted."""
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if engine.dialect.name != "postgresql":
+            conn.execute(text("VACUUM"))
+            conn.execute(text("ANALYZE"))
+            return [PARENT]
+        names = [partition_name(y) for y in _pg_partition_years(conn) if y < before_year]
+        for name in names:
+            if ARCHIVE_TABLESPACE:
+                conn.execute(text(f'ALTER TABLE {name} SET TABLESPACE "{ARCHIVE_TABLESPACE}"'))
+            conn.execute(text(f"VACUUM (FULL, ANALYZE) {name}"))
+        return names
+
+
+def convert(engine) -> bool:
+    """Postgres: rebuilds an unpartitioned `expenses` as a partitioned one, in one
+    transaction (writes are blocked meanwhile). Returns False if there was nothing to do."""
+    if engine.dialect.name != "postgresql":
+        return False
+    legacy = f"{PARENT}_unpartitioned"
+    with engine.begin() as conn:
+        if _pg_is_partitioned(conn) is not False:
+            return False
+        conn.execute(text(f"ALTER TABLE {PARENT} RENAME TO {legacy}"))
+        conn.execute(text(f"ALTER SEQUENCE IF EXISTS {PARENT}_id_seq RENAME TO {legacy}_id_seq"))
+        conn.execute(text(f"ALTER INDEX IF EXISTS {PARENT}_pkey RENAME TO {legacy}_pkey"))
+        # Recreated on the new table by init_db()
+        for index in Base.metadata.tables[PARENT].indexes:
+            conn.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+        conn.execute(text("DROP INDEX IF EXISTS ix_expenses_note_fts"))
+        for ddl in _PG_PARENT_DDL:
+            conn.execute(text(ddl))
+        for year in conn.execute(text(f"SELECT DISTINCT extract(year FROM expense_date) FROM {legacy}")).scalars():
+            _pg_ensure_year(conn, int(year))
+        conn.execute(text(f"INSERT INTO {PARENT} ({COLUMNS}) SELECT {COLUMNS} FROM {legacy}"))
+        conn.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{PARENT}', 'id'), coalesce((SELECT max(id) FROM {PARENT}), 0) + 1, false)"
+        ))
+        conn.execute(text(f"DROP TABLE {legacy}"))
+    return True
+
+
+if __name__ == "__main__":
+    from .session import get_engine, init_db
+
+    parser = argparse.ArgumentParser(prog="python -m app.db.partitions")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("ensure", help="create partitions through next year")
+    compact_cmd = commands.add_parser("compact", help="compact (and archive) old years")
+    compact_cmd.add_argument("before_year", type=int)
+    commands.add_parser("convert", help="partition an existing unpartitioned table")
+    args = parser.parse_args()
+
+    engine = get_engine()
+    if args.command == "ensure":
+        install(engine)
+    elif args.command == "compact":
+        print("Compacted:", ", ".join(compact(engine, args.before_year)) or "nothing")
+    elif convert(engine):
+        init_db()
+        print("Converted expenses to a partitioned table")
+    else:
+        print("Nothing to convert")
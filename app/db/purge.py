@@ -0,0 +1,40 @@
+"""Background purge of soft-deleted categories (see repo.remove_category).
+
+Deleting a category only hides it; this moves its expenses to Uncategorized
+in batches of CATEGORY_PURGE_BATCH, each its own short transaction, so a
+category with a long history never holds the write lock for long. Until a
+category is empty, queries join it through repo._expense_category, which
+already reports its remaining expenses as Uncategorized, so summaries don't
+change while this runs. Every worker runs the loop; batches are idempotent,
+so overlapping workers only repeat a little work.
+"""
+import asyncio
+import logging
+
+from app.config import CATEGORY_PURGE_BATCH, CATEGORY_PURGE_INTERVAL
+from . import repo
+from .session import shard_sessions
+
+log = logging.getLogger(__name__)
+
+
+def purge_deleted_categories(batch_size: int = CATEGORY_PURGE_BATCH) -> int:
+    """Purges every pending category on every shard; returns how many."""
+    purged = 0
+    for db in shard_sessions():
+        for category_id, user_id in repo.get_deleted_categories(db):
+            while repo.uncategorize_batch(db, category_id, batch_size):
+                pass
+            repo.purge_category(db, category_id, user_id)
+            purged += 1
+    return purged
+
+
+async def run_purger() -> None:
+    """Runs for the app lifetime; started and cancelled from the lifespan."""
+    while True:
+        try:
+            await asyncio.to_thread(purge_deleted_categories)
+        except Exception:
+            log.exception("Category purge failed")
+        await asyncio.sleep(CATEGORY_PURGE_INTERVAL)
@@ -1,7 +1,11 @@
-from datetime import date
+from datetime import date, datetime, timezone
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from .models import User, Category, Expense, ServiceMapping
+from sqlalchemy import Date, and_, bindparam, case, cast, delete, func, inspect, literal, or_, select, update
+from . import search
+from .session import mark_written
+from .models import (
+    User, Category, Expense, ImportRef, ServiceMapping, DigestSubscription, MonthlySpend, StagedImportRow, DataVersion,
+)
 
 DEFAULT_CATEGORIES = [
     "Health/Sport", "Education",
@@ -10,19 +14,66 @@ DEFAULT_CATEGORIES = [
     "Other",
 ]
 
+BUDGET_THRESHOLDS = (80, 100)  # percent of monthly budget that triggers a warning
+
+
+def _insert(db: Session):
+    """Dialect-specific insert() so callers can use ON CONFLICT on SQLite and Postgres."""
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+
+# Categories soft-deleted by remove_category are hidden everywhere: reads filter on
+# _live, and joining expenses through _expense_category makes the expenses of a
+# deleted category show as Uncategorized until purge.py has moved them.
+_live = Category.deleted_at.is_(None)
+_expense_category = and_(Expense.category_id == Category.id, _live)
+
+
+# ── Hot-path statements ────────────────────────────────────────────────────
+# Built once at import. Re-executing the same statement object reuses its memoized
+# cache key and compiled SQL, so a call only binds parameters.
+
+_user_by_id = select(User).where(User.id == bindparam("user_id"))
+_username_taken = select(select(User.id).where(User.username == bindparam("username")).exists())
+_category_by_id = select(Category).where(
+    Category.id == bindparam("category_id"), Category.user_id == bindparam("user_id"), _live
+)
+_category_by_name = select(Category).where(
+    Category.user_id == bindparam("user_id"), Category.name == bindparam("name"), _live
+).limit(1)
+_mapping_by_id = select(ServiceMapping).where(
+    ServiceMapping.id == bindparam("mapping_id"), ServiceMapping.user_id == bindparam("user_id")
+)
+_mapping_by_keyword = select(ServiceMapping).where(
+    ServiceMapping.user_id == bindparam("user_id"), ServiceMapping.keyword == bindparam("keyword")
+).limit(1)
+_expense_by_id = select(Expense).where(Expense.id == bindparam("expense_id"), Expense.user_id == bindparam("user_id"))
+_has_expenses = select(select(Expense.id).where(Expense.user_id == bindparam("user_id")).exists())
+_import_ref_taken = select(select(ImportRef.import_ref).where(
+    ImportRef.user_id == bindparam("user_id"), ImportRef.import_ref == bindparam("import_ref")
+).exists())
+
 
 # ── Users ──────────────────────────────────────────────────────────────────
 
 def get_user(db: Session, chat_id: int) -> User | None:
-    return db.query(User).filter_by(id=chat_id).first()
+    # Session.get() rebuilds its statement on every identity-map miss, which is the usual case here.
+    user = db.identity_map.get(db.identity_key(User, chat_id))
+    if user is not None and not inspect(user).expired:
+        return user
+    return db.scalars(_user_by_id, {"user_id": chat_id}).first()
 
 
 def username_exists(db: Session, username: str) -> bool:
-    return db.query(User).filter_by(username=username).first() is not None
+    return db.scalar(_username_taken, {"username": username})
 
 
 def update_user_budget(db: Session, user_id: int, budget: int | None) -> User:
-    user = db.query(User).filter_by(id=user_id).first()
+    user = get_user(db, user_id)
     user.budget = budget
     db.commit()
     db.refresh(user)
@@ -59,44 +110,92 @@ def seed_default_categories(db: Session, user_id: int) -> None:
 
 
 def get_categories(db: Session, user_id: int) -> list[Category]:
-    return db.query(Category).filter_by(user_id=user_id).order_by(Category.id).all()
+    return db.query(Category).filter(Category.user_id == user_id, _live).order_by(Category.id).all()
+
+
+def get_category_lookup(db: Session, user_id: int) -> list[tuple[int, str, str | None]]:
+    """(category_id, name, keyword) per category and mapping keyword pointing at it
+    (keyword None for categories without mappings), in one query."""
+    return db.execute(
+        select(Category.id, Category.name, ServiceMapping.keyword)
+        .outerjoin(ServiceMapping, ServiceMapping.category_id == Category.id)
+        .where(Category.user_id == user_id, _live)
+        .order_by(Category.id)
+    ).all()
 
 
 def get_category_by_name(db: Session, user_id: int, name: str) -> Category | None:
-    return db.query(Category).filter_by(user_id=user_id, name=name).first()
+    return db.scalars(_category_by_name, {"user_id": user_id, "name": name}).first()
 
 
 def add_category(db: Session, user_id: int, name: str) -> Category | None:
     """Returns the new Category, or None if name already exists for this user."""
-    if get_category_by_name(db, user_id, name):
-        return None
-    category = Category(user_id=user_id, name=name)
-    db.add(category)
+    category = db.scalars(
+        _insert(db)(Category).values(user_id=user_id, name=name)
+        .on_conflict_do_nothing(index_elements=[Category.user_id, Category.name])
+        .returning(Category)
+    ).first()
+    if category is not None:
+        mark_written(db, user_id, "categories")
     db.commit()
-    db.refresh(category)
     return category
 
 
+def _soft_delete_category(db: Session, category: Category) -> None:
+    """Hides the category and drops its mappings in one short transaction; its
+    expenses are moved to Uncategorized later by purge.py, a batch at a time."""
+    category.deleted_at = datetime.now(timezone.utc)
+    # Frees the name for a new category right away (\x1f can't be typed in the bot or UI).
+    category.name = f"{category.name}\x1fdeleted:{category.id}"
+    db.execute(delete(ServiceMapping).where(ServiceMapping.category_id == category.id))
+    mark_written(db, category.user_id, "service_mappings")
+    touch_data_version(db, category.user_id)
+    db.commit()
+
+
 def remove_category_by_id(db: Session, user_id: int, category_id: int) -> bool:
-    category = db.query(Category).filter_by(id=category_id, user_id=user_id).first()
+    category = db.scalars(_category_by_id, {"category_id": category_id, "user_id": user_id}).first()
     if not category:
         return False
-    db.delete(category)
-    db.commit()
+    _soft_delete_category(db, category)
     return True
 
 
 def remove_category(db: Session, user_id: int, name: str) -> bool:
-    """Deletes the category. Expenses keep their record (category_id → NULL).
-    Returns True if deleted, False if not found."""
+    """Soft-deletes the category by name, like remove_category_by_id: it is hidden at
+    once and its expenses show as Uncategorized until purge.py moves them (see
+    _soft_delete_category). Returns False if no live category has that name."""
     category = get_category_by_name(db, user_id, name)
     if not category:
         return False
-    db.delete(category)
-    db.commit()
+    _soft_delete_category(db, category)
     return True
 
 
+def get_deleted_categories(db: Session) -> list[tuple[int, int]]:
+    """(category_id, user_id) of soft-deleted categories still being purged, across users."""
+    return db.execute(select(Category.id, Category.user_id).where(Category.deleted_at.is_not(None))).all()
+
+
+def uncategorize_batch(db: Session, category_id: int, batch_size: int) -> int:
+    """Moves up to `batch_size` expenses of the category to Uncategorized and
+    commits; returns how many moved."""
+    batch = select(Expense.id).where(Expense.category_id == category_id).limit(batch_size)
+    moved = db.execute(
+        update(Expense).where(Expense.id.in_(batch.scalar_subquery())).values(category_id=None)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return moved
+
+
+def purge_category(db: Session, category_id: int, user_id: int) -> None:
+    """Deletes a soft-deleted category once uncategorize_batch has emptied it."""
+    db.execute(delete(Category).where(Category.id == category_id, Category.deleted_at.is_not(None)))
+    touch_data_version(db, user_id)  # expense rows now report category_id NULL
+    db.commit()
+
+
 # ── Expenses ───────────────────────────────────────────────────────────────
 
 # ── Service Mappings ───────────────────────────────────────────────────────
@@ -105,20 +204,33 @@ def get_service_mappings(db: Session, user_id: int) -> list[ServiceMapping]:
     return db.query(ServiceMapping).filter_by(user_id=user_id).order_by(ServiceMapping.id).all()
 
 
+def get_service_mapping_rows(db: Session, user_id: int) -> list[tuple[int, str, int, str]]:
+    """Returns [(id, keyword, category_id, category_name), ...] without loading ORM objects."""
+    return db.execute(
+        select(ServiceMapping.id, ServiceMapping.keyword, ServiceMapping.category_id, Category.name)
+        .join(Category, ServiceMapping.category_id == Category.id)
+        .where(ServiceMapping.user_id == user_id)
+        .order_by(ServiceMapping.id)
+    ).all()
+
+
 def add_service_mapping(db: Session, user_id: int, keyword: str, category_id: int) -> ServiceMapping | None:
     """Returns None if keyword already exists for this user."""
     keyword = keyword.strip().lower()
-    if db.query(ServiceMapping).filter_by(user_id=user_id, keyword=keyword).first():
-        return None
-    mapping = ServiceMapping(user_id=user_id, keyword=keyword, category_id=category_id)
-    db.add(mapping)
+    mapping = db.scalars(
+        _insert(db)(ServiceMapping).values(user_id=user_id, keyword=keyword, category_id=category_id)
+        .on_conflict_do_nothing(index_elements=[ServiceMapping.user_id, ServiceMapping.keyword])
+        .returning(ServiceMapping)
+    ).first()
+    if mapping is not None:
+        mark_written(db, user_id, "service_mappings")
+        promote_staged_rows(db, user_id, keyword, category_id)
     db.commit()
-    db.refresh(mapping)
     return mapping
 
 
 def remove_service_mapping_by_id(db: Session, user_id: int, mapping_id: int) -> bool:
-    mapping = db.query(ServiceMapping).filter_by(id=mapping_id, user_id=user_id).first()
+    mapping = db.scalars(_mapping_by_id, {"mapping_id": mapping_id, "user_id": user_id}).first()
     if not mapping:
         return False
     db.delete(mapping)
@@ -128,7 +240,7 @@ def remove_service_mapping_by_id(db: Session, user_id: int, mapping_id: int) ->
 
 def remove_service_mapping(db: Session, user_id: int, keyword: str) -> bool:
     keyword = keyword.strip().lower()
-    mapping = db.query(ServiceMapping).filter_by(user_id=user_id, keyword=keyword).first()
+    mapping = db.scalars(_mapping_by_keyword, {"user_id": user_id, "keyword": keyword}).first()
     if not mapping:
         return False
     db.delete(mapping)
@@ -141,14 +253,17 @@ def get_category_for_service(db: Session, user_id: int, service_name: str) -> Ca
     service_lower = service_name.strip().lower()
     for mapping in get_service_mappings(db, user_id):
         if mapping.keyword in service_lower:
-            return db.query(Category).filter_by(id=mapping.category_id).first()
+            return db.get(Category, mapping.category_id)
     return None
 
 
 # ── Expenses ───────────────────────────────────────────────────────────────
 
 def get_expense(db: Session, user_id: int, expense_id: int) -> Expense | None:
-    return db.query(Expense).filter_by(id=expense_id, user_id=user_id).first()
+    return db.scalars(_expense_by_id, {"expense_id": expense_id, "user_id": user_id}).first()
+
+
+EXPENSE_ROW_FIELDS = ("id", "amount", "expense_date", "category_id", "category_name", "note", "import_ref")
 
 
 def get_expenses_paginated(
@@ -159,17 +274,41 @@ def get_expenses_paginated(
     category_id: int | None = None,
     start_date: date | None = None,
     end_date: date | None = None,
-) -> tuple[list[Expense], int]:
-    q = db.query(Expense).filter(Expense.user_id == user_id)
+    q: str | None = None,
+) -> tuple[list[tuple], int]:
+    """Returns (rows, total). Rows are plain tuples in EXPENSE_ROW_FIELDS order —
+    only the needed columns are selected, so no Expense objects are hydrated.
+    `q` searches notes through the full-text index (see search.py)."""
+    conditions = [Expense.user_id == user_id]
+    if q:
+        note_match = search.match_notes(db.get_bind().dialect.name, q)
+        if note_match is not None:
+            conditions.append(note_match)
     if category_id is not None:
-        q = q.filter(Expense.category_id == category_id)
+        conditions.append(Expense.category_id == category_id)
     if start_date:
-        q = q.filter(Expense.expense_date >= start_date)
+        conditions.append(Expense.expense_date >= start_date)
     if end_date:
-        q = q.filter(Expense.expense_date <= end_date)
-    total = q.count()
-    items = q.order_by(Expense.expense_date.desc(), Expense.id.desc()).offset((page - 1) * page_size).limit(page_size).all()
-    return items, total
+        conditions.append(Expense.expense_date <= end_date)
+
+    total = db.execute(select(func.count()).select_from(Expense).where(*conditions)).scalar_one()
+    rows = db.execute(
+        select(
+            Expense.id,
+            Expense.amount,
+            Expense.expense_date,
+            Category.id,  # NULL while a deleted category is being purged
+            Category.name,
+            Expense.note,
+            Expense.import_ref,
+        )
+        .outerjoin(Category, _expense_category)
+        .where(*conditions)
+        .order_by(Expense.expense_date.desc(), Expense.id.desc())
+        .offset((page - 1) * page_size)
+        .limit(page_size)
+    ).all()
+    return rows, total
 
 
 def update_expense(
@@ -180,6 +319,7 @@ def update_expense(
     expense_date: date | None = None,
     note: str | None = None,
 ) -> Expense:
+    old_date, old_amount = expense.expense_date, expense.amount
     if amount is not None:
         expense.amount = amount
     if category_id is not None:
@@ -188,12 +328,20 @@ def update_expense(
         expense.expense_date = expense_date
     if note is not None:
         expense.note = note
+    if (old_date, old_amount) != (expense.expense_date, expense.amount):
+        _add_month_spend(db, expense.user_id, old_date, -old_amount)
+        _add_month_spend(db, expense.user_id, expense.expense_date, expense.amount)
+    touch_data_version(db, expense.user_id)
     db.commit()
     db.refresh(expense)
     return expense
 
 
 def delete_expense(db: Session, expense: Expense) -> None:
+    _add_month_spend(db, expense.user_id, expense.expense_date, -expense.amount)
+    touch_data_version(db, expense.user_id)
+    if expense.import_ref is not None:  # a re-import may bring the row back
+        db.execute(delete(ImportRef).where(ImportRef.user_id == expense.user_id, ImportRef.import_ref == expense.import_ref))
     db.delete(expense)
     db.commit()
 
@@ -249,13 +397,33 @@ def create_expense(
         note=note,
     )
     db.add(expense)
+    _add_month_spend(db, user_id, expense.expense_date, amount)
+    touch_data_version(db, user_id)
     db.commit()
     db.refresh(expense)
     return expense
 
 
+def has_expenses(db: Session, user_id: int) -> bool:
+    return db.scalar(_has_expenses, {"user_id": user_id})
+
+
 def import_ref_exists(db: Session, user_id: int, import_ref: str) -> bool:
-    return db.query(Expense).filter_by(user_id=user_id, import_ref=import_ref).first() is not None
+    return db.scalar(_import_ref_taken, {"user_id": user_id, "import_ref": import_ref})
+
+
+def create_expenses(db: Session, user_id: int, items: list[tuple[int, int]], expense_date: date | None = None) -> int:
+    """Saves (category_id, amount) pairs in one transaction; returns their total."""
+    expense_date = expense_date or date.today()
+    db.add_all([
+        Expense(user_id=user_id, category_id=category_id, amount=amount, expense_date=expense_date)
+        for category_id, amount in items
+    ])
+    total = sum(amount for _, amount in items)
+    _add_month_spend(db, user_id, expense_date, total)
+    touch_data_version(db, user_id)
+    db.commit()
+    return total
 
 
 def create_imported_expense(
@@ -265,18 +433,41 @@ def create_imported_expense(
     amount: int,
     expense_date: date,
     import_ref: str,
-) -> Expense:
-    expense = Expense(
-        user_id=user_id,
-        category_id=category_id,
-        amount=amount,
-        expense_date=expense_date,
-        import_ref=import_ref,
-    )
-    db.add(expense)
-    db.commit()
-    db.refresh(expense)
-    return expense
+) -> int | None:
+    """Returns the new expense id, or None if the row was imported before, whatever
+    its date (no commit). Spend and the data version are left to the caller; see
+    add_imported_spend."""
+    if not claim_import_ref(db, user_id, import_ref):
+        return None
+    return db.execute(
+        Expense.__table__.insert().values(
+            user_id=user_id,
+            category_id=category_id,
+            amount=amount,
+            expense_date=expense_date,
+            import_ref=import_ref,
+        ).returning(Expense.id)
+    ).scalar_one()
+
+
+def claim_import_ref(db: Session, user_id: int, import_ref: str) -> bool:
+    """Records the ref as imported; False if it already was (no commit). A concurrent
+    claim of the same ref waits on the first one's transaction, so only one wins."""
+    return db.execute(
+        _insert(db)(ImportRef).values(user_id=user_id, import_ref=import_ref)
+        .on_conflict_do_nothing(index_elements=[ImportRef.user_id, ImportRef.import_ref])
+        .returning(ImportRef.import_ref)
+    ).scalar() is not None
+
+
+def add_imported_spend(db: Session, user_id: int, by_month: dict[date, int]) -> None:
+    """Adds a batch of imported expenses' {month: total} to the running totals and
+    bumps the data version once, in the caller's transaction (no commit)."""
+    if not by_month:
+        return
+    for month, total in by_month.items():
+        _add_month_spend(db, user_id, month, total)
+    touch_data_version(db, user_id)
 
 
 def get_expenses_summary(
@@ -292,7 +483,7 @@ def get_expenses_summary(
             func.coalesce(Category.name, "Uncategorized").label("cat_name"),
             func.sum(Expense.amount).label("total"),
         )
-        .outerjoin(Category, Expense.category_id == Category.id)
+        .outerjoin(Category, _expense_category)
         .filter(
             Expense.user_id == user_id,
             Expense.expense_date >= start_date,
@@ -303,3 +494,293 @@ def get_expenses_summary(
         .all()
     )
     return [(row.cat_name, row.total) for row in rows]
+
+
+def get_multi_period_summary(
+    db: Session,
+    user_id: int,
+    ranges: list[tuple[date, date]],
+) -> list[list[tuple[str, int]]]:
+    """get_expenses_summary for several (start, end) ranges at once: one scan with a
+    conditional SUM per range. Returns one [(category_name, total), ...] list per
+    range, in input order, each ordered by total desc."""
+    if not ranges:
+        return []
+    cat_name = func.coalesce(Category.name, "Uncategorized").label("cat_name")
+    sums = [
+        func.sum(case((Expense.expense_date.between(start, end), Expense.amount), else_=0))
+        for start, end in ranges
+    ]
+    rows = db.execute(
+        select(cat_name, *sums)
+        .outerjoin(Category, _expense_category)
+        .where(Expense.user_id == user_id, or_(*(Expense.expense_date.between(s, e) for s, e in ranges)))
+        .group_by("cat_name")
+    ).all()
+    results = []
+    for i in range(len(ranges)):
+        totals = [(row[0], row[i + 1]) for row in rows if row[i + 1]]
+        results.append(sorted(totals, key=lambda item: -item[1]))
+    return results
+
+
+def get_daily_category_totals(
+    db: Session,
+    user_id: int,
+    start_date: date,
+    end_date: date,
+) -> list[tuple[date, str, int]]:
+    """Returns [(expense_date, category_name, total), ...] — one row per day and category."""
+    cat_name = func.coalesce(Category.name, "Uncategorized").label("cat_name")
+    return db.execute(
+        select(Expense.expense_date, cat_name, func.sum(Expense.amount))
+        .outerjoin(Category, _expense_category)
+        .where(Expense.user_id == user_id, Expense.expense_date >= start_date, Expense.expense_date <= end_date)
+        .group_by(Expense.expense_date, "cat_name")
+    ).all()
+
+
+def _month_key(db: Session):
+    """'YYYY-MM' of expense_date, for grouping by month on either dialect."""
+    if db.get_bind().dialect.name == "postgresql":
+        return func.to_char(Expense.expense_date, "YYYY-MM")
+    return func.strftime("%Y-%m", Expense.expense_date)
+
+
+def get_dashboard_rollup(
+    db: Session,
+    user_id: int,
+    ranges: list[tuple[date, date]],
+) -> list[tuple[str, str, int, int]]:
+    """Returns [(YYYY-MM, category_name, total, count), ...] for expenses in any of
+    the date ranges — one scan serves both the month breakdown and the trend."""
+    month = _month_key(db).label("month")
+    cat_name = func.coalesce(Category.name, "Uncategorized").label("cat_name")
+    in_ranges = or_(*(Expense.expense_date.between(start, end) for start, end in ranges))
+    return db.execute(
+        select(month, cat_name, func.sum(Expense.amount), func.count())
+        .outerjoin(Category, _expense_category)
+        .where(Expense.user_id == user_id, in_ranges)
+        .group_by("month", "cat_name")
+    ).all()
+
+
+# ── Staged import rows ─────────────────────────────────────────────────────
+
+def stage_import_row(db: Session, user_id: int, import_ref: str, service: str, amount: int, expense_date: date) -> None:
+    """Keeps an unmatched imported row for later (no commit; already-staged refs are ignored)."""
+    mark_written(db, user_id, "staged_import_rows")
+    stmt = _insert(db)(StagedImportRow).values(
+        user_id=user_id, import_ref=import_ref, service=service, service_key=service.strip().lower(),
+        amount=amount, expense_date=expense_date,
+    )
+    db.execute(stmt.on_conflict_do_nothing(index_elements=[StagedImportRow.user_id, StagedImportRow.import_ref]))
+
+
+def _staged_matching(user_id: int, keyword: str):
+    return (
+        StagedImportRow.user_id == user_id,
+        StagedImportRow.service_key.contains(keyword, autoescape=True),
+    )
+
+
+def promote_staged_rows(db: Session, user_id: int, keyword: str, category_id: int) -> int:
+    """Moves staged rows whose service contains `keyword` into expenses with set-based
+    INSERT ... SELECT / DELETE statements. Runs in the caller's transaction.
+    Their import_refs are claimed first, so a row imported meanwhile is skipped."""
+    matching = _staged_matching(user_id, keyword)
+    already_imported = select(ImportRef.import_ref).where(
+        ImportRef.user_id == user_id, ImportRef.import_ref == StagedImportRow.import_ref,
+    ).exists()
+
+    claimed = db.execute(
+        _insert(db)(ImportRef).from_select(
+            ["user_id", "import_ref"],
+            select(StagedImportRow.user_id, StagedImportRow.import_ref).where(*matching, ~already_imported),
+        )
+        .on_conflict_do_nothing(index_elements=[ImportRef.user_id, ImportRef.import_ref])
+        .returning(ImportRef.import_ref)
+    ).scalars().all()
+    if not claimed:
+        return 0
+    promoted = (*matching, StagedImportRow.import_ref.in_(claimed))
+    staged = db.execute(select(StagedImportRow.expense_date, StagedImportRow.amount).where(*promoted)).all()
+    by_month: dict[date, int] = {}
+    for expense_date, amount in staged:
+        month = expense_date.replace(day=1)
+        by_month[month] = by_month.get(month, 0) + amount
+    for month, total in by_month.items():
+        _add_month_spend(db, user_id, month, total)
+
+    db.execute(Expense.__table__.insert().from_select(
+        ["user_id", "category_id", "amount", "expense_date", "import_ref"],
+        select(
+            StagedImportRow.user_id, literal(category_id), StagedImportRow.amount,
+            StagedImportRow.expense_date, StagedImportRow.import_ref,
+        ).where(*promoted),
+    ))
+    db.execute(delete(StagedImportRow).where(*matching))
+    mark_written(db, user_id, "staged_import_rows")
+    touch_data_version(db, user_id)
+    return len(staged)
+
+
+def get_staged_rows(
+    db: Session,
+    user_id: int,
+    page: int = 1,
+    page_size: int = 50,
+) -> tuple[list[tuple], int]:
+    """Returns (rows, total); rows are (id, service, amount, expense_date, import_ref), newest first."""
+    total = db.execute(
+        select(func.count()).select_from(StagedImportRow).where(StagedImportRow.user_id == user_id)
+    ).scalar_one()
+    rows = db.execute(
+        select(
+            StagedImportRow.id, StagedImportRow.service, StagedImportRow.amount,
+            StagedImportRow.expense_date, StagedImportRow.import_ref,
+        )
+        .where(StagedImportRow.user_id == user_id)
+        .order_by(StagedImportRow.expense_date.desc(), StagedImportRow.id.desc())
+        .offset((page - 1) * page_size)
+        .limit(page_size)
+    ).all()
+    return rows, total
+
+
+def get_staged_services(db: Session, user_id: int, limit: int = 20) -> list[tuple[str, int, int]]:
+    """Returns [(service, row_count, total_amount), ...] for staged rows, most rows first."""
+    return db.execute(
+        select(StagedImportRow.service, func.count(), func.sum(StagedImportRow.amount))
+        .where(StagedImportRow.user_id == user_id)
+        .group_by(StagedImportRow.service)
+        .order_by(func.count().desc(), StagedImportRow.service)
+        .limit(limit)
+    ).all()
+
+
+# ── Data versions ──────────────────────────────────────────────────────────
+
+def touch_data_version(db: Session, user_id: int) -> None:
+    """Bumps the user's data version in the caller's transaction (no commit)."""
+    mark_written(db, user_id, "expenses")
+    stmt = _insert(db)(DataVersion).values(user_id=user_id, version=1)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[DataVersion.user_id],
+        set_={"version": DataVersion.version + 1},
+    ))
+
+
+def get_data_version(db: Session, user_id: int) -> int:
+    version = db.execute(select(DataVersion.version).where(DataVersion.user_id == user_id)).scalar()
+    return version or 0
+
+
+# ── Month-to-date spend ────────────────────────────────────────────────────
+
+def _add_month_spend(db: Session, user_id: int, expense_date: date, delta: int) -> None:
+    """Adjusts the running total in the caller's transaction (no commit)."""
+    insert = _insert(db)
+    stmt = insert(MonthlySpend).values(user_id=user_id, month=expense_date.replace(day=1), total=delta)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[MonthlySpend.user_id, MonthlySpend.month],
+        set_={"total": MonthlySpend.total + stmt.excluded.total},
+    ))
+
+
+def get_month_spend(db: Session, user_id: int, month: date) -> int:
+    total = db.execute(
+        select(MonthlySpend.total).where(MonthlySpend.user_id == user_id, MonthlySpend.month == month.replace(day=1))
+    ).scalar()
+    return total or 0
+
+
+def rebuild_import_refs(db: Session, user_id: int | None = None) -> None:
+    """Claims the import_refs of existing expenses, for one user or everyone (no commit)."""
+    source = select(Expense.user_id, Expense.import_ref).where(Expense.import_ref.is_not(None)).distinct()
+    if user_id is not None:
+        source = source.where(Expense.user_id == user_id)
+    db.execute(
+        _insert(db)(ImportRef).from_select(["user_id", "import_ref"], source)
+        .on_conflict_do_nothing(index_elements=[ImportRef.user_id, ImportRef.import_ref])
+    )
+
+
+def rebuild_monthly_spend(db: Session, user_id: int | None = None) -> None:
+    """Recomputes running totals from raw expenses, for one user or everyone."""
+    if db.get_bind().dialect.name == "postgresql":
+        month = cast(func.date_trunc("month", Expense.expense_date), Date)
+    else:
+        month = func.date(Expense.expense_date, "start of month")
+    source = select(Expense.user_id, month.label("month"), func.sum(Expense.amount)).group_by(Expense.user_id, "month")
+    cleared = db.query(MonthlySpend)
+    if user_id is not None:
+        source = source.where(Expense.user_id == user_id)
+        cleared = cleared.filter_by(user_id=user_id)
+    cleared.delete()
+    db.execute(MonthlySpend.__table__.insert().from_select(["user_id", "month", "total"], source))
+    db.commit()
+
+
+def get_budget_status(db: Session, user: User, month: date, added: int = 0) -> tuple[int, int | None] | None:
+    """Returns (remaining, crossed) for the month, or None if the user has no budget.
+    `crossed` is the highest BUDGET_THRESHOLDS percentage that the last `added`
+    amount pushed the month's spend past, if any."""
+    if not user.budget:
+        return None
+    after = get_month_spend(db, user.id, month)
+    before = after - added
+    crossed = [t for t in BUDGET_THRESHOLDS if before * 100 < user.budget * t <= after * 100]
+    return user.budget - after, (crossed[-1] if crossed else None)
+
+
+# ── Digests ────────────────────────────────────────────────────────────────
+
+def get_digest_periods(db: Session, user_id: int) -> list[str]:
+    return list(db.execute(
+        select(DigestSubscription.period).where(DigestSubscription.user_id == user_id)
+    ).scalars())
+
+
+def subscribe_digest(db: Session, user_id: int, period: str) -> bool:
+    """Returns False if the user is already subscribed to this period."""
+    if period in get_digest_periods(db, user_id):
+        return False
+    db.add(DigestSubscription(user_id=user_id, period=period))
+    db.commit()
+    return True
+
+
+def unsubscribe_digest(db: Session, user_id: int, period: str) -> bool:
+    deleted = db.query(DigestSubscription).filter_by(user_id=user_id, period=period).delete()
+    mark_written(db, user_id, "digest_subscriptions")
+    db.commit()
+    return deleted > 0
+
+
+def get_digest_summaries(
+    db: Session,
+    period: str,
+    start_date: date,
+    end_date: date,
+) -> dict[int, list[tuple[str, int]]]:
+    """Category breakdown for every user subscribed to `period`, from one grouped query.
+    Returns {user_id: [(category_name, total), ...]} ordered by total desc;
+    subscribers with no expenses in the range are absent."""
+    cat_name = func.coalesce(Category.name, "Uncategorized").label("cat_name")
+    total = func.sum(Expense.amount)
+    rows = db.execute(
+        select(Expense.user_id, cat_name, total.label("total"))
+        .join(
+            DigestSubscription,
+            (DigestSubscription.user_id == Expense.user_id) & (DigestSubscription.period == period),
+        )
+        .outerjoin(Category, _expense_category)
+        .where(Expense.expense_date >= start_date, Expense.expense_date <= end_date)
+        .group_by(Expense.user_id, "cat_name")
+        .order_by(Expense.user_id, total.desc())
+    )
+    summaries: dict[int, list[tuple[str, int]]] = {}
+    for user_id, name, amount in rows:
+        summaries.setdefault(user_id, []).append((name, amount))
+    return summaries
@@ -0,0 +1,73 @@
+"""Full-text index over Expense.note.
+
+SQLite: an external-content FTS5 table kept in sync by triggers, so every
+write path (ORM, bulk INSERT ... SELECT, deletes) is covered.
+Postgres: a GIN expression index on to_tsvector(note); the planner uses it for
+the matching expression in match_notes(), and Postgres maintains it itself.
+"""
+import re
+
+from sqlalchemy import func, inspect, select, text
+
+from .models import Expense
+
+FTS_TABLE = "expense_notes_fts"
+PG_CONFIG = "simple"  # no stemming: notes are short and in mixed languages
+
+_SQLITE_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(note, content='expenses', content_rowid='id')",
+    f"""CREATE TRIGGER IF NOT EXISTS expenses_fts_ai AFTER INSERT ON expenses WHEN new.note IS NOT NULL BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, note) VALUES (new.id, new.note);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS expenses_fts_ad AFTER DELETE ON expenses WHEN old.note IS NOT NULL BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, note) VALUES ('delete', old.id, old.note);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS expenses_fts_au AFTER UPDATE OF note ON expenses BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, note) SELECT 'delete', old.id, old.note WHERE old.note IS NOT NULL;
+        INSERT INTO {FTS_TABLE}(rowid, note) SELECT new.id, new.note WHERE new.note IS NOT NULL;
+    END""",
+]
+
+_PG_DDL = [
+    f"CREATE INDEX IF NOT EXISTS ix_expenses_note_fts ON expenses "
+    f"USING gin (to_tsvector('{PG_CONFIG}', coalesce(note, '')))",
+]
+
+
+def install(engine) -> None:
+    """Creates the index (idempotent); a fresh SQLite FTS table is backfilled."""
+    with engine.begin() as conn:
+        if engine.dialect.name == "postgresql":
+            for ddl in _PG_DDL:
+                conn.execute(text(ddl))
+            return
+        is_new = not inspect(conn).has_table(FTS_TABLE)
+        for ddl in _SQLITE_DDL:
+            conn.execute(text(ddl))
+        if is_new:
+            conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+
+
+def _terms(query: str) -> list[str]:
+    # Only word characters reach the engine, so user input can't inject query syntax.
+    return re.findall(r"\w+", query.lower())
+
+
+def match_notes(dialect_name: str, query: str):
+    """WHERE clause matching expenses whose note contains every word of `query`
+    as a word prefix, or None when the query has no searchable words."""
+    terms = _terms(query)
+    if not terms:
+        return None
+    if dialect_name == "postgresql":
+        tsquery = " & ".join(f"{t}:*" for t in terms)
+        return func.to_tsvector(PG_CONFIG, func.coalesce(Expense.note, "")).op("@@")(
+            func.to_tsquery(PG_CONFIG, tsquery)
+        )
+    fts_query = " ".join(f'"{t}"*' for t in terms)
+    matching_ids = (
+        select(text("rowid"))
+        .select_from(text(FTS_TABLE))
+        .where(text(f"{FTS_TABLE} MATCH :fts_query").bindparams(fts_query=fts_query))
+    )
+    return Expense.id.in_(matching_ids)
@@ -1,19 +1,279 @@
+import itertools
+import logging
 import os
-from sqlalchemy import create_engine
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Iterator
+
+from sqlalchemy import and_, create_engine, delete, event, func, inspect, select, text, update
+from sqlalchemy.exc import DBAPIError, IntegrityError
 from sqlalchemy.orm import sessionmaker
-from .models import Base
+from sqlalchemy.schema import CreateColumn, CreateIndex
+
+from app import events
+from app.config import DATABASE_SHARDS, READ_REPLICA_URLS, READ_STICKY_SECONDS, REPLICA_RETRY_SECONDS
+from .models import Base, User
+from . import partitions, search
+
+log = logging.getLogger(__name__)
 
 DB_URL = os.getenv("DATABASE_URL")
-if not DB_URL:
-    raise RuntimeError("DATABASE_URL environment variable is not set")
+STICKY_MAX_USERS = 10000
+
+# Created on first use (see get_engine) so importing this module never loads a DB driver.
+engine = None
+shard_engines: list = []  # just [engine] unless DATABASE_SHARDS > 1
+read_engines: list = []
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+
+_replica_down_until: dict[int, float] = {}
+_next_replica = itertools.count()
+_last_write: OrderedDict = OrderedDict()  # user_id -> monotonic time of last commit
+_last_write_lock = threading.Lock()
+
+
+def _create_engine(url: str):
+    engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False} if url.startswith("sqlite") else {},
+        pool_pre_ping=True,
+    )
+    if url.startswith("sqlite"):
+        event.listen(engine, "connect", _sqlite_foreign_keys)
+    return engine
+
+
+def _sqlite_foreign_keys(dbapi_connection, connection_record):
+    # Off by default in SQLite, which would skip ON DELETE SET NULL / CASCADE.
+    dbapi_connection.execute("PRAGMA foreign_keys = ON")
+
+
+def shard_urls(url: str, shards: int) -> list[str]:
+    """`DATABASE_URL` itself for one shard; otherwise sibling SQLite files
+    (fintrack.db → fintrack.shard0.db, fintrack.shard1.db, ...)."""
+    if shards == 1:
+        return [url]
+    if not url.startswith("sqlite:///"):
+        raise RuntimeError("DATABASE_SHARDS > 1 requires a sqlite:/// DATABASE_URL")
+    root, ext = os.path.splitext(url)
+    return [f"{root}.shard{i}{ext or '.db'}" for i in range(shards)]
+
+
+def shard_index(user_id: int, shards: int) -> int:
+    return zlib.crc32(user_id.to_bytes(8, "big", signed=True)) % shards
+
+
+def get_engine():
+    """The primary engine (shard 0 when sharded)."""
+    global engine
+    if engine is None:
+        if not DB_URL:
+            raise RuntimeError("DATABASE_URL environment variable is not set")
+        shard_engines[:] = [_create_engine(url) for url in shard_urls(DB_URL, DATABASE_SHARDS)]
+        engine = shard_engines[0]
+        if len(shard_engines) == 1:
+            read_engines[:] = [_create_engine(url) for url in READ_REPLICA_URLS]
+            SessionLocal.configure(bind=engine)
+        # Sharded: SessionLocal stays unbound, so a session that wasn't routed fails loudly.
+    return engine
+
+
+def UserSession(user_id: int):
+    """Session on the database holding `user_id`'s data."""
+    get_engine()
+    if len(shard_engines) == 1:
+        return SessionLocal()
+    return SessionLocal(bind=shard_engines[shard_index(user_id, len(shard_engines))])
+
+
+def shard_sessions() -> Iterator:
+    """One session per shard (a single one when unsharded), for work across users.
+    Each is closed once the loop moves past it."""
+    get_engine()
+    for shard in shard_engines:
+        db = SessionLocal(bind=shard)
+        try:
+            yield db
+        finally:
+            db.close()
+
+
+# ── Write tracking: read-your-writes and change events ─────────────────────
+
+def mark_written(db, user_id: int, table: str) -> None:
+    """Records a change to the user's rows in `table`; once the session commits it
+    pins their reads to the primary and is published as a change event.
+    ORM changes are picked up automatically, Core DML has to call this."""
+    db.info.setdefault("written", {}).setdefault(user_id, set()).add(table)
+
 
-engine = create_engine(
-    DB_URL,
-    connect_args={"check_same_thread": False} if DB_URL.startswith("sqlite") else {},
-    pool_pre_ping=True,
-)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+@event.listens_for(SessionLocal, "after_flush")
+def _collect_writers(db, flush_context):
+    for obj in itertools.chain(db.new, db.dirty, db.deleted):
+        user_id = obj.id if isinstance(obj, User) else getattr(obj, "user_id", None)
+        if user_id is not None:
+            mark_written(db, user_id, obj.__tablename__)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _stamp_writers(db):
+    written = db.info.pop("written", None)
+    if not written:
+        return
+    now = time.monotonic()
+    with _last_write_lock:
+        for user_id in written:
+            _last_write[user_id] = now
+            _last_write.move_to_end(user_id)
+        while len(_last_write) > STICKY_MAX_USERS:
+            _last_write.popitem(last=False)
+    for user_id, tables in written.items():
+        events.publish(user_id, tables)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _forget_writers(db):
+    db.info.pop("written", None)
+
+
+def _recently_wrote(user_id: int | None) -> bool:
+    if user_id is None:
+        return False
+    with _last_write_lock:
+        written_at = _last_write.get(user_id)
+    return written_at is not None and time.monotonic() - written_at < READ_STICKY_SECONDS
+
+
+def ReadSession(user_id: int | None = None):
+    """Session for read-only work: on a healthy replica when any are configured,
+    otherwise — or right after `user_id` wrote something — on the primary.
+    Replicas aren't used in sharded mode; reads go to the user's shard."""
+    get_engine()
+    if len(shard_engines) > 1:
+        return UserSession(user_id)
+    if not read_engines or _recently_wrote(user_id):
+        return SessionLocal()
+    for _ in range(len(read_engines)):
+        i = next(_next_replica) % len(read_engines)
+        if _replica_down_until.get(i, 0) > time.monotonic():
+            continue
+        db = SessionLocal(bind=read_engines[i])
+        try:
+            db.connection()  # checks out (and pings) a connection now, so failures fall back here
+            return db
+        except DBAPIError:
+            db.close()
+            log.warning("Read replica %d unavailable, using the primary for %.0fs", i, REPLICA_RETRY_SECONDS)
+            _replica_down_until[i] = time.monotonic() + REPLICA_RETRY_SECONDS
+    return SessionLocal()
+
+
+def add_missing_columns(engine) -> None:
+    """Nullable model columns missing from tables created before they were declared."""
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing and column.nullable:
+                ddl = CreateColumn(column).compile(dialect=engine.dialect)
+                with engine.begin() as conn:
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+
+
+def _sqlite_clear_orphans(engine) -> None:
+    """Applies the ON DELETE actions SQLite skipped while foreign keys were off."""
+    with engine.begin() as conn:
+        conn.execute(text(
+            "UPDATE expenses SET category_id = NULL WHERE category_id IS NOT NULL "
+            "AND category_id NOT IN (SELECT id FROM categories)"
+        ))
+        conn.execute(text("DELETE FROM service_mappings WHERE category_id NOT IN (SELECT id FROM categories)"))
+
+
+def _dedupe(conn, index) -> int:
+    """Deletes rows that duplicate an earlier one on a unique index's columns (the
+    lowest id survives), first repointing foreign keys at them to the survivor.
+    Rows with a NULL in the indexed columns never conflict and are left alone."""
+    table = index.table
+    columns = list(index.columns)
+    present = and_(*(c.is_not(None) for c in columns))
+    keepers = select(func.min(table.c.id)).where(present).group_by(*columns)
+    dupes = select(table.c.id).where(present, table.c.id.not_in(keepers))
+    for referencing in Base.metadata.sorted_tables:
+        for fk in referencing.foreign_keys:
+            if fk.column.table is not table:
+                continue
+            kept, dupe = table.alias("kept"), table.alias("dupe")
+            survivor = (
+                select(func.min(kept.c.id))
+                .where(dupe.c.id == fk.parent, *(kept.c[c.name] == dupe.c[c.name] for c in columns))
+                .scalar_subquery()
+            )
+            conn.execute(update(referencing).where(fk.parent.in_(dupes)).values({fk.parent.name: survivor}))
+    return conn.execute(delete(table).where(table.c.id.in_(dupes))).rowcount
+
+
+def create_indexes(engine) -> set[str]:
+    """Model indexes missing from tables created before they were declared. A unique
+    index that existing duplicates block is retried once they are removed (see
+    _dedupe); returns the names of tables that lost rows that way."""
+    deduped = set()
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                with engine.begin() as conn:
+                    conn.execute(CreateIndex(index, if_not_exists=True))
+            except IntegrityError:
+                # Dedupe and retry in one transaction; if the index still fails, startup does too.
+                with engine.begin() as conn:
+                    removed = _dedupe(conn, index)
+                    conn.execute(CreateIndex(index, if_not_exists=True))
+                log.warning("Removed %d duplicate %s rows to create %s", removed, table.name, index.name)
+                deduped.add(table.name)
+    return deduped
+
+
+# Indexes the models no longer declare, dropped by init_schema.
+RETIRED_INDEXES = ("uq_expenses_user_import_ref",)  # replaced by the import_refs table
+
+
+def init_schema(engine) -> None:
+    """Creates/updates the schema on one database; idempotent."""
+    backfill_spend = not inspect(engine).has_table("monthly_spend")
+    backfill_refs = not inspect(engine).has_table("import_refs")
+    Base.metadata.create_all(bind=engine, tables=partitions.regular_tables(engine))
+    partitions.install(engine)
+    add_missing_columns(engine)
+    deduped = create_indexes(engine)
+    with engine.begin() as conn:
+        for name in RETIRED_INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+    if engine.dialect.name == "sqlite":
+        _sqlite_clear_orphans(engine)
+    search.install(engine)
+    if backfill_spend or backfill_refs or "expenses" in deduped:
+        from . import repo
+        db = SessionLocal(bind=engine)
+        try:
+            if backfill_refs:
+                repo.rebuild_import_refs(db)
+                db.commit()
+            if backfill_spend or "expenses" in deduped:
+                repo.rebuild_monthly_spend(db)
+        finally:
+            db.close()
 
 
 def init_db():
-    Base.metadata.create_all(bind=engine)
+    """Runs init_schema on every shard."""
+    get_engine()
+    for shard in shard_engines:
+        init_schema(shard)
+
+
+if __name__ == "__main__":
+    init_db()
@@ -0,0 +1,99 @@
+"""Admin tool for sharded SQLite storage (DATABASE_SHARDS > 1).
+
+    python -m app.db.shards status           # users per shard
+    python -m app.db.shards rebalance 1      # after changing DATABASE_SHARDS from 1
+
+rebalance moves every user whose shard changed from the old layout to the
+current one. A user is copied first (replacing any partial copy from an
+interrupted run), then deleted from the old file, so it is safe to re-run.
+Stop the app while it runs.
+"""
+import argparse
+
+from sqlalchemy import delete, func, insert, select
+
+from app.config import DATABASE_SHARDS
+from .models import Base, User
+from .session import DB_URL, _create_engine, init_schema, shard_index, shard_urls
+
+BATCH_SIZE = 5000
+
+
+def _owner_column(table):
+    return table.c.id if table.name == "users" else table.c.user_id
+
+
+def _delete_user(conn, user_id: int) -> None:
+    for table in reversed(Base.metadata.sorted_tables):
+        conn.execute(delete(table).where(_owner_column(table) == user_id))
+
+
+def move_user(source, target, user_id: int) -> None:
+    """Copies every row of the user to `target`, then deletes them from `source`.
+    Surrogate ids are reassigned on the target; category ids are remapped."""
+    with source.connect() as src, target.begin() as dst:
+        _delete_user(dst, user_id)
+        category_ids: dict[int, int] = {}
+        for table in Base.metadata.sorted_tables:  # parents before children
+            # In key order, so re-inserted rows (categories in particular) keep their relative order.
+            rows = src.execute(
+                select(table).where(_owner_column(table) == user_id)
+                .order_by(*table.primary_key.columns).execution_options(yield_per=BATCH_SIZE)
+            )
+            for batch in rows.partitions():
+                batch = [dict(row._mapping) for row in batch]
+                if table.name == "categories":
+                    for row in batch:
+                        old_id = row.pop("id")
+                        category_ids[old_id] = dst.execute(insert(table).values(row).returning(table.c.id)).scalar_one()
+                    continue
+                for row in batch:
+                    if table.name != "users" and "id" in table.c:
+                        row.pop("id")
+                    if "category_id" in row and row["category_id"] is not None:
+                        row["category_id"] = category_ids.get(row["category_id"])
+                dst.execute(insert(table), batch)
+    with source.begin() as src:
+        _delete_user(src, user_id)
+
+
+def rebalance(old_shards: int, new_shards: int = DATABASE_SHARDS) -> int:
+    """Moves users from the `old_shards` layout to `new_shards`; returns how many moved."""
+    old_urls, new_urls = shard_urls(DB_URL, old_shards), shard_urls(DB_URL, new_shards)
+    engines = {url: _create_engine(url) for url in {*old_urls, *new_urls}}
+    for url in new_urls:
+        init_schema(engines[url])
+    moved = 0
+    for url in old_urls:
+        source = engines[url]
+        with source.connect() as conn:
+            user_ids = conn.execute(select(User.id)).scalars().all()
+        for user_id in user_ids:
+            target_url = new_urls[shard_index(user_id, new_shards)]
+            if target_url != url:
+                move_user(source, engines[target_url], user_id)
+                moved += 1
+    return moved
+
+
+def status() -> list[tuple[str, int]]:
+    result = []
+    for url in shard_urls(DB_URL, DATABASE_SHARDS):
+        with _create_engine(url).connect() as conn:
+            result.append((url, conn.execute(select(func.count()).select_from(User)).scalar()))
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m app.db.shards")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status", help="users per shard")
+    rebalance_cmd = commands.add_parser("rebalance", help=f"move users into the current {DATABASE_SHARDS}-shard layout")
+    rebalance_cmd.add_argument("old_shards", type=int, help="DATABASE_SHARDS the data was written with")
+    args = parser.parse_args()
+
+    if args.command == "status":
+        for url, users in status():
+            print(f"{url}: {users} users")
+    else:
+        print(f"Moved {rebalance(args.old_shards)} users")
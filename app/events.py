@@ -0,0 +1,88 @@
+"""In-process change notifications for SSE subscribers (per worker).
+
+Committed writes are published from session.py as (user_id, {table, ...}).
+Each subscription coalesces what changed into a set of table names until the
+client reads it, so its buffer is bounded by the number of tables however fast
+writes arrive. Publishing is thread-safe: repo code runs in worker threads,
+subscribers live on the event loop.
+"""
+import asyncio
+import threading
+
+from app.config import MAX_EVENT_CONNECTIONS, MAX_EVENT_CONNECTIONS_PER_USER
+
+
+class TooManySubscribers(Exception):
+    pass
+
+
+class Subscription:
+    __slots__ = ("user_id", "loop", "pending", "ready")
+
+    def __init__(self, user_id: int, loop: asyncio.AbstractEventLoop):
+        self.user_id = user_id
+        self.loop = loop
+        self.pending: set[str] = set()
+        self.ready = asyncio.Event()
+
+    def _push(self, tables: frozenset[str]) -> None:  # on the loop
+        self.pending |= tables
+        self.ready.set()
+
+    async def next(self, timeout: float) -> set[str] | None:
+        """Tables changed since the last call, or None after `timeout` idle seconds."""
+        try:
+            await asyncio.wait_for(self.ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        self.ready.clear()
+        changed, self.pending = self.pending, set()
+        return changed
+
+
+_subscribers: dict[int, set[Subscription]] = {}
+_lock = threading.Lock()
+_count = 0
+
+
+def subscribe(user_id: int) -> Subscription:
+    """Raises TooManySubscribers past the per-worker or per-user cap."""
+    global _count
+    sub = Subscription(user_id, asyncio.get_running_loop())
+    with _lock:
+        user_subs = _subscribers.get(user_id, set())
+        if _count >= MAX_EVENT_CONNECTIONS or len(user_subs) >= MAX_EVENT_CONNECTIONS_PER_USER:
+            raise TooManySubscribers
+        user_subs.add(sub)
+        _subscribers[user_id] = user_subs
+        _count += 1
+    return sub
+
+
+def unsubscribe(sub: Subscription) -> None:
+    global _count
+    with _lock:
+        user_subs = _subscribers.get(sub.user_id)
+        if user_subs and sub in user_subs:
+            user_subs.discard(sub)
+            _count -= 1
+            if not user_subs:
+                del _subscribers[sub.user_id]
+
+
+def publish(user_id: int, tables) -> None:
+    """Safe to call from any thread; a no-op when the user has no subscribers."""
+    with _lock:
+        subs = list(_subscribers.get(user_id, ()))
+    if not subs:
+        return
+    tables = frozenset(tables)
+    for sub in subs:
+        try:
+            sub.loop.call_soon_threadsafe(sub._push, tables)
+        except RuntimeError:  # loop already closed
+            unsubscribe(sub)
+
+
+def connection_count() -> int:
+    return _count
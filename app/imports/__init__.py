@@ -0,0 +1,20 @@
+"""File importers.
+
+Each importer module exposes:
+    NAME: str
+    detect(filename, head) -> bool     # head = first bytes of the file
+    iter_rows(path, options) -> Iterator[RawRow]
+
+Rows from every importer go through normalize.normalize_row, so all formats
+share the same date/amount handling and import_ref dedupe semantics.
+"""
+from . import click, csv_generic
+
+IMPORTERS = {importer.NAME: importer for importer in (click, csv_generic)}
+
+
+def detect_format(filename: str, head: bytes) -> str | None:
+    for name, importer in IMPORTERS.items():
+        if importer.detect(filename, head):
+            return name
+    return None
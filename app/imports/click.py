@@ -0,0 +1,49 @@
+"""Click payment-history export (.xlsx). Parsed inside import worker processes."""
+from datetime import datetime
+from typing import Iterator
+
+from .normalize import RawRow, UnrecognizedFormat
+
+NAME = "click_xlsx"
+
+REQUIRED_HEADERS = {"Сумма", "Время", "Карта", "Сервис", "Статус платежа"}
+SUCCESS_STATUS = "Успешно проведен"
+
+
+def detect(filename: str, head: bytes) -> bool:
+    # xlsx is a zip container; header names are checked when parsing.
+    return filename.lower().endswith(".xlsx") or head.startswith(b"PK\x03\x04")
+
+
+def iter_rows(path: str, options: dict | None = None) -> Iterator[RawRow]:
+    import openpyxl  # heavy; only loaded in the worker
+
+    # A file object rather than the path: openpyxl rejects paths without an .xlsx suffix.
+    f = open(path, "rb")
+    wb = openpyxl.load_workbook(f, read_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+
+        # Map header names to column indices
+        headers = {str(value).strip(): idx for idx, value in enumerate(next(rows, ()))}
+        if not REQUIRED_HEADERS.issubset(headers):
+            raise UnrecognizedFormat("Unrecognized file format. Expected Click export.")
+        i_status, i_time, i_card = headers["Статус платежа"], headers["Время"], headers["Карта"]
+        i_service, i_amount = headers["Сервис"], headers["Сумма"]
+
+        for row in rows:
+            if str(row[i_status]).strip() != SUCCESS_STATUS:
+                continue
+
+            time_val = row[i_time]
+            # Normalize time to string for import_ref
+            if isinstance(time_val, datetime):
+                time_str = time_val.strftime("%d.%m.%Y %H:%M:%S")
+            else:
+                time_str = str(time_val).strip()
+            card = str(row[i_card]).strip()
+
+            yield RawRow(f"{time_str}|{card}", time_val, str(row[i_service]), row[i_amount])
+    finally:
+        wb.close()
+        f.close()
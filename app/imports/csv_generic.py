@@ -0,0 +1,83 @@
+"""Generic CSV bank/wallet export with a configurable column mapping.
+
+options:
+    columns: {"date": ..., "amount": ..., "description": ..., "ref": ...}
+             header names in the file; "ref" is optional
+    date_format: strptime format, tried before the defaults (any importer)
+    negate: true when spending is exported as negative amounts
+"""
+import csv
+from collections import Counter
+from typing import Iterator
+
+from .normalize import RawRow, UnrecognizedFormat
+
+NAME = "csv"
+
+# Header names tried (case-insensitively) when no explicit mapping is given.
+GUESSES = {
+    "date": ("date", "time", "datetime", "transaction date", "дата", "время"),
+    "amount": ("amount", "sum", "total", "сумма"),
+    "description": ("description", "merchant", "service", "payee", "details", "сервис", "описание"),
+    "ref": ("id", "reference", "transaction id", "ref"),
+}
+
+
+def detect(filename: str, head: bytes) -> bool:
+    if filename.lower().endswith(".csv"):
+        return True
+    try:
+        first_line = head.decode("utf-8-sig").splitlines()[0]
+    except (UnicodeDecodeError, IndexError):
+        return False
+    return any(sep in first_line for sep in ",;\t")
+
+
+def _resolve_columns(header: list[str], explicit: dict) -> dict[str, int]:
+    lowered = {name.strip().lower(): idx for idx, name in enumerate(header)}
+    columns = {}
+    for field, guesses in GUESSES.items():
+        name = explicit.get(field)
+        candidates = (name,) if name else guesses
+        idx = next((lowered[c.strip().lower()] for c in candidates if c.strip().lower() in lowered), None)
+        if idx is not None:
+            columns[field] = idx
+        elif name or field != "ref":
+            raise UnrecognizedFormat(f"CSV column for '{field}' not found. Columns: {', '.join(header)}")
+    return columns
+
+
+def iter_rows(path: str, options: dict | None = None) -> Iterator[RawRow]:
+    options = options or {}
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        sample = f.read(8192)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        reader = csv.reader(f, dialect)
+        header = next(reader, None)
+        if not header:
+            raise UnrecognizedFormat("CSV file is empty.")
+        cols = _resolve_columns(header, options.get("columns") or {})
+        negate = bool(options.get("negate"))
+
+        # Without a ref column, identical rows are told apart by how many
+        # times they've been seen so far — stable across re-uploads.
+        seen = Counter()
+        for row in reader:
+            if not row:
+                continue
+            when, amount, description = row[cols["date"]], row[cols["amount"]], row[cols["description"]]
+            if negate:
+                amount = amount.strip()
+                amount = amount[1:] if amount.startswith("-") else f"-{amount}"
+            if "ref" in cols:
+                ref = f"csv|{row[cols['ref']].strip()}"
+            else:
+                key = (when.strip(), amount.strip(), description.strip())
+                seen[key] += 1
+                ref = f"csv|{'|'.join(key)}|{seen[key]}"
+            yield RawRow(ref, when, description, amount)
+
@@ -0,0 +1,54 @@
+from datetime import date, datetime
+from typing import NamedTuple
+
+
+class RawRow(NamedTuple):
+    """What an importer yields: values as found in the file."""
+    import_ref: str          # stable per source row; used to skip re-imported rows
+    when: object             # datetime | date | str
+    service: str
+    amount: object           # int | float | str
+
+
+# (import_ref, expense_date, service, amount) — compact enough to ship between
+# processes. expense_date/amount are None when unparseable; counted as unmatched.
+Row = tuple[str, date | None, str, int | None]
+
+DEFAULT_DATE_FORMATS = ("%d.%m.%Y %H:%M:%S", "%Y-%m-%d", "%Y-%m-%d %H:%M:%S", "%d.%m.%Y", "%d/%m/%Y")
+
+
+class UnrecognizedFormat(ValueError):
+    pass
+
+
+def parse_date(value, formats=DEFAULT_DATE_FORMATS) -> date | None:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    text = str(value).strip()
+    for fmt in formats:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def parse_amount(value) -> int | None:
+    """None for anything unparseable, including inf/nan cells."""
+    try:
+        if not isinstance(value, (int, float)):
+            value = float(str(value).replace(" ", "").replace(" ", "").replace(",", "."))
+        return round(value)
+    except (ValueError, OverflowError):
+        return None
+
+
+def date_formats(options: dict | None) -> tuple[str, ...]:
+    fmt = (options or {}).get("date_format")
+    return (fmt, *DEFAULT_DATE_FORMATS) if fmt else DEFAULT_DATE_FORMATS
+
+
+def normalize_row(raw: RawRow, formats: tuple[str, ...] = DEFAULT_DATE_FORMATS) -> Row:
+    return raw.import_ref, parse_date(raw.when, formats), raw.service.strip(), parse_amount(raw.amount)
@@ -0,0 +1,104 @@
+"""Import flow shared by the bot and the REST upload endpoint:
+parse in the worker pool → store batches in a thread → report counts."""
+import asyncio
+import time
+from contextlib import aclosing
+from datetime import date
+from typing import Awaitable, Callable
+
+from app.config import IMPORT_PROGRESS_INTERVAL
+from app.db.session import UserSession
+from app.db import repo
+from . import pool
+
+HEAD_SIZE = 4096
+CHUNK_SIZE = 64 * 1024
+
+
+def new_counts() -> dict:
+    return {"processed": 0, "imported": 0, "duplicates": 0, "unmatched": 0, "this_month": 0}
+
+
+def read_head(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read(HEAD_SIZE)
+
+
+def store_batch(db, user_id: int, rows: list, mappings: list[tuple[str, int]], counts: dict) -> None:
+    """Runs in a thread; `counts` is only touched from one thread at a time."""
+    this_month = date.today().replace(day=1)
+    by_month: dict[date, int] = {}
+    for import_ref, expense_date, service, amount in rows:
+        counts["processed"] += 1
+        if expense_date is None or amount is None:
+            counts["unmatched"] += 1
+            continue
+        if amount <= 0:
+            continue
+
+        service_lower = service.lower()
+        category_id = next((cid for keyword, cid in mappings if keyword in service_lower), None)
+        if category_id is None:
+            if repo.import_ref_exists(db, user_id, import_ref):
+                counts["duplicates"] += 1
+                continue
+            # Kept so a mapping added later can pick it up without a re-upload.
+            repo.stage_import_row(db, user_id, import_ref, service, amount, expense_date)
+            counts["unmatched"] += 1
+            continue
+
+        if repo.create_imported_expense(db, user_id, category_id, amount, expense_date, import_ref) is None:
+            counts["duplicates"] += 1
+            continue
+        counts["imported"] += 1
+        month = expense_date.replace(day=1)
+        by_month[month] = by_month.get(month, 0) + amount
+        if month == this_month:
+            counts["this_month"] += amount
+    repo.add_imported_spend(db, user_id, by_month)
+    db.commit()
+
+
+async def _finish_store(store: Awaitable) -> None:
+    """Awaits a store_batch thread, letting it finish if the caller is cancelled:
+    the thread can't be interrupted, and it must be done with the session (and its
+    commit counted) before the session is closed and partial counts are reported."""
+    task = asyncio.ensure_future(store)
+    try:
+        await asyncio.shield(task)
+    except asyncio.CancelledError:
+        while not task.done():
+            try:
+                await asyncio.shield(task)
+            except asyncio.CancelledError:
+                pass
+        raise
+
+
+async def run_import(
+    user_id: int,
+    path: str,
+    fmt: str,
+    options: dict | None = None,
+    counts: dict | None = None,
+    on_progress: Callable[[dict], Awaitable[None]] | None = None,
+) -> dict:
+    """Imports the file at `path` for the user and returns the counts.
+    Pass `counts` to see partial results if the import is cancelled or fails.
+    Raises pool.ParseError when the importer rejects the file, and
+    ratelimit.Overloaded when too many imports are already waiting."""
+    counts = counts if counts is not None else new_counts()
+    db = UserSession(user_id)
+    try:
+        async with pool.slots:
+            mappings = [(keyword, cid) for _, keyword, cid, _ in repo.get_service_mapping_rows(db, user_id)]
+            last_progress = time.monotonic()
+            async with aclosing(pool.stream_batches(fmt, path, options)) as batches:
+                async for batch in batches:
+                    await _finish_store(asyncio.to_thread(store_batch, db, user_id, batch, mappings, counts))
+                    if on_progress and time.monotonic() - last_progress >= IMPORT_PROGRESS_INTERVAL:
+                        last_progress = time.monotonic()
+                        await on_progress(counts)
+    finally:
+        db.close()
+    return counts
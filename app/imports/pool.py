@@ -0,0 +1,124 @@
+"""Runs import parsers in worker processes so CPU-bound parsing never blocks the event loop.
+
+Workers push compact row batches onto a managed queue; the main process
+consumes them as they arrive, which allows progress reporting and
+cancellation mid-file.
+"""
+import asyncio
+import multiprocessing
+import queue as queue_module
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import AsyncIterator
+
+from app.config import IMPORT_WORKERS, IMPORT_BATCH_SIZE, MAX_CONCURRENT_IMPORTS, MAX_QUEUED_IMPORTS
+from app.ratelimit import ConcurrencyGate
+
+_executor: ProcessPoolExecutor | None = None
+_manager = None
+
+# How often a consumer waiting for a batch checks that the worker is still alive.
+POLL_SECONDS = 1.0
+
+# Caps imports in flight across all chats; extra ones wait for a slot, and past
+# MAX_QUEUED_IMPORTS waiting, entering raises ratelimit.Overloaded.
+slots = ConcurrencyGate("imports", MAX_CONCURRENT_IMPORTS, MAX_QUEUED_IMPORTS)
+
+
+class ParseError(Exception):
+    """Raised in the main process when the worker's parser failed."""
+
+
+def _get_pool():
+    global _executor, _manager
+    ctx = multiprocessing.get_context("spawn")
+    if _manager is None:
+        _manager = ctx.Manager()
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=IMPORT_WORKERS, mp_context=ctx)
+    return _executor, _manager
+
+
+def _parse_into_queue(fmt: str, path: str, options: dict | None, queue, cancelled, batch_size: int) -> None:
+    """Worker side: ("rows", [...]) per batch, then ("done", None) or ("error", message)."""
+    from app.imports import IMPORTERS
+    from app.imports.normalize import date_formats, normalize_row
+
+    try:
+        formats = date_formats(options)
+        batch = []
+        for raw in IMPORTERS[fmt].iter_rows(path, options):
+            batch.append(normalize_row(raw, formats))
+            if len(batch) >= batch_size:
+                if cancelled.is_set():
+                    break
+                queue.put(("rows", batch))
+                batch = []
+        if batch and not cancelled.is_set():
+            queue.put(("rows", batch))
+        queue.put(("done", None))
+    except Exception as e:
+        queue.put(("error", str(e) or type(e).__name__))
+
+
+async def stream_batches(fmt: str, path: str, options: dict | None = None) -> AsyncIterator[list]:
+    """Yields normalized row batches from the `fmt` importer, run in a worker process.
+    Closing the generator early (e.g. on task cancellation) stops the worker."""
+    executor, manager = await asyncio.to_thread(_get_pool)  # first call starts the processes
+    # Manager proxies make blocking IPC calls, so they are only used from threads.
+    queue, cancelled = await asyncio.to_thread(lambda: (manager.Queue(maxsize=8), manager.Event()))
+    # A concurrent.futures.Future, so _stop_worker can poll it from its thread.
+    future = executor.submit(_parse_into_queue, fmt, path, options, queue, cancelled, IMPORT_BATCH_SIZE)
+    try:
+        while True:
+            try:
+                kind, payload = await asyncio.to_thread(queue.get, timeout=POLL_SECONDS)
+            except queue_module.Empty:
+                if future.done():  # the worker died (or returned) without a final message
+                    _raise_worker_failure(executor, future)
+                continue
+            if kind == "rows":
+                yield payload
+            elif kind == "error":
+                raise ParseError(payload)
+            else:
+                break
+    finally:
+        await asyncio.to_thread(_stop_worker, queue, cancelled, future)
+
+
+def _stop_worker(queue, cancelled, future) -> None:
+    """Flags the worker to stop and drains the queue until it has returned, so a
+    worker blocked on a full queue can see the flag. Runs in a thread."""
+    cancelled.set()
+    while not future.done():
+        try:
+            queue.get(timeout=0.05)
+        except queue_module.Empty:
+            pass
+        except Exception:  # the manager is going away; the worker will fail on its own
+            time.sleep(0.05)
+
+
+def _raise_worker_failure(executor, future) -> None:
+    global _executor
+    try:
+        future.result()
+    except BrokenProcessPool:
+        # A killed worker breaks the whole executor; the next import starts a fresh one.
+        if _executor is executor:
+            _executor = None
+            executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    raise ParseError("Import worker stopped unexpectedly")
+
+
+def shutdown() -> None:
+    global _executor, _manager
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+    if _manager is not None:
+        _manager.shutdown()
+        _manager = None
@@ -1,39 +1,79 @@
 from dotenv import load_dotenv
 load_dotenv()
 
+import asyncio
 import os
-from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from contextlib import asynccontextmanager
 
-from app.db.session import init_db
-from app.telegram.handlers import router as telegram_router
+from fastapi import Depends, FastAPI
+from fastapi.responses import PlainTextResponse
+
+from app.config import INIT_DB_ON_STARTUP, DIGESTS_ENABLED, TELEGRAM_MODE
+from app.db.session import get_engine, init_db
+from app.db import purge
+from app.spa import SPABundle
+from app import ratelimit
+from app.compression import CompressionMiddleware
+from app.telegram.handlers import router as telegram_router, close_http_client, active_imports
+from app.telegram import digests, polling
+from app.imports import pool as import_pool
 from app.api.auth import router as auth_router
 from app.api.routers.users import router as users_router
 from app.api.routers.categories import router as categories_router
 from app.api.routers.mappings import router as mappings_router
 from app.api.routers.expenses import router as expenses_router
+from app.api.routers.dashboard import router as dashboard_router
+from app.api.routers.events import router as events_router
+
+STATIC_DIR = os.path.join(os.path.dirname(__file__), "..", "frontend", "dist")
+spa = SPABundle(STATIC_DIR) if os.path.isdir(STATIC_DIR) else None
+
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    get_engine()
+    if INIT_DB_ON_STARTUP:
+        init_db()
+    if spa:
+        spa.load()
+    scheduler = asyncio.create_task(digests.run_scheduler()) if DIGESTS_ENABLED else None
+    poller = asyncio.create_task(polling.run_polling()) if TELEGRAM_MODE == "polling" else None
+    purger = asyncio.create_task(purge.run_purger())
+    yield
+    background = [task for task in (scheduler, poller, purger) if task]
+    for task in background:
+        task.cancel()
+    # Wait for them to unwind so none is still using the HTTP client or engine below.
+    await asyncio.gather(*background, return_exceptions=True)
+    for task in list(active_imports.values()):
+        task.cancel()
+    import_pool.shutdown()
+    await close_http_client()
 
-# Initialize DB (create tables)
-init_db()
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(ratelimit.LoadShedMiddleware)
 
 # Telegram webhook
 app.include_router(telegram_router)
 
-# REST API
+# REST API (authenticated routers share the per-user "api" bucket)
+throttled = [Depends(ratelimit.limit("api"))]
 app.include_router(auth_router,       prefix="/api/auth",       tags=["auth"])
-app.include_router(users_router,      prefix="/api/users",      tags=["users"])
-app.include_router(categories_router, prefix="/api/categories", tags=["categories"])
-app.include_router(mappings_router,   prefix="/api/mappings",   tags=["mappings"])
-app.include_router(expenses_router,   prefix="/api/expenses",   tags=["expenses"])
+app.include_router(users_router,      prefix="/api/users",      tags=["users"],      dependencies=throttled)
+app.include_router(categories_router, prefix="/api/categories", tags=["categories"], dependencies=throttled)
+app.include_router(mappings_router,   prefix="/api/mappings",   tags=["mappings"],   dependencies=throttled)
+app.include_router(expenses_router,   prefix="/api/expenses",   tags=["expenses"],   dependencies=throttled)
+app.include_router(dashboard_router,  prefix="/api/dashboard",  tags=["dashboard"],  dependencies=throttled)
+app.include_router(events_router,     prefix="/api/events",     tags=["events"])  # capped by events.py instead
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return PlainTextResponse(ratelimit.render_metrics())
 
-# Serve React SPA (only when built)
-STATIC_DIR = os.path.join(os.path.dirname(__file__), "..", "frontend", "dist")
-if os.path.isdir(STATIC_DIR):
-    app.mount("/assets", StaticFiles(directory=os.path.join(STATIC_DIR, "assets")), name="assets")
 
-    @app.get("/{full_path:path}", include_in_schema=False)
-    async def spa_fallback(full_path: str):
-        return FileResponse(os.path.join(STATIC_DIR, "index.html"))
+# Serve React SPA (only when built): held in memory, precompressed, ETag'd
+if spa:
+    app.include_router(spa.router())
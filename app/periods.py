@@ -0,0 +1,33 @@
+"""Named reporting periods shared by the bot and the API."""
+from datetime import date, timedelta
+
+# aliases -> canonical name; custom ranges are written "YYYY-MM-DD..YYYY-MM-DD"
+NAMED_PERIODS = {
+    "day": "today", "today": "today",
+    "week": "this_week", "this_week": "this_week",
+    "month": "this_month", "this_month": "this_month",
+    "last_month": "last_month",
+}
+
+
+def resolve(period: str, today: date) -> tuple[date, date, str]:
+    """Returns (start, end, title); raises ValueError for an unknown period."""
+    name = NAMED_PERIODS.get(period)
+    if name == "today":
+        return today, today, f"Today — {today.strftime('%b %d')}"
+    if name == "this_week":
+        start = today - timedelta(days=today.weekday())
+        return start, today, f"This Week ({start.strftime('%b %d')} – {today.strftime('%b %d')})"
+    if name == "this_month":
+        return today.replace(day=1), today, today.strftime("%B %Y")
+    if name == "last_month":
+        end = today.replace(day=1) - timedelta(days=1)
+        return end.replace(day=1), end, end.strftime("%B %Y")
+
+    start_s, sep, end_s = period.partition("..")
+    if not sep:
+        raise ValueError(f"Unknown period '{period}'")
+    start, end = date.fromisoformat(start_s), date.fromisoformat(end_s)
+    if start > end:
+        raise ValueError(f"Period '{period}' ends before it starts")
+    return start, end, f"{start.strftime('%b %d, %Y')} – {end.strftime('%b %d, %Y')}"
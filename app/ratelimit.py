@@ -0,0 +1,142 @@
+"""In-process throttling: per-user token buckets, concurrency gates for expensive
+operations, and in-flight request shedding. State is per worker."""
+import asyncio
+import math
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from fastapi import Depends, HTTPException
+from fastapi.responses import JSONResponse
+
+from app.config import RATE_LIMITS, RATE_LIMIT_MAX_KEYS, MAX_IN_FLIGHT_REQUESTS
+
+# Counters exposed at /metrics: {route_class or gate name: count}
+throttled: Counter = Counter()
+shed: Counter = Counter()
+
+
+class RateLimiter:
+    """Token buckets keyed by (route_class, user). Least recently used buckets are
+    evicted past `max_keys` — an evicted user simply starts again with a full bucket."""
+
+    def __init__(self, limits: dict[str, tuple[float, float]], max_keys: int):
+        self.limits = limits
+        self.max_keys = max_keys
+        self._buckets: OrderedDict = OrderedDict()   # key -> [tokens, updated_at, notified_at]
+        self._lock = threading.Lock()                # sync endpoints run in the threadpool
+
+    def acquire(self, route_class: str, user_id: int) -> float:
+        """Takes a token. Returns 0 when allowed, else seconds until one is available."""
+        rate, burst = self.limits[route_class]
+        key = (route_class, user_id)
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [burst, now, 0.0]
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0.0
+            throttled[route_class] += 1
+            return (1 - bucket[0]) / rate
+
+    def should_notify(self, route_class: str, user_id: int, every: float) -> bool:
+        """True at most once per `every` seconds per bucket — for polite bot replies."""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get((route_class, user_id))
+            if bucket is None or now - bucket[2] < every:
+                return False
+            bucket[2] = now
+            return True
+
+
+limiter = RateLimiter(RATE_LIMITS, RATE_LIMIT_MAX_KEYS)
+
+
+def limit(route_class: str):
+    """Dependency for API routes: 429 with Retry-After once the user's bucket is empty.
+    Keyed on the token alone, so a throttled request never checks out a DB connection."""
+    from app.api.deps import get_token_user_id
+
+    def dependency(user_id: int = Depends(get_token_user_id)):
+        wait = limiter.acquire(route_class, user_id)
+        if wait:
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests",
+                headers={"Retry-After": str(math.ceil(wait))},
+            )
+
+    return dependency
+
+
+class Overloaded(Exception):
+    pass
+
+
+class ConcurrencyGate:
+    """Async semaphore that sheds instead of queueing without bound: when
+    `max_waiting` callers are already waiting, entering raises Overloaded."""
+
+    def __init__(self, name: str, limit: int, max_waiting: int):
+        self.name = name
+        self._sem = asyncio.Semaphore(limit)
+        self.max_waiting = max_waiting
+        self.waiting = 0
+
+    def locked(self) -> bool:
+        return self._sem.locked()
+
+    async def __aenter__(self):
+        if self._sem.locked() and self.waiting >= self.max_waiting:
+            shed[self.name] += 1
+            raise Overloaded(self.name)
+        self.waiting += 1
+        try:
+            await self._sem.acquire()
+        finally:
+            self.waiting -= 1
+
+    async def __aexit__(self, *exc):
+        self._sem.release()
+
+
+class LoadShedMiddleware:
+    """Rejects HTTP requests with 503 once MAX_IN_FLIGHT_REQUESTS are being served.
+    Long-lived streams under `exempt_prefixes` aren't counted; they have their own cap."""
+
+    def __init__(self, app, max_in_flight: int = MAX_IN_FLIGHT_REQUESTS, exempt_prefixes: tuple = ("/api/events",)):
+        self.app = app
+        self.max_in_flight = max_in_flight
+        self.exempt_prefixes = exempt_prefixes
+        self.in_flight = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(self.exempt_prefixes):
+            return await self.app(scope, receive, send)
+        if self.in_flight >= self.max_in_flight:
+            shed["in_flight"] += 1
+            response = JSONResponse({"detail": "Server busy"}, status_code=503, headers={"Retry-After": "1"})
+            return await response(scope, receive, send)
+        self.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
+
+
+def render_metrics() -> str:
+    """Prometheus text format."""
+    lines = ["# TYPE fintrack_throttled_total counter"]
+    lines += [f'fintrack_throttled_total{{route_class="{k}"}} {v}' for k, v in sorted(throttled.items())]
+    lines.append("# TYPE fintrack_shed_total counter")
+    lines += [f'fintrack_shed_total{{gate="{k}"}} {v}' for k, v in sorted(shed.items())]
+    return "\n".join(lines) + "\n"
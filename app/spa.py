@@ -0,0 +1,91 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+
+from fastapi import APIRouter, Request
+from fastapi.responses import Response
+
+from app.compression import COMPRESSIBLE_TYPES, MIN_COMPRESS_SIZE, accepted_encodings, brotli
+
+# Vite puts a content hash in every file name under assets/, so those never change.
+CACHE_IMMUTABLE = "public, max-age=31536000, immutable"
+CACHE_SHORT = "public, max-age=3600"
+CACHE_REVALIDATE = "no-cache"
+
+
+class StaticFile:
+    """A file held in memory together with its precompressed variants."""
+
+    __slots__ = ("body", "variants", "etag", "media_type")
+
+    def __init__(self, body: bytes, media_type: str):
+        self.body = body
+        self.media_type = media_type
+        self.etag = f'"{hashlib.md5(body).hexdigest()}"'
+        self.variants: dict[str, bytes] = {}
+        if len(body) >= MIN_COMPRESS_SIZE and media_type.startswith(COMPRESSIBLE_TYPES):
+            if brotli is not None:
+                self.variants["br"] = brotli.compress(body)
+            self.variants["gzip"] = gzip.compress(body, compresslevel=9, mtime=0)
+
+
+def _etag_matches(header: str | None, etag: str) -> bool:
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Encoded variants carry a "-gzip"/"-br" suffix; any of them validates the same file.
+    base = etag[:-1]
+    return any(tag.strip().removeprefix("W/").startswith(base) for tag in header.split(","))
+
+
+class SPABundle:
+    """The built frontend (frontend/dist), loaded into memory once at startup."""
+
+    def __init__(self, static_dir: str):
+        self.static_dir = static_dir
+        self.files: dict[str, StaticFile] = {}
+
+    def load(self) -> None:
+        files = {}
+        for root, _, names in os.walk(self.static_dir):
+            for name in names:
+                full = os.path.join(root, name)
+                rel = os.path.relpath(full, self.static_dir).replace(os.sep, "/")
+                media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+                with open(full, "rb") as f:
+                    files[rel] = StaticFile(f.read(), media_type)
+        self.files = files
+
+    def respond(self, request: Request, file: StaticFile, cache_control: str) -> Response:
+        headers = {"ETag": file.etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+        if _etag_matches(request.headers.get("if-none-match"), file.etag):
+            return Response(status_code=304, headers=headers)
+
+        body = file.body
+        if file.variants:
+            accepted = accepted_encodings(request.headers.get("accept-encoding", ""))
+            for coding, compressed in file.variants.items():  # br first when available
+                if coding in accepted:
+                    body = compressed
+                    headers["Content-Encoding"] = coding
+                    headers["ETag"] = f'{file.etag[:-1]}-{coding}"'
+                    break
+        return Response(body, media_type=file.media_type, headers=headers)
+
+    def router(self) -> APIRouter:
+        router = APIRouter(include_in_schema=False)
+
+        @router.get("/{full_path:path}")
+        async def spa_fallback(full_path: str, request: Request):
+            file = self.files.get(full_path)
+            if full_path.startswith("assets/"):
+                if file is None:
+                    return Response(status_code=404)
+                return self.respond(request, file, CACHE_IMMUTABLE)
+            if file is not None and full_path != "index.html":
+                return self.respond(request, file, CACHE_SHORT)
+            return self.respond(request, self.files["index.html"], CACHE_REVALIDATE)
+
+        return router
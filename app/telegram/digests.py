@@ -0,0 +1,61 @@
+import asyncio
+import logging
+from datetime import date, datetime, timedelta
+
+from app import periods
+from app.config import DIGEST_HOUR, DIGEST_SEND_RATE
+from app.db.session import shard_sessions
+from app.db import repo
+from app.telegram.handlers import send_message, format_summary
+
+log = logging.getLogger(__name__)
+
+
+def due_periods(today: date) -> list[str]:
+    due = ["day"]
+    if today.weekday() == 6:
+        due.append("week")
+    if (today + timedelta(days=1)).month != today.month:
+        due.append("month")
+    return due
+
+
+def build_digests(today: date) -> list[tuple[int, str]]:
+    """One grouped query per due period and shard, covering every subscriber at once."""
+    messages = []
+    for db in shard_sessions():
+        for period in due_periods(today):
+            start, end, title = periods.resolve(period, today)
+            for user_id, rows in repo.get_digest_summaries(db, period, start, end).items():
+                messages.append((user_id, format_summary(rows, title)))
+    return messages
+
+
+async def deliver(messages: list[tuple[int, str]]) -> None:
+    """Sends at most DIGEST_SEND_RATE messages per second; one failure doesn't stop the rest."""
+    interval = 1 / DIGEST_SEND_RATE
+    for chat_id, text in messages:
+        try:
+            await send_message(chat_id, text)
+        except Exception:
+            log.exception("Failed to deliver digest to %s", chat_id)
+        await asyncio.sleep(interval)
+
+
+async def send_digests(today: date) -> None:
+    messages = await asyncio.to_thread(build_digests, today)
+    await deliver(messages)
+
+
+async def run_scheduler() -> None:
+    """Runs for the app lifetime; started and cancelled from the lifespan."""
+    while True:
+        now = datetime.now()
+        run_at = now.replace(hour=DIGEST_HOUR, minute=0, second=0, microsecond=0)
+        if run_at <= now:
+            run_at += timedelta(days=1)
+        await asyncio.sleep((run_at - now).total_seconds())
+        try:
+            await send_digests(run_at.date())
+        except Exception:
+            log.exception("Digest run failed")
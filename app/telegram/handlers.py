@@ -1,44 +1,69 @@
-import httpx
-import openpyxl
+import asyncio
+import logging
+import math
+import os
+import tempfile
 from fastapi import APIRouter, Request
-from datetime import date, datetime, timedelta
-from io import BytesIO
-from app.config import TELEGRAM_TOKEN
-from app.db.session import SessionLocal
+from fastapi.responses import JSONResponse
+from datetime import date
+from app import periods
+from app.config import TELEGRAM_API_URL, TELEGRAM_TOKEN
+from app.db.session import ReadSession, UserSession, shard_sessions
 from app.db import repo
+from app.imports import detect_format, pipeline, pool
+from app.ratelimit import Overloaded, limiter
 from app.telegram.keyboards import category_keyboard
 
 router = APIRouter()
-TELEGRAM_API = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}"
+log = logging.getLogger(__name__)
+TELEGRAM_API = f"{TELEGRAM_API_URL}/bot{TELEGRAM_TOKEN}"
 
 # in-memory state: {chat_id: {"step": str, "data": dict}}
 user_state: dict = {}
 
+# Shared Bot API client, created on first use and closed in the app lifespan.
+_http_client = None
+
 
 # ── Telegram helpers ───────────────────────────────────────────────────────
 
+def get_http_client():
+    global _http_client
+    if _http_client is None:
+        import httpx
+        _http_client = httpx.AsyncClient()
+    return _http_client
+
+
+async def close_http_client():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
 async def send_message(chat_id: int, text: str, reply_markup=None):
     payload = {"chat_id": chat_id, "text": text, "parse_mode": "Markdown"}
     if reply_markup:
         payload["reply_markup"] = reply_markup
-    async with httpx.AsyncClient() as client:
-        await client.post(f"{TELEGRAM_API}/sendMessage", json=payload)
+    await get_http_client().post(f"{TELEGRAM_API}/sendMessage", json=payload)
 
 
 async def answer_callback_query(callback_query_id: str):
-    async with httpx.AsyncClient() as client:
-        await client.post(f"{TELEGRAM_API}/answerCallbackQuery",
-                          json={"callback_query_id": callback_query_id})
+    await get_http_client().post(f"{TELEGRAM_API}/answerCallbackQuery",
+                                 json={"callback_query_id": callback_query_id})
 
 
 def parse_amount(text: str) -> int | None:
-    """Accepts formats like '25k' → 25000, '1.5k' → 1500."""
+    """Accepts formats like '25k' → 25000, '1.5k' → 1500; None for anything else,
+    including 'infk' and 'nank'."""
     try:
         text = text.strip().lower()
         if text.endswith("k"):
-            return int(float(text[:-1]) * 1000)
+            value = float(text[:-1]) * 1000
+            return int(value) if math.isfinite(value) else None
         return int(text)
-    except ValueError:
+    except (ValueError, OverflowError):
         return None
 
 
@@ -54,6 +79,21 @@ def format_summary(rows: list[tuple[str, int]], title: str) -> str:
     return "\n".join(lines)
 
 
+def format_budget_status(status: tuple[int, int | None] | None) -> str:
+    if status is None:
+        return ""
+    remaining, crossed = status
+    if remaining < 0:
+        text = f"\n💰 Over budget by {-remaining:,}"
+    else:
+        text = f"\n💰 {remaining:,} left this month"
+    if crossed == 100:
+        text += "\n⚠️ You've reached your monthly budget."
+    elif crossed:
+        text += f"\n⚠️ You've used {crossed}% of your monthly budget."
+    return text
+
+
 def get_category_keyboard_for(db, user_id: int):
     cats = repo.get_categories(db, user_id)
     return category_keyboard([c.name for c in cats])
@@ -67,6 +107,14 @@ def inline_category_keyboard(categories):
 
 # ── Signup flow ────────────────────────────────────────────────────────────
 
+def username_taken(username: str) -> bool:
+    """Usernames are unique across all shards, not just the user's own."""
+    for db in shard_sessions():
+        if repo.username_exists(db, username):
+            return True
+    return False
+
+
 async def signup(chat_id: int, text: str, db) -> bool:
     """Returns True when signup is complete."""
     state = user_state.get(chat_id, {"step": "first_name", "data": {}})
@@ -88,7 +136,7 @@ async def signup(chat_id: int, text: str, db) -> bool:
 
     elif step == "budget":
         username = text.strip()
-        if repo.username_exists(db, username):
+        if username_taken(username):
             await send_message(chat_id, "❌ That username is already taken. Please choose another:")
             user_state[chat_id] = state
             return False
@@ -129,6 +177,12 @@ async def signup(chat_id: int, text: str, db) -> bool:
 
 async def expense_input(chat_id: int, text: str, db):
     state = user_state.get(chat_id)
+    if not state or state.get("step") == "awaiting_category":
+        # "groceries 25k", one or more lines; a category name alone still opens the amount prompt
+        if "\n" in text or (split_entry(text) and not repo.get_category_by_name(db, chat_id, text)):
+            await handle_bulk_entry(chat_id, text, db)
+            return
+
     kb = get_category_keyboard_for(db, chat_id)
 
     if not state or state.get("step") == "awaiting_category":
@@ -151,35 +205,136 @@ async def expense_input(chat_id: int, text: str, db):
             await send_message(chat_id, "❌ Invalid amount. Enter a positive number (e.g. 500 or 25k), or /cancel:")
             return
 
-        repo.create_expense(db, user_id=chat_id, category_id=state["category_id"], amount=amount)
+        expense = repo.create_expense(db, user_id=chat_id, category_id=state["category_id"], amount=amount)
         user_state.pop(chat_id, None)
+        status = repo.get_budget_status(db, repo.get_user(db, chat_id), expense.expense_date, amount)
         await send_message(
             chat_id,
-            f"✅ *{state['category_name']}* — {amount:,} saved",
+            f"✅ *{state['category_name']}* — {amount:,} saved" + format_budget_status(status),
             reply_markup=kb,
         )
 
 
+def split_entry(line: str) -> tuple[str, int] | None:
+    """'groceries 25k' or '25k groceries' → ('groceries', 25000)."""
+    parts = line.split()
+    if len(parts) < 2:
+        return None
+    for name, amount_text in ((" ".join(parts[:-1]), parts[-1]), (" ".join(parts[1:]), parts[0])):
+        amount = parse_amount(amount_text)
+        if amount is not None:
+            return name, amount
+    return None
+
+
+def resolve_category(name: str, lookup: list[tuple[int, str, str | None]]) -> tuple[int, str] | str:
+    """Matches a typed name against category names, then mapping keywords (which
+    act as aliases), then a unique prefix of the name or one of its `/` parts.
+    Returns (category_id, category_name), or why nothing matched."""
+    key = name.strip().lower()
+    categories = {cid: cname for cid, cname, _ in lookup}
+    for cid, cname in categories.items():
+        if cname.lower() == key:
+            return cid, cname
+    for cid, cname, keyword in lookup:
+        if keyword == key:
+            return cid, cname
+    matches = [
+        (cid, cname) for cid, cname in categories.items()
+        if any(part.strip().startswith(key) for part in cname.lower().split("/"))
+    ]
+    if len(matches) == 1:
+        return matches[0]
+    if matches:
+        return "could be " + ", ".join(cname for _, cname in matches)
+    return "unknown category"
+
+
+async def handle_bulk_entry(chat_id: int, text: str, db):
+    """One `<category> <amount>` per line, saved in one transaction with one reply."""
+    lookup = repo.get_category_lookup(db, chat_id)
+    items, saved, errors = [], [], []
+    for n, line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+        if not line:
+            continue
+        entry = split_entry(line)
+        if entry is None:
+            errors.append((n, line, "expected `<category> <amount>`"))
+            continue
+        name, amount = entry
+        if amount <= 0:
+            errors.append((n, line, "amount must be positive"))
+            continue
+        match = resolve_category(name, lookup)
+        if isinstance(match, str):
+            errors.append((n, line, match))
+            continue
+        items.append((match[0], amount))
+        saved.append((match[1], amount))
+
+    lines, status = [], None
+    if items:
+        total = repo.create_expenses(db, chat_id, items)
+        status = repo.get_budget_status(db, repo.get_user(db, chat_id), date.today(), total)
+        lines.append(f"✅ Saved {len(items)} — *{total:,}*")
+        lines += [f"• {name} — {amount:,}" for name, amount in saved]
+    if errors:
+        lines.append("❌ Not saved:" if items else "❌ Nothing saved:")
+        lines += [f"line {n}: `{line}` — {reason}" for n, line, reason in errors]
+    await send_message(chat_id, "\n".join(lines) + format_budget_status(status))
+
+
 # ── Summary commands ───────────────────────────────────────────────────────
 
-async def handle_summary(chat_id: int, period: str, db):
-    today = date.today()
-    if period == "day":
-        start, end = today, today
-        title = f"Today — {today.strftime('%b %d')}"
-    elif period == "week":
-        start = today - timedelta(days=today.weekday())
-        end = today
-        title = f"This Week ({start.strftime('%b %d')} – {end.strftime('%b %d')})"
-    else:  # month
-        start = today.replace(day=1)
-        end = today
-        title = today.strftime("%B %Y")
-
-    rows = repo.get_expenses_summary(db, chat_id, start, end)
+async def handle_summary(chat_id: int, period: str):
+    start, end, title = periods.resolve(period, date.today())
+    db = ReadSession(chat_id)
+    try:
+        rows = repo.get_expenses_summary(db, chat_id, start, end)
+    finally:
+        db.close()
     await send_message(chat_id, format_summary(rows, title))
 
 
+SUMMARY_PERIODS = ("today", "this_week", "this_month", "last_month")
+
+
+async def handle_all_summaries(chat_id: int):
+    """/summary: every SUMMARY_PERIODS breakdown in one message, from one query."""
+    today = date.today()
+    resolved = [periods.resolve(p, today) for p in SUMMARY_PERIODS]
+    db = ReadSession(chat_id)
+    try:
+        results = repo.get_multi_period_summary(db, chat_id, [(start, end) for start, end, _ in resolved])
+    finally:
+        db.close()
+    text = "\n\n".join(format_summary(rows, title) for rows, (_, _, title) in zip(results, resolved))
+    await send_message(chat_id, text)
+
+
+DIGEST_PERIODS = ("day", "week", "month")
+
+
+async def handle_digest(chat_id: int, text: str, db):
+    """`/digest` lists subscriptions; `/digest <day|week|month>` toggles one."""
+    parts = text.split(maxsplit=1)
+    if len(parts) < 2:
+        subscribed = repo.get_digest_periods(db, chat_id)
+        current = ", ".join(p for p in DIGEST_PERIODS if p in subscribed) or "none"
+        await send_message(chat_id, f"Scheduled digests: *{current}*\n\nUsage: `/digest <day|week|month>` to toggle.")
+        return
+    period = parts[1].strip().lower()
+    if period not in DIGEST_PERIODS:
+        await send_message(chat_id, "Usage: `/digest <day|week|month>`")
+        return
+    if repo.subscribe_digest(db, chat_id, period):
+        await send_message(chat_id, f"✅ You'll get a *{period}* digest.")
+    else:
+        repo.unsubscribe_digest(db, chat_id, period)
+        await send_message(chat_id, f"✅ *{period}* digest turned off.")
+
+
 # ── Category management commands ───────────────────────────────────────────
 
 async def handle_add_category(chat_id: int, text: str, db):
@@ -218,13 +373,13 @@ async def handle_add_mapping(chat_id: int, db):
 
 
 async def handle_list_mappings(chat_id: int, db):
-    mappings = repo.get_service_mappings(db, chat_id)
+    mappings = repo.get_service_mapping_rows(db, chat_id)
     if not mappings:
         await send_message(chat_id, "No mappings yet. Use /add\\_mapping to create one.")
         return
     lines = ["*Your mappings:*\n"]
-    for m in mappings:
-        lines.append(f"• `{m.keyword}` → {m.category.name}")
+    for _, keyword, _, category_name in mappings:
+        lines.append(f"• `{keyword}` → {category_name}")
     await send_message(chat_id, "\n".join(lines))
 
 
@@ -241,6 +396,17 @@ async def handle_remove_mapping(chat_id: int, text: str, db):
         await send_message(chat_id, f"✅ Mapping `{keyword}` removed.")
 
 
+async def handle_list_unmatched(chat_id: int, db):
+    services = repo.get_staged_services(db, chat_id)
+    if not services:
+        await send_message(chat_id, "No unmatched imported rows.")
+        return
+    lines = ["*Unmatched services* (add a mapping to import them):\n"]
+    for service, count, total in services:
+        lines.append(f"• `{service}` — {count} × {total:,}")
+    await send_message(chat_id, "\n".join(lines))
+
+
 async def handle_mapping_keyword(chat_id: int, text: str, db):
     """Called when user has typed a keyword during /add_mapping flow."""
     keyword = text.strip().lower()
@@ -277,167 +443,249 @@ async def handle_callback_query(cq: dict, db):
             await send_message(chat_id, f"✅ `{keyword}` → *{result.category.name}*")
 
 
-# ── Click xlsx import ───────────────────────────────────────────────────────
-
-async def handle_xlsx_import(chat_id: int, file_id: str, db):
-    async with httpx.AsyncClient() as client:
-        r = await client.get(f"{TELEGRAM_API}/getFile", params={"file_id": file_id})
-        file_path = r.json()["result"]["file_path"]
-        file_r = await client.get(f"https://api.telegram.org/file/bot{TELEGRAM_TOKEN}/{file_path}")
-        content = file_r.content
+# ── File import (Click xlsx, CSV) ──────────────────────────────────────────
 
-    wb = openpyxl.load_workbook(BytesIO(content))
-    ws = wb.active
+IMPORT_MIME_TYPES = {
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet": ".xlsx",
+    "text/csv": ".csv",
+}
 
-    # Map header names to column indices
-    headers = {str(cell.value).strip(): idx for idx, cell in enumerate(ws[1])}
-    required = {"Сумма", "Время", "Карта", "Сервис", "Статус платежа"}
-    if not required.issubset(headers):
-        await send_message(chat_id, "❌ Unrecognized file format. Expected Click export.")
-        return
-
-    imported = duplicates = unmatched = 0
+# chat_id -> running import task, so /cancel can stop it
+active_imports: dict[int, asyncio.Task] = {}
 
-    for row in ws.iter_rows(min_row=2, values_only=True):
-        status = str(row[headers["Статус платежа"]]).strip()
-        if status != "Успешно проведен":
-            continue
 
-        time_val = row[headers["Время"]]
-        card = str(row[headers["Карта"]]).strip()
+async def download_file(file_id: str, dest) -> None:
+    """Streams a Telegram file into the open binary file `dest`."""
+    client = get_http_client()
+    r = await client.get(f"{TELEGRAM_API}/getFile", params={"file_id": file_id})
+    file_path = r.json()["result"]["file_path"]
+    url = f"{TELEGRAM_API_URL}/file/bot{TELEGRAM_TOKEN}/{file_path}"
+    async with client.stream("GET", url) as file_r:
+        async for chunk in file_r.aiter_bytes(pipeline.CHUNK_SIZE):
+            dest.write(chunk)
 
-        # Normalize time to string for import_ref
-        if isinstance(time_val, datetime):
-            time_str = time_val.strftime("%d.%m.%Y %H:%M:%S")
-            expense_date = time_val.date()
-        else:
-            time_str = str(time_val).strip()
-            try:
-                expense_date = datetime.strptime(time_str, "%d.%m.%Y %H:%M:%S").date()
-            except ValueError:
-                unmatched += 1
-                continue
-
-        import_ref = f"{time_str}|{card}"
-        if repo.import_ref_exists(db, chat_id, import_ref):
-            duplicates += 1
-            continue
 
-        service = str(row[headers["Сервис"]]).strip()
-        category = repo.get_category_for_service(db, chat_id, service)
-        if not category:
-            unmatched += 1
-            continue
+async def run_file_import(chat_id: int, file_id: str, file_name: str):
+    counts = pipeline.new_counts()
 
-        amount = round(float(row[headers["Сумма"]]))
-        if amount <= 0:
-            continue
+    async def report_progress(c: dict):
+        await send_message(chat_id, f"⏳ Processed {c['processed']:,} rows…")
 
-        repo.create_imported_expense(db, chat_id, category.id, amount, expense_date, import_ref)
-        imported += 1
+    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file_name)[1])
+    try:
+        with tmp:
+            await download_file(file_id, tmp)
+        fmt = detect_format(file_name, pipeline.read_head(tmp.name))
+        if fmt is None:
+            await send_message(chat_id, "❌ Unrecognized file format. Send a Click `.xlsx` or a `.csv` export.")
+            return
+        if pool.slots.locked():
+            await send_message(chat_id, "⏳ Other imports are running, yours will start shortly…")
+        await pipeline.run_import(chat_id, tmp.name, fmt, counts=counts, on_progress=report_progress)
+    except pool.ParseError as e:
+        await send_message(chat_id, f"❌ Import failed: {e}")
+        return
+    except Overloaded:
+        await send_message(chat_id, "⏳ Lots of imports are running right now. Please try again in a few minutes.")
+        return
+    except asyncio.CancelledError:
+        await send_message(chat_id, f"🛑 Import cancelled. Saved before stopping: *{counts['imported']}*")
+        raise
+    except Exception:
+        log.exception("Import failed for chat %s", chat_id)
+        await send_message(chat_id, f"❌ Import failed. Saved before stopping: *{counts['imported']}*")
+        return
+    finally:
+        os.unlink(tmp.name)
 
+    db = UserSession(chat_id)
+    try:
+        this_month = date.today().replace(day=1)
+        status = repo.get_budget_status(db, repo.get_user(db, chat_id), this_month, counts["this_month"])
+    finally:
+        db.close()
     await send_message(
         chat_id,
-        f"✅ Imported: *{imported}* | ⏭ Duplicates: *{duplicates}* | ❓ Unmatched: *{unmatched}*"
+        f"✅ Imported: *{counts['imported']}* | ⏭ Duplicates: *{counts['duplicates']}* "
+        f"| ❓ Unmatched: *{counts['unmatched']}*"
+        + format_budget_status(status)
     )
 
 
-# ── Webhook entry point ────────────────────────────────────────────────────
+async def handle_file_import(chat_id: int, file_id: str, file_name: str):
+    """Starts the import in the background so the webhook returns right away."""
+    if chat_id in active_imports:
+        await send_message(chat_id, "⏳ An import is already running. Send /cancel to stop it.")
+        return
+    wait = limiter.acquire("import", chat_id)
+    if wait:
+        await send_message(chat_id, f"⏳ You've imported several files recently. Please try again in {max(1, round(wait / 60))} min.")
+        return
+    task = asyncio.create_task(run_file_import(chat_id, file_id, file_name))
+    active_imports[chat_id] = task
+    task.add_done_callback(lambda _: active_imports.pop(chat_id, None))
+
+
+def cancel_import(chat_id: int) -> bool:
+    task = active_imports.get(chat_id)
+    if task is None:
+        return False
+    task.cancel()
+    return True
+
+
+# ── Update entry points ────────────────────────────────────────────────────
+
+def _chat_id(update: dict) -> int | None:
+    if "callback_query" in update:
+        return update["callback_query"]["from"]["id"]
+    if "message" in update:
+        return update["message"]["chat"]["id"]
+    return None
+
+
+async def throttle(sender: int) -> float:
+    """Takes one token from the sender's bot bucket per webhook request or per chat's
+    share of a getUpdates batch. Returns 0, or the seconds until a token is free;
+    callers delay the updates then, never drop them. The sender is told to slow down
+    at most every 30s."""
+    wait = limiter.acquire("bot", sender)
+    if wait and limiter.should_notify("bot", sender, every=30):
+        await send_message(sender, "🐢 You're sending messages faster than I can keep up. "
+                                   "They'll all be saved, just a little later.")
+    return wait
+
+
+async def process_updates(sender: int, updates: list[dict]) -> None:
+    """Handles updates from one chat in order, sharing a DB session.
+    Used for a single webhook update and for a chat's share of a getUpdates batch."""
+    db = UserSession(sender)
+    try:
+        for update in updates:
+            try:
+                await handle_update(update, db)
+            except Exception:
+                if len(updates) == 1:
+                    raise
+                # In a batch, one bad update shouldn't lose the chat's others.
+                log.exception("Failed to handle update %s", update.get("update_id"))
+                db.rollback()
+    finally:
+        db.close()
+
 
 @router.post("/webhook")
 async def telegram_webhook(req: Request):
     data = await req.json()
+    sender = _chat_id(data)
+    if sender is not None:
+        wait = await throttle(sender)
+        if wait:
+            # Not acknowledged, so Telegram keeps the update and redelivers it later.
+            return JSONResponse({"ok": False}, status_code=429, headers={"Retry-After": str(math.ceil(wait))})
+        await process_updates(sender, [data])
+    return {"ok": True}
 
-    db = SessionLocal()
-    try:
-        # Handle inline keyboard button presses
-        if "callback_query" in data:
-            await handle_callback_query(data["callback_query"], db)
-            return {"ok": True}
-
-        if "message" not in data:
-            return {"ok": True}
-
-        msg = data["message"]
-        chat_id = msg["chat"]["id"]
-        text = msg.get("text", "").strip()
-
-        user = repo.get_user(db, chat_id)
-
-        if not user:
-            if text == "/start" and chat_id not in user_state:
-                await send_message(chat_id,
-                    "👋 Welcome to *FinTrack* — a minimalist expense tracker.\n\n"
-                    "Tap a category, enter an amount, done. "
-                    "Use /day, /week, /month to see your spending.\n\n"
-                    "Let's set up your account first."
-                )
-            await signup(chat_id, text, db)
-            return {"ok": True}
-
-        # Handle document upload (xlsx import)
-        doc = msg.get("document")
-        if doc:
-            state = user_state.get(chat_id, {})
-            if state.get("step") == "awaiting_import_file":
-                user_state.pop(chat_id, None)
-                xlsx_mime = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                if doc.get("mime_type") == xlsx_mime:
-                    await handle_xlsx_import(chat_id, doc["file_id"], db)
-                else:
-                    await send_message(chat_id, "❌ Please send an .xlsx file.")
-            return {"ok": True}
-
-        # Handle awaiting_mapping_keyword state before command routing
+
+async def handle_update(data: dict, db) -> None:
+    """Routes one update (message or button press) from a chat with a session on its shard."""
+    # Handle inline keyboard button presses
+    if "callback_query" in data:
+        await handle_callback_query(data["callback_query"], db)
+        return
+
+    if "message" not in data:
+        return
+
+    msg = data["message"]
+    chat_id = msg["chat"]["id"]
+    text = msg.get("text", "").strip()
+
+    user = repo.get_user(db, chat_id)
+
+    if not user:
+        if text == "/start" and chat_id not in user_state:
+            await send_message(chat_id,
+                "👋 Welcome to *FinTrack* — a minimalist expense tracker.\n\n"
+                "Tap a category, enter an amount, done. "
+                "Use /day, /week, /month to see your spending.\n\n"
+                "Let's set up your account first."
+            )
+        await signup(chat_id, text, db)
+        return
+
+    # Handle document upload (xlsx import)
+    doc = msg.get("document")
+    if doc:
         state = user_state.get(chat_id, {})
-        if state.get("step") == "awaiting_mapping_keyword" and not text.startswith("/"):
-            await handle_mapping_keyword(chat_id, text, db)
-            return {"ok": True}
-
-        # Commands
-        if text == "/day":
-            await handle_summary(chat_id, "day", db)
-        elif text == "/week":
-            await handle_summary(chat_id, "week", db)
-        elif text == "/month":
-            await handle_summary(chat_id, "month", db)
-        elif text == "/start":
-            kb = get_category_keyboard_for(db, chat_id)
-            await send_message(chat_id, f"Hey, {user.first_name}! Choose a category:", reply_markup=kb)
-        elif text == "/cancel":
+        if state.get("step") == "awaiting_import_file":
             user_state.pop(chat_id, None)
-            kb = get_category_keyboard_for(db, chat_id)
-            await send_message(chat_id, "Cancelled. Choose a category:", reply_markup=kb)
-        elif text == "/import":
-            user_state[chat_id] = {"step": "awaiting_import_file"}
-            await send_message(chat_id, "Send your Click `.xlsx` file (or /cancel):")
-        elif text == "/add_mapping":
-            await handle_add_mapping(chat_id, db)
-        elif text == "/list_mappings":
-            await handle_list_mappings(chat_id, db)
-        elif text.startswith("/remove_mapping"):
-            await handle_remove_mapping(chat_id, text, db)
-        elif text.startswith("/add_category"):
-            await handle_add_category(chat_id, text, db)
-        elif text.startswith("/remove_category"):
-            await handle_remove_category(chat_id, text, db)
-        elif text.startswith("/"):
-            await send_message(chat_id, (
-                "Unknown command. Available commands:\n\n"
-                "/day — today's expenses\n"
-                "/week — this week's expenses\n"
-                "/month — this month's expenses\n"
-                "/import — import Click .xlsx file\n"
-                "/add\\_mapping — map a service keyword to a category\n"
-                "/list\\_mappings — show all keyword mappings\n"
-                "/remove\\_mapping <keyword> — remove a mapping\n"
-                "/add\\_category <name> — add a category\n"
-                "/remove\\_category <name> — remove a category\n"
-                "/cancel — cancel current input"
-            ))
-        else:
-            await expense_input(chat_id, text, db)
-    finally:
-        db.close()
+            file_name = doc.get("file_name") or "upload"
+            if not file_name.lower().endswith((".xlsx", ".csv")):
+                file_name += IMPORT_MIME_TYPES.get(doc.get("mime_type"), "")
+            if file_name.lower().endswith((".xlsx", ".csv")):
+                await handle_file_import(chat_id, doc["file_id"], file_name)
+            else:
+                await send_message(chat_id, "❌ Please send an .xlsx or .csv file.")
+        return
 
-    return {"ok": True}
+    # Handle awaiting_mapping_keyword state before command routing
+    state = user_state.get(chat_id, {})
+    if state.get("step") == "awaiting_mapping_keyword" and not text.startswith("/"):
+        await handle_mapping_keyword(chat_id, text, db)
+        return
+
+    # Commands
+    if text == "/day":
+        await handle_summary(chat_id, "day")
+    elif text == "/week":
+        await handle_summary(chat_id, "week")
+    elif text == "/month":
+        await handle_summary(chat_id, "month")
+    elif text == "/summary":
+        await handle_all_summaries(chat_id)
+    elif text == "/start":
+        kb = get_category_keyboard_for(db, chat_id)
+        await send_message(chat_id, f"Hey, {user.first_name}! Choose a category:", reply_markup=kb)
+    elif text == "/cancel":
+        user_state.pop(chat_id, None)
+        cancel_import(chat_id)
+        kb = get_category_keyboard_for(db, chat_id)
+        await send_message(chat_id, "Cancelled. Choose a category:", reply_markup=kb)
+    elif text == "/import":
+        user_state[chat_id] = {"step": "awaiting_import_file"}
+        await send_message(chat_id, "Send your Click `.xlsx` or a `.csv` export (or /cancel):")
+    elif text == "/add_mapping":
+        await handle_add_mapping(chat_id, db)
+    elif text == "/list_mappings":
+        await handle_list_mappings(chat_id, db)
+    elif text == "/unmatched":
+        await handle_list_unmatched(chat_id, db)
+    elif text.startswith("/remove_mapping"):
+        await handle_remove_mapping(chat_id, text, db)
+    elif text.startswith("/digest"):
+        await handle_digest(chat_id, text, db)
+    elif text.startswith("/add_category"):
+        await handle_add_category(chat_id, text, db)
+    elif text.startswith("/remove_category"):
+        await handle_remove_category(chat_id, text, db)
+    elif text.startswith("/"):
+        await send_message(chat_id, (
+            "Unknown command. Available commands:\n\n"
+            "/day — today's expenses\n"
+            "/week — this week's expenses\n"
+            "/month — this month's expenses\n"
+            "/summary — today, this week, this month and last month at once\n"
+            "/digest <day|week|month> — toggle a scheduled digest\n"
+            "/import — import a Click .xlsx or .csv file\n"
+            "/add\\_mapping — map a service keyword to a category\n"
+            "/list\\_mappings — show all keyword mappings\n"
+            "/remove\\_mapping <keyword> — remove a mapping\n"
+            "/unmatched — imported rows waiting for a mapping\n"
+            "/add\\_category <name> — add a category\n"
+            "/remove\\_category <name> — remove a category\n"
+            "/cancel — cancel current input\n\n"
+            "Log several expenses at once, one per line: `groceries 25k`"
+        ))
+    else:
+        await expense_input(chat_id, text, db)
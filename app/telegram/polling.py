@@ -0,0 +1,88 @@
+"""Long-polling ingestion (TELEGRAM_MODE=polling): getUpdates instead of a webhook.
+
+Each batch of up to POLL_BATCH_SIZE updates is grouped by chat. Up to
+POLL_CONCURRENCY chats are handled concurrently, and each chat's updates run in order on one DB session
+(handlers.process_updates). The offset only moves past a batch once all of it
+has been handled, so updates in flight when the process dies are redelivered.
+"""
+import asyncio
+import logging
+from collections import defaultdict
+
+from app.config import POLL_BATCH_SIZE, POLL_CONCURRENCY, POLL_TIMEOUT
+from app.telegram.handlers import TELEGRAM_API, _chat_id, get_http_client, process_updates, throttle
+
+log = logging.getLogger(__name__)
+
+MAX_BACKOFF = 60
+
+
+class BotAPIError(Exception):
+    pass
+
+
+async def _call(method: str, **params):
+    # The HTTP timeout has to outlast the long poll itself.
+    r = await get_http_client().post(f"{TELEGRAM_API}/{method}", json=params, timeout=POLL_TIMEOUT + 10)
+    body = r.json()
+    if not body.get("ok"):
+        raise BotAPIError(f"{method}: {body.get('error_code')} {body.get('description')}")
+    return body["result"]
+
+
+def group_by_chat(updates: list[dict]) -> dict[int, list[dict]]:
+    """Updates per chat, in arrival order; updates without a chat are dropped."""
+    chats = defaultdict(list)
+    for update in updates:
+        chat_id = _chat_id(update)
+        if chat_id is not None:
+            chats[chat_id].append(update)
+    return chats
+
+
+async def _process_chat(slots: asyncio.Semaphore, chat_id: int, updates: list[dict]) -> None:
+    # A throttled chat waits for its token: the batch is acknowledged as a whole,
+    # so skipping its updates would lose them.
+    wait = await throttle(chat_id)
+    if wait:
+        await asyncio.sleep(wait)
+    async with slots:
+        try:
+            await process_updates(chat_id, updates)
+        except Exception:
+            log.exception("Failed to handle updates from chat %s", chat_id)
+
+
+async def handle_batch(updates: list[dict]) -> int | None:
+    """Handles a getUpdates batch; returns the offset that acknowledges it."""
+    if not updates:
+        return None
+    # Bounded: a chat waiting on the Bot API keeps its DB connection checked out, and
+    # a pool checkout that has to wait would block the event loop.
+    slots = asyncio.Semaphore(POLL_CONCURRENCY)
+    await asyncio.gather(*(_process_chat(slots, chat_id, chat_updates)
+                           for chat_id, chat_updates in group_by_chat(updates).items()))
+    return max(u["update_id"] for u in updates) + 1
+
+
+async def run_polling() -> None:
+    """Runs for the app lifetime; started and cancelled from the lifespan."""
+    offset = None
+    webhook_deleted = False
+    backoff = 1
+    while True:
+        try:
+            if not webhook_deleted:  # getUpdates is refused while a webhook is registered
+                await _call("deleteWebhook")
+                webhook_deleted = True
+            updates = await _call("getUpdates", offset=offset, limit=POLL_BATCH_SIZE,
+                                  timeout=POLL_TIMEOUT, allowed_updates=["message", "callback_query"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            log.warning("getUpdates failed (%s), retrying in %ds", e, backoff)
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, MAX_BACKOFF)
+            continue
+        backoff = 1
+        offset = await handle_batch(updates) or offset
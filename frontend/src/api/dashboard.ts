@@ -0,0 +1,7 @@
+import client from './client'
+import type { Dashboard } from '../types'
+
+export async function getDashboard(year: number, month: number): Promise<Dashboard> {
+  const { data } = await client.get('/dashboard', { params: { year, month } })
+  return data
+}
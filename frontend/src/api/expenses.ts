@@ -1,5 +1,5 @@
 import client from './client'
-import type { Expense, ExpenseList, SummaryItem, MonthlyTotalItem } from '../types'
+import type { Expense, ExpenseList, SummaryItem, MonthlyTotalItem, ImportResult } from '../types'
 
 export async function getExpenses(params: {
   page?: number
@@ -7,6 +7,7 @@ export async function getExpenses(params: {
   category_id?: number
   start_date?: string
   end_date?: string
+  q?: string
 }): Promise<ExpenseList> {
   const { data } = await client.get('/expenses', { params })
   return data
@@ -47,3 +48,12 @@ export async function getMonthlyTotals(months = 6): Promise<MonthlyTotalItem[]>
   const { data } = await client.get('/expenses/monthly-totals', { params: { months } })
   return data
 }
+
+export async function importExpenses(file: File, format?: string, options?: object): Promise<ImportResult> {
+  const form = new FormData()
+  form.append('file', file)
+  if (format) form.append('format', format)
+  if (options) form.append('options', JSON.stringify(options))
+  const { data } = await client.post('/expenses/import', form)
+  return data
+}
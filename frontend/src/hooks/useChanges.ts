@@ -0,0 +1,48 @@
+import { useEffect, useState } from 'react'
+import { getToken } from './useAuth'
+
+// Counts server-sent change events touching any of `tables`; use it as an effect
+// dependency to refetch. fetch() rather than EventSource, which can't send the token.
+export function useChanges(tables: string[]): number {
+  const [version, setVersion] = useState(0)
+  const key = tables.join(',')
+
+  useEffect(() => {
+    const watched = new Set(key.split(','))
+    const controller = new AbortController()
+    let retry: ReturnType<typeof setTimeout>
+
+    async function listen() {
+      try {
+        const res = await fetch('/api/events', {
+          headers: { Authorization: `Bearer ${getToken()}` },
+          signal: controller.signal,
+        })
+        if (!res.ok || !res.body) throw new Error(String(res.status))
+        const reader = res.body.pipeThrough(new TextDecoderStream()).getReader()
+        let buffer = ''
+        for (;;) {
+          const { value, done } = await reader.read()
+          if (done) break
+          buffer += value
+          const messages = buffer.split('\n\n')
+          buffer = messages.pop()!
+          for (const message of messages) {
+            const data = message.split('\n').find(l => l.startsWith('data: '))
+            if (!message.startsWith('event: change') || !data) continue
+            const { changed } = JSON.parse(data.slice(6)) as { changed: string[] }
+            if (changed.some(t => watched.has(t))) setVersion(v => v + 1)
+          }
+        }
+      } catch {
+        if (controller.signal.aborted) return
+      }
+      retry = setTimeout(listen, 5000)
+    }
+
+    listen()
+    return () => { controller.abort(); clearTimeout(retry) }
+  }, [key])
+
+  return version
+}
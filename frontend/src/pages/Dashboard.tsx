@@ -3,8 +3,9 @@ import {
   PieChart, Pie, Cell, Tooltip, ResponsiveContainer,
   BarChart, Bar, XAxis, YAxis, CartesianGrid,
 } from 'recharts'
-import { getSummary, getMonthlyTotals, getExpenses } from '../api/expenses'
+import { getDashboard } from '../api/dashboard'
 import { useAuth } from '../hooks/useAuth'
+import { useChanges } from '../hooks/useChanges'
 import { useTheme } from '../hooks/useTheme'
 import type { SummaryItem, MonthlyTotalItem } from '../types'
 
@@ -12,13 +13,6 @@ const COLORS = ['#6366f1', '#22c55e', '#f59e0b', '#ef4444', '#3b82f6', '#a855f7'
 
 function fmt(n: number) { return n.toLocaleString() }
 
-function pad(n: number) { return String(n).padStart(2, '0') }
-function startStr(y: number, m: number) { return `${y}-${pad(m)}-01` }
-function endStr(y: number, m: number) {
-  const d = new Date(y, m, 0)
-  return `${d.getFullYear()}-${pad(d.getMonth() + 1)}-${pad(d.getDate())}`
-}
-
 export default function Dashboard() {
   const { user } = useAuth()
   const { theme } = useTheme()
@@ -29,10 +23,10 @@ export default function Dashboard() {
   const [summary, setSummary] = useState<SummaryItem[]>([])
   const [monthly, setMonthly] = useState<MonthlyTotalItem[]>([])
   const [expenseCount, setExpenseCount] = useState(0)
+  const [budget, setBudget] = useState<number | null>(user?.budget ?? null)
   const [loading, setLoading] = useState(true)
+  const changes = useChanges(['expenses', 'categories', 'users'])
 
-  const start = startStr(year, month)
-  const end = endStr(year, month)
   const monthLabel = new Date(year, month - 1, 1).toLocaleDateString('en', { month: 'long', year: 'numeric' })
   const isCurrentMonth = year === now.getFullYear() && month === now.getMonth() + 1
   const isFuture = new Date(year, month - 1, 1) > new Date(now.getFullYear(), now.getMonth(), 1)
@@ -45,20 +39,16 @@ export default function Dashboard() {
   }
 
   useEffect(() => {
-    setLoading(true)
-    Promise.all([
-      getSummary(start, end),
-      getExpenses({ start_date: start, end_date: end, page: 1, page_size: 1 }),
-      getMonthlyTotals(6),
-    ]).then(([s, e, m]) => {
-      setSummary(s)
-      setExpenseCount(e.total)
-      setMonthly(m)
+    if (!changes) setLoading(true)  // refetches after a change keep the charts up
+    getDashboard(year, month).then(d => {
+      setSummary(d.summary)
+      setExpenseCount(d.expense_count)
+      setMonthly(d.monthly)
+      setBudget(d.budget)
     }).finally(() => setLoading(false))
-  }, [year, month])
+  }, [year, month, changes])
 
   const total = summary.reduce((s, r) => s + r.total, 0)
-  const budget = user?.budget ?? null
   const budgetPct = budget ? (total / budget) * 100 : null
   const daysInMonth = new Date(year, month, 0).getDate()
   const daysPassed = isCurrentMonth ? now.getDate() : daysInMonth
@@ -33,6 +33,13 @@ export interface ExpenseList {
   total: number
 }
 
+export interface ImportResult {
+  format: string
+  imported: number
+  duplicates: number
+  unmatched: number
+}
+
 export interface SummaryItem {
   category_name: string
   total: number
@@ -43,6 +50,13 @@ export interface MonthlyTotalItem {
   total: number
 }
 
+export interface Dashboard {
+  summary: SummaryItem[]
+  monthly: MonthlyTotalItem[]
+  expense_count: number
+  budget: number | null
+}
+
 export interface TelegramAuthPayload {
   id: number
   first_name?: string
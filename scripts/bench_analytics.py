@@ -0,0 +1,89 @@
+"""Timings of GET /api/expenses/analytics over multi-year histories.
+
+    python scripts/bench_analytics.py [--years 1 3 5] [--per-day 60] [--categories 12]
+
+Fills a temporary SQLite database with one user per history length, each with
+`--per-day` expenses on every day of `--years` years, and times the endpoint's
+three stages with `days` set to the whole history: the grouped daily query
+(repo.get_daily_category_totals), the NumPy statistics (analytics.compute), and a
+cached call keyed by data version. Best of 5 each.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app import analytics
+from app.db import repo, session
+from app.db.models import Expense
+
+SERIES_DAYS = 90
+
+
+def seed(db, user_id: int, days: int, per_day: int, categories: int) -> None:
+    repo.create_user(db, user_id, "Bench", None, f"bench{user_id}", 150_000)
+    category_ids = [repo.add_category(db, user_id, f"Category {n}").id for n in range(categories)]
+    today = date.today()
+    for day in range(days):
+        expense_date = today - timedelta(days=day)
+        db.execute(Expense.__table__.insert(), [
+            {"user_id": user_id, "category_id": category_ids[(day + n) % categories],
+             "amount": 100 + (day * 31 + n * 17) % 5000, "expense_date": expense_date}
+            for n in range(per_day)
+        ])
+    db.commit()
+
+
+def best_ms(fn, runs: int = 5) -> float:
+    best = float("inf")
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--years", type=int, nargs="+", default=[1, 3, 5])
+    parser.add_argument("--per-day", type=int, default=60)
+    parser.add_argument("--categories", type=int, default=12)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = session._create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        session.init_schema(engine)
+        db = session.SessionLocal(bind=engine)
+        print(f"{args.per_day} expenses/day over {args.categories} categories, SERIES_DAYS={SERIES_DAYS}")
+        print(f"{'years':>5}{'expenses':>10}{'rows':>8}{'query ms':>10}{'compute ms':>12}{'cached µs':>11}")
+        for years in args.years:
+            user_id = years
+            days = years * 365
+            seed(db, user_id, days, args.per_day, args.categories)
+            today = date.today()
+            start = today - timedelta(days=days - 1)
+            rows = repo.get_daily_category_totals(db, user_id, start, today)
+            query_ms = best_ms(lambda: repo.get_daily_category_totals(db, user_id, start, today))
+            compute_ms = best_ms(lambda: analytics.compute(rows, start, today, 150_000, SERIES_DAYS))
+
+            key = (user_id, repo.get_data_version(db, user_id), 150_000, today, days, SERIES_DAYS)
+            analytics.cached(key, lambda: analytics.compute(rows, start, today, 150_000, SERIES_DAYS))
+            assert analytics.cached(key, lambda: None) is not None
+            # What a cache hit costs the endpoint: the data version lookup and the LRU.
+            cached_ms = best_ms(lambda: analytics.cached(
+                (user_id, repo.get_data_version(db, user_id), 150_000, today, days, SERIES_DAYS),
+                lambda: None,
+            ))
+            print(f"{years:>5}{days * args.per_day:>10}{len(rows):>8}{query_ms:>10.1f}"
+                  f"{compute_ms:>12.1f}{cached_ms * 1000:>11.0f}")
+        db.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
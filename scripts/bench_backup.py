@@ -0,0 +1,86 @@
+"""Rows/sec of account backup (dump) and restore.
+
+    python scripts/bench_backup.py [--expenses 200000] [--runs 3] [--database-url URL]
+
+Seeds one account with `--expenses` expenses (a quarter of them imported, with
+an import_ref), streams its archive through backup.dump, and restores the archive
+into a second account with backup.restore (replace=True, so runs repeat). Uses a
+temporary SQLite file unless `--database-url` names a scratch database; on
+Postgres the restore goes through COPY. Prints the best of `--runs` each way.
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app.db import backup, repo, session
+from app.db.models import Expense
+
+SOURCE, TARGET = 1, 2
+
+
+def seed(expenses: int) -> None:
+    with session.UserSession(SOURCE) as db:
+        repo.create_user(db, SOURCE, "Bench", None, "bench-source", 150_000)
+        category_ids = [repo.add_category(db, SOURCE, f"Category {n}").id for n in range(12)]
+        repo.add_service_mapping(db, SOURCE, "shop", category_ids[0])
+        today = date.today()
+        for start in range(0, expenses, backup.BATCH_SIZE):
+            db.execute(Expense.__table__.insert(), [
+                {"user_id": SOURCE, "category_id": category_ids[n % 12], "amount": 100 + n % 5000,
+                 "expense_date": today - timedelta(days=n % 1000),
+                 "note": f'lunch, "{n}"' if n % 3 else None,
+                 "import_ref": f"bank-{n}" if n % 4 == 0 else None}
+                for n in range(start, min(start + backup.BATCH_SIZE, expenses))
+            ])
+        repo.rebuild_import_refs(db, SOURCE)
+        db.commit()
+    with session.UserSession(TARGET) as db:
+        repo.create_user(db, TARGET, "Bench", None, "bench-target", None)
+
+
+def best_seconds(fn, runs: int):
+    best, result = float("inf"), None
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def restore(archive: bytes) -> dict:
+    with session.UserSession(TARGET) as db:
+        return backup.restore(db, TARGET, io.BytesIO(archive), replace=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--expenses", type=int, default=200_000)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--database-url")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        session.DB_URL = args.database_url or f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        session.init_db()
+        seed(args.expenses)
+
+        dump_s, archive = best_seconds(lambda: b"".join(backup.dump(SOURCE)), args.runs)
+        restore_s, counts = best_seconds(lambda: restore(archive), args.runs)
+        assert counts["expenses"] == args.expenses, counts
+
+        print(f"{session.engine.dialect.name}, {args.expenses} expenses, "
+              f"archive {len(archive) / 1e6:.1f} MB, best of {args.runs}")
+        print(f"backup   {args.expenses / dump_s:>9.0f} rows/s  ({dump_s:.2f} s)")
+        print(f"restore  {args.expenses / restore_s:>9.0f} rows/s  ({restore_s:.2f} s)")
+        session.engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
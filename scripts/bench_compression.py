@@ -0,0 +1,87 @@
+"""Wire bytes and encode time of an expense list page by layout and Content-Encoding.
+
+    python scripts/bench_compression.py [--page-size 200] [--calls 500]
+
+Reads one GET /api/expenses page from a temporary SQLite database, encodes it in
+the default row layout and in ?layout=columns the way the endpoint does, then
+compresses each body with every coding CompressionMiddleware can negotiate
+(br only when the brotli package is installed). Prints bytes and the mean time
+per call (best of 5) of the encode and of each compression on top of it.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app.api.responses import RawJSONResponse, rows_to_columns, rows_to_dicts
+from app.compression import ENCODINGS, compress
+from app.db import repo, session
+from app.db.models import Expense
+
+USER_ID = 1
+LOOKUP = ("category_id", "category_name", "categories")  # as list_expenses passes it
+
+
+def seed(db, expenses: int) -> None:
+    repo.create_user(db, USER_ID, "Bench", None, "bench", None)
+    names = ["Groceries", "Transport", "Restaurants", "Utilities", "Health", "Entertainment"]
+    category_ids = [repo.add_category(db, USER_ID, name).id for name in names]
+    today = date.today()
+    db.execute(Expense.__table__.insert(), [
+        {"user_id": USER_ID, "category_id": category_ids[n % len(names)], "amount": 1000 + n * 37 % 90_000,
+         "expense_date": today - timedelta(days=n // 5), "note": f"Card payment {n}" if n % 2 else None,
+         "import_ref": f"click-{20250000 + n}" if n % 3 else None}
+        for n in range(expenses)
+    ])
+    db.commit()
+
+
+def best_ms(fn, calls: int) -> float:
+    best = float("inf")
+    for _ in range(5):
+        started = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        best = min(best, time.perf_counter() - started)
+    return best / calls * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--page-size", type=int, default=200)
+    parser.add_argument("--calls", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = session._create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        session.init_schema(engine)
+        db = session.SessionLocal(bind=engine)
+        seed(db, args.page_size * 5)
+        rows, total = repo.get_expenses_paginated(db, USER_ID, 1, args.page_size)
+        db.close()
+        engine.dispose()
+
+    layouts = {
+        "rows": lambda: RawJSONResponse({"items": rows_to_dicts(repo.EXPENSE_ROW_FIELDS, rows), "total": total}).body,
+        "columns": lambda: RawJSONResponse(
+            {**rows_to_columns(repo.EXPENSE_ROW_FIELDS, rows, LOOKUP), "total": total}
+        ).body,
+    }
+    print(f"page_size={args.page_size}; bytes and ms per call (compression time is on top of the encode)")
+    print(f"{'layout':<9}{'json':>18}" + "".join(f"{coding:>18}" for coding in ENCODINGS))
+    for layout, encode in layouts.items():
+        body = encode()
+        cells = [f"{len(body):>7} B {best_ms(encode, args.calls):.2f} ms"]
+        for coding in ENCODINGS:
+            size = len(compress(body, coding))
+            cells.append(f"{size:>7} B +{best_ms(lambda: compress(body, coding), args.calls):.2f} ms")
+        print(f"{layout:<9}" + "".join(f"{cell:>18}" for cell in cells))
+
+
+if __name__ == "__main__":
+    main()
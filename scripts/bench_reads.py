@@ -0,0 +1,115 @@
+"""Rows/sec and memory of the expense list page: column projection vs. ORM objects.
+
+    python scripts/bench_reads.py [--expenses 20000] [--page-size 200] [--calls 200]
+
+Fills a temporary SQLite database, then builds the GET /api/expenses body both
+ways: the projection path the endpoint uses (repo.get_expenses_paginated rows
+serialized once by RawJSONResponse), and the ORM path it replaced (Expense
+objects with their category, converted to ExpenseOut and re-validated against
+the response_model before encoding, as FastAPI does for a returned model).
+Prints rows/sec (best of 5) and the peak memory traced while building one page.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from sqlalchemy.orm import joinedload
+
+from app.api.responses import RawJSONResponse, rows_to_dicts
+from app.api.routers.expenses import _expense_to_schema
+from app.api.schemas import ExpenseListOut
+from app.db import repo, session
+from app.db.models import Expense
+
+USER_ID = 1
+
+
+def seed(db, expenses: int) -> None:
+    repo.create_user(db, USER_ID, "Bench", None, "bench", None)
+    category_ids = [repo.add_category(db, USER_ID, f"Category {n}").id for n in range(12)]
+    today = date.today()
+    db.execute(Expense.__table__.insert(), [
+        {"user_id": USER_ID, "category_id": category_ids[n % 12], "amount": 100 + n % 5000,
+         "expense_date": today - timedelta(days=n % 1000), "note": f"note {n}", "import_ref": None}
+        for n in range(expenses)
+    ])
+    db.commit()
+
+
+def projection_page(db, page: int, page_size: int) -> bytes:
+    rows, total = repo.get_expenses_paginated(db, USER_ID, page, page_size)
+    return RawJSONResponse({"items": rows_to_dicts(repo.EXPENSE_ROW_FIELDS, rows), "total": total}).body
+
+
+_list_out = TypeAdapter(ExpenseListOut)
+
+
+def orm_page(db, page: int, page_size: int) -> bytes:
+    query = db.query(Expense).filter(Expense.user_id == USER_ID)
+    total = query.count()
+    expenses = (
+        query.options(joinedload(Expense.category))
+        .order_by(Expense.expense_date.desc(), Expense.id.desc())
+        .offset((page - 1) * page_size)
+        .limit(page_size)
+        .all()
+    )
+    body = {"items": [_expense_to_schema(e) for e in expenses], "total": total}
+    validated = _list_out.validate_python(jsonable_encoder(body))
+    return json.dumps(jsonable_encoder(validated)).encode()
+
+
+def measure(db, build, pages: int, page_size: int, calls: int) -> tuple[float, int]:
+    """(rows/sec best of 5, peak bytes traced while building one page)."""
+    best = float("inf")
+    for _ in range(5):
+        started = time.perf_counter()
+        for n in range(calls):
+            build(db, n % pages + 1, page_size)
+            db.expunge_all()  # each request gets a fresh session
+        best = min(best, time.perf_counter() - started)
+    tracemalloc.start()
+    build(db, 1, page_size)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    db.expunge_all()
+    return calls * page_size / best, peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--expenses", type=int, default=20_000)
+    parser.add_argument("--page-size", type=int, default=200)
+    parser.add_argument("--calls", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = session._create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        session.init_schema(engine)
+        db = session.SessionLocal(bind=engine)
+        seed(db, args.expenses)
+        pages = args.expenses // args.page_size
+        assert json.loads(orm_page(db, 1, args.page_size)) == json.loads(projection_page(db, 1, args.page_size))
+        db.expunge_all()
+
+        print(f"{args.expenses} expenses, page_size={args.page_size}, {args.calls} pages per run")
+        print(f"{'path':<12}{'rows/s':>10}{'peak KiB/page':>16}")
+        for name, build in (("orm", orm_page), ("projection", projection_page)):
+            rate, peak = measure(db, build, pages, args.page_size, args.calls)
+            print(f"{name:<12}{rate:>10.0f}{peak / 1024:>16.0f}")
+        db.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
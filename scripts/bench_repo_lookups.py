@@ -0,0 +1,102 @@
+"""Per-call overhead of repo's hot-path lookups vs. the legacy query chains.
+
+    python scripts/bench_repo_lookups.py [--calls 5000] [--runs 5]
+
+Runs each lookup `--calls` times against a small temporary SQLite database, once
+as a fresh `db.query(...).filter_by(...)` chain (what repo did before) and once
+through repo's statically built statements, and prints µs per call (best of
+`--runs`). The session is emptied after every call, as a per-update session
+would be, so get_user can't answer from the identity map.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app.db import repo, session
+from app.db.models import Category, Expense, ImportRef, User
+
+USER_ID = 1
+
+
+def seed(db) -> tuple[int, int]:
+    """(category_id, expense_id) to look up."""
+    for user_id in range(USER_ID, USER_ID + 100):
+        repo.create_user(db, user_id, "Bench", None, f"bench{user_id}", None)
+    category_id = repo.add_category(db, USER_ID, "Food").id
+    for n in range(50):
+        repo.add_category(db, USER_ID, f"Category {n}")
+    repo.create_expenses(db, USER_ID, [(category_id, 100 + n) for n in range(200)])
+    for n in range(200):
+        repo.claim_import_ref(db, USER_ID, f"bank-{n}")
+    db.commit()
+    expense_id = db.query(Expense.id).filter_by(user_id=USER_ID).order_by(Expense.id.desc()).first()[0]
+    return category_id, expense_id
+
+
+def lookups(category_id: int, expense_id: int) -> list[tuple[str, object, object]]:
+    """(name, legacy(db), repo(db)) pairs that return the same thing."""
+    live = Category.deleted_at.is_(None)
+    return [
+        ("get_user",
+         lambda db: db.query(User).filter_by(id=USER_ID).first(),
+         lambda db: repo.get_user(db, USER_ID)),
+        ("username_exists",
+         lambda db: db.query(User).filter_by(username="bench50").first() is not None,
+         lambda db: repo.username_exists(db, "bench50")),
+        ("get_category_by_name",
+         lambda db: db.query(Category).filter_by(user_id=USER_ID, name="Food").filter(live).first(),
+         lambda db: repo.get_category_by_name(db, USER_ID, "Food")),
+        ("import_ref_exists (hit)",
+         lambda db: db.query(ImportRef).filter_by(user_id=USER_ID, import_ref="bank-7").first() is not None,
+         lambda db: repo.import_ref_exists(db, USER_ID, "bank-7")),
+        ("import_ref_exists (miss)",
+         lambda db: db.query(ImportRef).filter_by(user_id=USER_ID, import_ref="other").first() is not None,
+         lambda db: repo.import_ref_exists(db, USER_ID, "other")),
+        ("get_expense",
+         lambda db: db.query(Expense).filter_by(id=expense_id, user_id=USER_ID).first(),
+         lambda db: repo.get_expense(db, USER_ID, expense_id)),
+    ]
+
+
+def per_call_us(db, fn, calls: int, runs: int) -> float:
+    best = float("inf")
+    for _ in range(runs):
+        started = time.perf_counter()
+        for _ in range(calls):
+            fn(db)
+            db.expunge_all()
+        best = min(best, time.perf_counter() - started)
+    return best / calls * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=5000)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = session._create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        session.init_schema(engine)
+        db = session.SessionLocal(bind=engine)
+        cases = lookups(*seed(db))
+
+        print(f"SQLite, {args.calls} calls, best of {args.runs}, µs per call")
+        print(f"{'':<26}{'legacy':>8}{'repo':>8}")
+        for name, legacy, current in cases:
+            assert legacy(db) == current(db), name
+            db.expunge_all()
+            before = per_call_us(db, legacy, args.calls, args.runs)
+            after = per_call_us(db, current, args.calls, args.runs)
+            print(f"{name:<26}{before:>8.0f}{after:>8.0f}")
+        db.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
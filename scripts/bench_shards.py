@@ -0,0 +1,101 @@
+"""Concurrent write throughput on sharded SQLite (DATABASE_SHARDS) by shard count.
+
+    python scripts/bench_shards.py [--shards 1 2 4] [--writers 8] [--writes 300] [--users 64]
+
+For each shard count, creates `--users` users in fresh temporary SQLite files,
+then starts `--writers` processes that each commit `--writes` expenses
+(repo.create_expense, one transaction per write, as the bot does) for their own
+users, and prints total commits/sec. Writes to different shards don't share a
+file lock, so throughput should grow with shards on a multi-core machine.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)  # also runs in the spawned processes, which re-import this file
+
+
+def _configure(url: str, shards: int) -> None:
+    # app.config reads these at import, so each process sets them before importing app.
+    os.environ["DATABASE_URL"] = url
+    os.environ["DATABASE_SHARDS"] = str(shards)
+
+
+def _users_of(writer: int, writers: int, users: int) -> list[int]:
+    return [user_id for user_id in range(1, users + 1) if user_id % writers == writer]
+
+
+def setup(url: str, shards: int, users: int) -> None:
+    _configure(url, shards)
+    from app.db import repo, session
+
+    session.init_db()
+    for user_id in range(1, users + 1):
+        with session.UserSession(user_id) as db:
+            repo.create_user(db, user_id, "Bench", None, f"bench{user_id}", None)
+            repo.add_category(db, user_id, "Food")
+
+
+def write(url: str, shards: int, user_ids: list[int], writes: int, start) -> None:
+    _configure(url, shards)
+    from app.db import repo, session
+
+    categories = {}
+    for user_id in user_ids:
+        with session.UserSession(user_id) as db:
+            categories[user_id] = repo.get_categories(db, user_id)[0].id
+    start.wait()
+    for n in range(writes):
+        user_id = user_ids[n % len(user_ids)]
+        with session.UserSession(user_id) as db:
+            repo.create_expense(db, user_id, categories[user_id], 100 + n)
+
+
+def run(shards: int, writers: int, writes: int, users: int) -> float:
+    ctx = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        prepare = ctx.Process(target=setup, args=(url, shards, users))
+        prepare.start()
+        prepare.join()
+        if prepare.exitcode:
+            raise SystemExit("setup failed")
+
+        start = ctx.Barrier(writers + 1)
+        procs = [
+            ctx.Process(target=write, args=(url, shards, _users_of(i, writers, users), writes, start))
+            for i in range(writers)
+        ]
+        for proc in procs:
+            proc.start()
+        start.wait()
+        started = time.perf_counter()
+        for proc in procs:
+            proc.join()
+        elapsed = time.perf_counter() - started
+        if any(proc.exitcode for proc in procs):
+            raise SystemExit("a writer failed")
+    return writers * writes / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--writes", type=int, default=300, help="commits per writer")
+    parser.add_argument("--users", type=int, default=64)
+    args = parser.parse_args()
+    if args.users < args.writers:
+        parser.error("--users must be at least --writers")
+
+    print(f"{args.writers} writer processes x {args.writes} commits, {args.users} users, {os.cpu_count()} CPUs")
+    for shards in args.shards:
+        print(f"{shards} shard(s): {run(shards, args.writers, args.writes, args.users):.0f} writes/s")
+
+
+if __name__ == "__main__":
+    main()
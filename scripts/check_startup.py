@@ -0,0 +1,60 @@
+"""Fails when `import app.main` gets slow or loads what it should load lazily.
+
+    python scripts/check_startup.py [--budget-ms 1500] [--runs 3]
+
+Imports app.main in fresh interpreters under `-X importtime` and checks that none
+of LAZY was imported (openpyxl is for /import, httpx for the bot, numpy for
+analytics, DB drivers for the first query) and that the best run's cumulative
+import time of app.main stays under the budget.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAZY = ("openpyxl", "httpx", "numpy", "psycopg2", "sqlite3")
+
+
+def measure() -> tuple[int, set[str]]:
+    """(cumulative µs for app.main, top-level packages imported) from one run."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if proc.returncode:
+        sys.exit(f"import app.main failed:\n{proc.stderr}")
+    total, loaded = None, set()
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        loaded.add(name.split(".")[0])
+        if name == "app.main":
+            total = int(cumulative)
+    return total, loaded
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=1500)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    runs = [measure() for _ in range(args.runs)]
+    best_ms = min(total for total, _ in runs) / 1000
+    eager = sorted(set(LAZY) & set().union(*(loaded for _, loaded in runs)))
+    print(f"import app.main: {best_ms:.0f} ms (best of {args.runs}, budget {args.budget_ms:.0f} ms)")
+    failed = False
+    if eager:
+        print(f"loaded at import time, should be lazy: {', '.join(eager)}")
+        failed = True
+    if best_ms > args.budget_ms:
+        print("over budget")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
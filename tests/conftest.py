@@ -0,0 +1,45 @@
+import os
+import uuid
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+
+from app.db import session
+
+# A Postgres server to run the Postgres-only tests against, e.g.
+# postgresql+psycopg2://postgres@localhost/postgres. Each test gets a database of
+# its own, dropped afterwards; without it those tests are skipped.
+TEST_POSTGRES_URL = os.getenv("TEST_POSTGRES_URL")
+
+
+@pytest.fixture
+def pg_engine():
+    if not TEST_POSTGRES_URL:
+        pytest.skip("TEST_POSTGRES_URL is not set")
+    name = f"fintrack_test_{uuid.uuid4().hex[:12]}"
+    admin = create_engine(TEST_POSTGRES_URL, isolation_level="AUTOCOMMIT")
+    with admin.connect() as conn:
+        conn.execute(text(f"CREATE DATABASE {name}"))
+    engine = session._create_engine(make_url(TEST_POSTGRES_URL).set(database=name).render_as_string(hide_password=False))
+    try:
+        yield engine
+    finally:
+        engine.dispose()
+        with admin.connect() as conn:
+            conn.execute(text(f"DROP DATABASE {name}"))
+        admin.dispose()
+
+
+@pytest.fixture
+def app_db(tmp_path, monkeypatch):
+    """Points the app's own sessions (UserSession, ReadSession, ...) at a fresh
+    SQLite file; yields its engine."""
+    monkeypatch.setattr(session, "DB_URL", f"sqlite:///{tmp_path / 'app.db'}")
+    monkeypatch.setattr(session, "engine", None)
+    monkeypatch.setattr(session, "shard_engines", [])
+    monkeypatch.setattr(session, "read_engines", [])
+    session.init_db()
+    yield session.engine
+    session.engine.dispose()
+    session.SessionLocal.configure(bind=None)
@@ -0,0 +1,109 @@
+"""backup.restore loads exactly what an archive holds, on SQLite and through COPY
+on Postgres, and GET /api/users/me/backup streams from the dump's own session only."""
+import gzip
+import io
+from datetime import date, datetime, timezone
+
+import jwt
+import orjson
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from app.config import JWT_ALGORITHM, JWT_SECRET
+from app.db import backup, repo, session
+from app.db.models import Expense, StagedImportRow, User
+from app.imports.pipeline import new_counts, store_batch
+from app.main import app
+
+USER_ID = 1
+DAY = date(2025, 6, 1)
+STAMP = datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+
+
+@pytest.fixture(params=["sqlite", "postgres"])
+def db(request, tmp_path):
+    if request.param == "sqlite":
+        engine = session._create_engine(f"sqlite:///{tmp_path / 'backup.db'}")
+    else:
+        engine = request.getfixturevalue("pg_engine")
+    session.init_schema(engine)
+    db = session.SessionLocal(bind=engine)
+    db.add(User(id=USER_ID, username="test"))
+    db.commit()
+    yield db
+    db.close()
+    engine.dispose()
+
+
+def archive(sections: dict[str, tuple[list[str], list[list]]]) -> io.BytesIO:
+    lines = [{"format": backup.FORMAT, "version": backup.VERSION, "created_at": STAMP}]
+    for name, (columns, rows) in sections.items():
+        lines.append({"section": name, "columns": columns})
+        lines.extend(rows)
+    return io.BytesIO(gzip.compress(b"".join(orjson.dumps(line) + b"\n" for line in lines)))
+
+
+def restored(db) -> list[tuple]:
+    return db.execute(
+        select(Expense.note, Expense.import_ref, Expense.created_at)
+        .where(Expense.user_id == USER_ID).order_by(Expense.amount)
+    ).all()
+
+
+def test_notes_and_refs_keep_empty_strings_apart_from_null(db):
+    notes = [None, "", 'lunch, "with" friends\nand more', "\\N"]
+    data = archive({
+        "categories": (["id", "name"], [[7, "Food"]]),
+        "expenses": (list(backup.EXPENSE_COLUMNS), [
+            [7, 100 + n, DAY.isoformat(), note, None if n else "", STAMP.isoformat()] for n, note in enumerate(notes)
+        ]),
+    })
+    assert backup.restore(db, USER_ID, data)["expenses"] == len(notes)
+    rows = restored(db)
+    assert [note for note, _, _ in rows] == notes
+    assert [ref for _, ref, _ in rows] == ["", None, None, None]
+
+
+def test_missing_created_at_gets_the_column_default(db):
+    data = archive({"expenses": (list(backup.EXPENSE_COLUMNS), [
+        [None, 100, DAY.isoformat(), None, None, STAMP.isoformat()],
+        [None, 200, DAY.isoformat(), None, None, None],
+    ])})
+    assert backup.restore(db, USER_ID, data)["expenses"] == 2
+    (_, _, stamped), (_, _, defaulted) = restored(db)
+    assert stamped.replace(tzinfo=timezone.utc) == STAMP  # SQLite hands back naive datetimes
+    assert defaulted is not None
+
+
+def test_replace_clears_staged_import_rows(db):
+    store_batch(db, USER_ID, [("ref-1", DAY, "Unknown shop", 10)], [], new_counts())
+    assert db.query(StagedImportRow).count() == 1
+    data = archive({"categories": (["id", "name"], [[1, "Food"]])})
+    backup.restore(db, USER_ID, data, replace=True)
+    assert db.query(StagedImportRow).count() == 0
+
+
+def test_backup_endpoint_streams_from_the_dumps_session_only(app_db, monkeypatch):
+    with session.UserSession(USER_ID) as db:
+        repo.create_user(db, USER_ID, "Test", None, "test", None)
+        category_id = repo.add_category(db, USER_ID, "Food").id
+        repo.create_expenses(db, USER_ID, [(category_id, 100 + n) for n in range(50)], DAY)
+
+    checked_out = []
+    dump = backup.dump
+
+    def counting_dump(user_id):
+        for chunk in dump(user_id):
+            checked_out.append(app_db.pool.checkedout())
+            yield chunk
+
+    monkeypatch.setattr(backup, "dump", counting_dump)
+    token = jwt.encode({"sub": str(USER_ID)}, JWT_SECRET, algorithm=JWT_ALGORITHM)
+    response = TestClient(app).get("/api/users/me/backup", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+    assert response.headers["content-disposition"].startswith('attachment; filename="fintrack-test-')
+    lines = gzip.decompress(response.content).splitlines()
+    assert orjson.loads(lines[0])["format"] == backup.FORMAT
+    assert len(lines) == 1 + 4 + 1 + 1 + 50  # header, section lines, user, category, expenses
+    assert checked_out and set(checked_out) == {1}
@@ -0,0 +1,73 @@
+"""Over the bot rate limit, updates are delayed or redelivered, never dropped."""
+import asyncio
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.ratelimit import RateLimiter
+from app.telegram import handlers, polling
+
+CHAT = 42
+
+
+class FakeSession:
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def bot(monkeypatch):
+    """Records handled update ids and sent messages instead of touching the DB or Bot API."""
+    handled, sent = [], []
+
+    async def handle_update(update, db):
+        handled.append(update["update_id"])
+
+    async def send_message(chat_id, text, reply_markup=None):
+        sent.append((chat_id, text))
+
+    monkeypatch.setattr(handlers, "handle_update", handle_update)
+    monkeypatch.setattr(handlers, "send_message", send_message)
+    monkeypatch.setattr(handlers, "UserSession", lambda user_id: FakeSession())
+    monkeypatch.setattr(handlers, "limiter", RateLimiter({"bot": (20.0, 10.0)}, max_keys=100))
+    return handled, sent
+
+
+def message(update_id: int, chat_id: int = CHAT) -> dict:
+    return {"update_id": update_id, "message": {"chat": {"id": chat_id}, "text": f"coffee {update_id}"}}
+
+
+def test_batch_over_the_limit_handles_every_update(bot):
+    handled, _ = bot
+    batches = [[message(n * 30 + i) for i in range(30)] + [message(1000 + n, chat_id=7)] for n in range(15)]
+
+    async def run():
+        return [await polling.handle_batch(batch) for batch in batches]
+
+    offsets = asyncio.run(run())
+    expected = [u["update_id"] for batch in batches for u in batch]
+    assert sorted(handled) == sorted(expected)
+    # The 11th batch on: the chat's bucket (burst 10) is empty, so its share waited, in order.
+    assert [i for i in handled if i < 1000] == sorted(i for i in expected if i < 1000)
+    assert offsets == [max(u["update_id"] for u in batch) + 1 for batch in batches]
+
+
+def test_webhook_over_the_limit_is_not_acknowledged(bot):
+    handled, sent = bot
+    app = FastAPI()
+    app.include_router(handlers.router)
+    client = TestClient(app)
+    codes = [client.post("/webhook", json=message(i)).status_code for i in range(11)]
+
+    assert codes == [200] * 10 + [429]
+    assert handled == list(range(10))
+    assert len(sent) == 1 and sent[0][0] == CHAT
+    # Telegram redelivers the 11th; once the bucket has refilled it is handled.
+    time.sleep(0.1)
+    assert client.post("/webhook", json=message(10)).status_code == 200
+    assert handled == list(range(11))
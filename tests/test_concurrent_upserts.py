@@ -0,0 +1,105 @@
+"""The ON CONFLICT upserts in repo hold up under concurrent writers: no lost
+monthly_spend/data_version increments and no IntegrityError on duplicate names.
+Runs against a temporary SQLite file, one session per thread."""
+import threading
+from datetime import date
+
+import pytest
+
+from app.db import repo, session
+from app.db.models import Category, Expense
+from app.imports.pipeline import new_counts, store_batch
+
+THREADS = 8
+ROUNDS = 25
+USER_ID = 1
+DAY = date(2025, 3, 14)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = session._create_engine(f"sqlite:///{tmp_path / 'race.db'}")
+    session.init_schema(engine)
+    db = session.SessionLocal(bind=engine)
+    repo.create_user(db, USER_ID, "Test", None, "test", None)
+    db.close()
+    yield engine
+    engine.dispose()
+
+
+def run_threads(engine, work) -> list[Exception]:
+    """Runs work(db, thread_index) in THREADS threads released together."""
+    start = threading.Barrier(THREADS)
+    errors = []
+
+    def target(i):
+        db = session.SessionLocal(bind=engine)
+        try:
+            start.wait()
+            work(db, i)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=target, args=(i,)) for i in range(THREADS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return errors
+
+
+def test_month_spend_and_data_version_lose_no_increments(engine):
+    db = session.SessionLocal(bind=engine)
+    category_id = repo.add_category(db, USER_ID, "food").id
+    db.close()
+
+    def work(db, i):
+        for _ in range(ROUNDS):
+            repo.create_expenses(db, USER_ID, [(category_id, 10), (category_id, i + 1)], DAY)
+
+    assert run_threads(engine, work) == []
+    db = session.SessionLocal(bind=engine)
+    expected = sum(ROUNDS * (10 + i + 1) for i in range(THREADS))
+    assert repo.get_month_spend(db, USER_ID, DAY) == expected
+    assert repo.get_data_version(db, USER_ID) == THREADS * ROUNDS
+    db.close()
+
+
+def test_same_category_name_is_created_once(engine):
+    created = []
+
+    def work(db, i):
+        for n in range(ROUNDS):
+            if repo.add_category(db, USER_ID, f"shared {n}") is not None:
+                created.append(n)
+
+    assert run_threads(engine, work) == []
+    assert sorted(created) == list(range(ROUNDS))
+    db = session.SessionLocal(bind=engine)
+    assert db.query(Category).filter(Category.user_id == USER_ID).count() == ROUNDS
+    db.close()
+
+
+def test_overlapping_import_batches_store_each_row_once(engine):
+    db = session.SessionLocal(bind=engine)
+    category_id = repo.add_category(db, USER_ID, "taxi").id
+    db.close()
+    rows = [(f"ref-{n}", DAY, "Taxi ride", 100 + n) for n in range(ROUNDS * 4)]
+    mappings = [("taxi", category_id)]
+    counts = [new_counts() for _ in range(THREADS)]
+
+    def work(db, i):
+        # Every thread stores every row, in batches that start at different offsets.
+        shifted = rows[i:] + rows[:i]
+        for n in range(0, len(shifted), 10):
+            store_batch(db, USER_ID, shifted[n:n + 10], mappings, counts[i])
+
+    assert run_threads(engine, work) == []
+    assert sum(c["imported"] for c in counts) == len(rows)
+    assert sum(c["duplicates"] for c in counts) == len(rows) * (THREADS - 1)
+    db = session.SessionLocal(bind=engine)
+    assert db.query(Expense).filter(Expense.user_id == USER_ID).count() == len(rows)
+    assert repo.get_month_spend(db, USER_ID, DAY) == sum(amount for *_, amount in rows)
+    db.close()
@@ -0,0 +1,86 @@
+"""A digest run for many subscribers: one grouped query per due period, one message
+per subscriber with expenses."""
+import asyncio
+from contextlib import contextmanager
+from datetime import date
+
+import pytest
+from sqlalchemy import event, insert
+
+from app.db import repo, session
+from app.db.models import Category, DigestSubscription, Expense, User
+from app.telegram import digests
+
+SUBSCRIBERS = 3000
+DAY = date(2025, 5, 14)  # a Wednesday mid-month: only daily digests are due
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = session._create_engine(f"sqlite:///{tmp_path / 'digests.db'}")
+    session.init_schema(engine)
+    users = range(1, SUBSCRIBERS + 101)  # the last 100 aren't subscribed
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"id": u, "username": f"user{u}"} for u in users])
+        conn.execute(insert(Category), [{"id": u, "user_id": u, "name": "Food"} for u in users])
+        conn.execute(insert(DigestSubscription), [{"user_id": u, "period": "day"} for u in users if u <= SUBSCRIBERS])
+        conn.execute(insert(DigestSubscription), [{"user_id": u, "period": "week"} for u in range(1, 11)])
+        # Every user spent today except every tenth subscriber; one more expense per user is outside the day.
+        conn.execute(insert(Expense), [
+            {"user_id": u, "category_id": cid, "amount": amount, "expense_date": day}
+            for u in users if u % 10
+            for cid, amount, day in ((u, u, DAY), (None, 7, DAY), (u, 1000, date(2025, 5, 13)))
+        ])
+    yield engine
+    engine.dispose()
+
+
+@contextmanager
+def counting_queries(engine):
+    statements = []
+
+    def listener(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+
+
+def test_summaries_for_every_subscriber_come_from_one_query(engine):
+    db = session.SessionLocal(bind=engine)
+    with counting_queries(engine) as statements:
+        summaries = repo.get_digest_summaries(db, "day", DAY, DAY)
+    db.close()
+    assert len(statements) == 1
+    assert len(summaries) == SUBSCRIBERS - SUBSCRIBERS // 10
+    assert summaries[11] == [("Food", 11), ("Uncategorized", 7)]
+    assert summaries[3] == [("Uncategorized", 7), ("Food", 3)]
+
+
+def test_digest_run_sends_each_subscriber_one_message(engine, monkeypatch):
+    def sessions():
+        db = session.SessionLocal(bind=engine)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    sent = []
+
+    async def send_message(chat_id, text, reply_markup=None):
+        sent.append((chat_id, text))
+
+    monkeypatch.setattr(digests, "shard_sessions", sessions)
+    monkeypatch.setattr(digests, "send_message", send_message)
+    monkeypatch.setattr(digests, "DIGEST_SEND_RATE", 1e9)
+
+    with counting_queries(engine) as statements:
+        asyncio.run(digests.send_digests(DAY))
+    assert len(statements) == 1
+    recipients = [chat_id for chat_id, _ in sent]
+    assert len(recipients) == len(set(recipients)) == SUBSCRIBERS - SUBSCRIBERS // 10
+    assert max(recipients) <= SUBSCRIBERS and all(chat_id % 10 for chat_id in recipients)
+    assert "Food" in dict(sent)[11] and "18" in dict(sent)[11]
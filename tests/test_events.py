@@ -0,0 +1,56 @@
+"""SSE fan-out with thousands of open subscriptions: a change wakes only the
+subscriptions of the user it belongs to, and unsubscribing leaves nothing behind."""
+import asyncio
+
+import pytest
+
+from app import events
+
+USERS = 4000
+PER_USER = 2
+TARGET = 1234
+
+
+@pytest.fixture(autouse=True)
+def caps(monkeypatch):
+    monkeypatch.setattr(events, "MAX_EVENT_CONNECTIONS", USERS * PER_USER)
+    monkeypatch.setattr(events, "MAX_EVENT_CONNECTIONS_PER_USER", PER_USER)
+    yield
+    assert events._subscribers == {} and events._count == 0
+
+
+def test_publish_wakes_only_the_users_subscriptions():
+    async def run():
+        subs = [events.subscribe(user_id) for user_id in range(USERS) for _ in range(PER_USER)]
+        assert events.connection_count() == USERS * PER_USER
+        with pytest.raises(events.TooManySubscribers):
+            events.subscribe(USERS)
+
+        # Published from a worker thread, as session.py does after a commit.
+        await asyncio.to_thread(events.publish, TARGET, {"expenses"})
+        await asyncio.sleep(0)  # let the call_soon_threadsafe callbacks run
+        woken = [sub for sub in subs if sub.ready.is_set()]
+        assert sorted(sub.user_id for sub in woken) == [TARGET] * PER_USER
+        assert all(not sub.pending for sub in subs if sub.user_id != TARGET)
+        assert [await sub.next(timeout=1) for sub in woken] == [{"expenses"}] * PER_USER
+        assert await woken[0].next(timeout=0.01) is None
+
+        for sub in subs:
+            events.unsubscribe(sub)
+        events.unsubscribe(subs[0])  # twice is harmless
+        assert events._subscribers == {}
+        assert events.connection_count() == 0
+
+    asyncio.run(run())
+
+
+def test_changes_coalesce_until_read():
+    async def run():
+        sub = events.subscribe(TARGET)
+        for tables in ({"expenses"}, {"expenses", "monthly_spend"}, {"categories"}):
+            events.publish(TARGET, tables)
+        await asyncio.sleep(0)
+        assert await sub.next(timeout=1) == {"expenses", "monthly_spend", "categories"}
+        events.unsubscribe(sub)
+
+    asyncio.run(run())
@@ -0,0 +1,66 @@
+"""POST /api/expenses/import: authenticated from the token, with the user checked in
+a session that is closed before the upload is read."""
+import jwt
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.routers import expenses
+from app.config import JWT_ALGORITHM, JWT_SECRET
+from app.db import repo, session
+from app.imports import pool
+from app.main import app
+
+USER_ID = 1
+CSV = b"Date,Amount,Merchant\n2025-05-01,120,Shop one\n2025-05-02,80,Cafe\n"
+
+
+def auth(user_id: int) -> dict:
+    return {"Authorization": "Bearer " + jwt.encode({"sub": str(user_id)}, JWT_SECRET, algorithm=JWT_ALGORITHM)}
+
+
+@pytest.fixture
+def client(app_db):
+    with session.UserSession(USER_ID) as db:
+        repo.create_user(db, USER_ID, "Test", None, "test", None)
+        repo.add_service_mapping(db, USER_ID, "shop", repo.add_category(db, USER_ID, "Shops").id)
+    yield TestClient(app)
+    pool.shutdown()
+
+
+def test_import_detects_the_format_and_stages_unmatched_rows(client, monkeypatch):
+    opened = []
+    user_session = expenses.UserSession
+
+    def tracking_session(user_id):
+        db = user_session(user_id)
+        opened.append(db)
+        return db
+
+    receive_upload = expenses.receive_upload
+
+    async def checked_receive_upload(request, max_bytes):
+        # The user check's session has given its connection back by now.
+        assert len(opened) == 1 and not opened[0].in_transaction()
+        return await receive_upload(request, max_bytes)
+
+    monkeypatch.setattr(expenses, "UserSession", tracking_session)
+    monkeypatch.setattr(expenses, "receive_upload", checked_receive_upload)
+    response = client.post("/api/expenses/import", headers=auth(USER_ID), files={"file": ("bank.csv", CSV)})
+    assert response.status_code == 200, response.text
+    assert response.json() == {"format": "csv", "imported": 1, "duplicates": 0, "unmatched": 1}
+
+
+def test_unknown_format_is_rejected(client):
+    response = client.post("/api/expenses/import", headers=auth(USER_ID),
+                           files={"file": ("bank.csv", CSV)}, data={"format": "qif"})
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Unknown format 'qif'"}
+
+
+def test_unknown_user_is_rejected_before_the_upload(client, monkeypatch):
+    def receive_upload(request, max_bytes):
+        raise AssertionError("the upload was read")
+
+    monkeypatch.setattr(expenses, "receive_upload", receive_upload)
+    response = client.post("/api/expenses/import", headers=auth(USER_ID + 1), files={"file": ("bank.csv", CSV)})
+    assert response.status_code == 401
@@ -0,0 +1,67 @@
+"""API requests stay fast while a large file import runs: parsing happens in the
+worker process and storing in a thread, so neither holds up the event loop."""
+import asyncio
+import statistics
+import time
+
+import httpx
+import jwt
+import pytest
+
+from app import ratelimit
+from app.config import JWT_ALGORITHM, JWT_SECRET
+from app.db import repo, session
+from app.imports import pipeline, pool
+from app.main import app
+
+ROWS = 5_000
+USER_ID = 1
+# Generous for a shared CI machine; with the loop blocked, GETs take as long as the
+# import (seconds).
+MAX_P95_SECONDS = 0.25
+MAX_SECONDS = 1.0
+
+
+@pytest.fixture
+def big_csv(tmp_path):
+    path = tmp_path / "big.csv"
+    with open(path, "w") as f:
+        f.write("Date,Amount,Merchant\n")
+        f.writelines(f"2025-05-{n % 28 + 1:02d},{n + 1},Shop {n}\n" for n in range(ROWS))
+    return str(path)
+
+
+@pytest.fixture
+def pool_shutdown():
+    yield
+    pool.shutdown()
+
+
+def test_api_latency_during_import(app_db, big_csv, pool_shutdown, monkeypatch):
+    monkeypatch.setitem(ratelimit.limiter.limits, "api", (1e6, 1e6))
+    db = session.UserSession(USER_ID)
+    repo.create_user(db, USER_ID, "Test", None, "test", None)
+    repo.add_service_mapping(db, USER_ID, "shop", repo.add_category(db, USER_ID, "Shops").id)
+    db.close()
+    token = jwt.encode({"sub": str(USER_ID)}, JWT_SECRET, algorithm=JWT_ALGORITHM)
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test",
+                                     headers={"Authorization": f"Bearer {token}"}) as client:
+            import_task = asyncio.create_task(pipeline.run_import(USER_ID, big_csv, "csv"))
+            latencies = []
+            while not import_task.done():
+                started = time.perf_counter()
+                response = await client.get("/api/categories")
+                latencies.append(time.perf_counter() - started)
+                assert response.status_code == 200
+                await asyncio.sleep(0.01)
+            return await import_task, latencies
+
+    counts, latencies = asyncio.run(run())
+    assert counts["imported"] == ROWS
+    assert len(latencies) >= 20, "the import finished before the API was exercised"
+    p95 = statistics.quantiles(latencies, n=20)[-1]
+    assert p95 < MAX_P95_SECONDS, f"p95 {p95:.3f}s over {len(latencies)} requests"
+    assert max(latencies) < MAX_SECONDS, f"max {max(latencies):.3f}s"
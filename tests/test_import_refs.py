@@ -0,0 +1,113 @@
+"""One dedupe key for imports: (user_id, import_ref), whatever the row's date and
+whichever path (direct import, staging, backup restore) the row takes."""
+import gzip
+import io
+from datetime import date
+
+import orjson
+import pytest
+from sqlalchemy import text
+
+from app.db import backup, repo, session
+from app.db.models import Expense, ImportRef, StagedImportRow, User
+from app.imports.pipeline import new_counts, store_batch
+
+USER_ID = 1
+MARCH, APRIL = date(2025, 3, 3), date(2025, 4, 4)
+
+
+@pytest.fixture(params=["sqlite", "postgres"])
+def engine(request, tmp_path):
+    if request.param == "sqlite":
+        engine = session._create_engine(f"sqlite:///{tmp_path / 'refs.db'}")
+    else:
+        engine = request.getfixturevalue("pg_engine")
+    session.init_schema(engine)
+    db = session.SessionLocal(bind=engine)
+    db.add(User(id=USER_ID, username="test"))
+    db.commit()
+    db.close()
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    db = session.SessionLocal(bind=engine)
+    yield db
+    db.close()
+
+
+def expenses(db) -> list[tuple]:
+    return db.query(Expense.import_ref, Expense.expense_date, Expense.amount).order_by(Expense.id).all()
+
+
+def test_same_ref_on_another_date_is_a_duplicate(db):
+    category_id = repo.add_category(db, USER_ID, "taxi").id
+    counts = new_counts()
+    store_batch(db, USER_ID, [("ref-1", MARCH, "Taxi", 10), ("ref-1", APRIL, "Taxi", 10)], [("taxi", category_id)], counts)
+    store_batch(db, USER_ID, [("ref-1", APRIL, "Taxi", 10)], [("taxi", category_id)], counts)
+    assert (counts["imported"], counts["duplicates"]) == (1, 2)
+    assert expenses(db) == [("ref-1", MARCH, 10)]
+    assert repo.get_month_spend(db, USER_ID, APRIL) == 0
+
+
+def test_imported_ref_is_not_staged_again(db):
+    category_id = repo.add_category(db, USER_ID, "taxi").id
+    counts = new_counts()
+    store_batch(db, USER_ID, [("ref-1", MARCH, "Taxi", 10)], [("taxi", category_id)], counts)
+    store_batch(db, USER_ID, [("ref-1", APRIL, "Unknown shop", 10)], [("taxi", category_id)], counts)
+    assert counts["duplicates"] == 1
+    assert db.query(StagedImportRow).count() == 0
+
+
+def test_staged_row_whose_ref_was_imported_meanwhile_is_not_promoted(db):
+    taxi = repo.add_category(db, USER_ID, "taxi").id
+    shop = repo.add_category(db, USER_ID, "shop").id
+    counts = new_counts()
+    store_batch(db, USER_ID, [("ref-1", MARCH, "Corner shop", 10), ("ref-2", MARCH, "Corner shop", 20)], [], counts)
+    store_batch(db, USER_ID, [("ref-1", APRIL, "Taxi", 10)], [("taxi", taxi)], counts)
+
+    repo.add_service_mapping(db, USER_ID, "corner", shop)
+    assert expenses(db) == [("ref-1", APRIL, 10), ("ref-2", MARCH, 20)]
+    assert repo.get_month_spend(db, USER_ID, MARCH) == 20
+    assert db.query(StagedImportRow).count() == 0
+
+
+def test_deleting_an_imported_expense_frees_its_ref(db):
+    category_id = repo.add_category(db, USER_ID, "taxi").id
+    store_batch(db, USER_ID, [("ref-1", MARCH, "Taxi", 10)], [("taxi", category_id)], new_counts())
+    repo.delete_expense(db, db.query(Expense).one())
+    counts = new_counts()
+    store_batch(db, USER_ID, [("ref-1", APRIL, "Taxi", 10)], [("taxi", category_id)], counts)
+    assert counts["imported"] == 1
+    assert expenses(db) == [("ref-1", APRIL, 10)]
+
+
+def archive(db) -> bytes:
+    """What backup.dump() streams, built from the test's session."""
+    body = b"".join(orjson.dumps(record) + b"\n" for record in backup._records(db, USER_ID))
+    return gzip.compress(body)
+
+
+def test_restore_skips_refs_the_account_already_has(db):
+    category_id = repo.add_category(db, USER_ID, "taxi").id
+    store_batch(db, USER_ID, [("ref-1", MARCH, "Taxi", 10)], [("taxi", category_id)], new_counts())
+    data = archive(db)
+    assert backup.restore(db, USER_ID, io.BytesIO(data))["expenses"] == 0
+    assert expenses(db) == [("ref-1", MARCH, 10)]
+
+    assert backup.restore(db, USER_ID, io.BytesIO(data), replace=True)["expenses"] == 1
+    assert expenses(db) == [("ref-1", MARCH, 10)]
+    assert db.query(ImportRef).count() == 1
+
+
+def test_existing_expense_refs_are_claimed_when_the_table_is_added(engine, db):
+    category_id = repo.add_category(db, USER_ID, "taxi").id
+    store_batch(db, USER_ID, [("ref-1", MARCH, "Taxi", 10)], [("taxi", category_id)], new_counts())
+    db.execute(text("DROP TABLE import_refs"))
+    db.commit()
+    session.init_schema(engine)
+    counts = new_counts()
+    store_batch(db, USER_ID, [("ref-1", APRIL, "Taxi", 10)], [("taxi", category_id)], counts)
+    assert counts["duplicates"] == 1
@@ -0,0 +1,91 @@
+"""The Postgres partitioning DDL in app.db.partitions, run against a real server
+(skipped without TEST_POSTGRES_URL, see conftest.py)."""
+from datetime import date
+
+from sqlalchemy import text
+
+from app.db import partitions, repo, session
+from app.db.models import Base, Expense, User
+
+THIS_YEAR = date.today().year
+
+
+def placement(engine) -> list[tuple[str, int]]:
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT tableoid::regclass::text, amount FROM expenses ORDER BY amount")).all()
+
+
+def seed_user(engine) -> int:
+    db = session.SessionLocal(bind=engine)
+    db.add(User(id=1, username="test"))
+    db.commit()
+    category_id = repo.add_category(db, 1, "food").id
+    db.close()
+    return category_id
+
+
+def test_install_creates_yearly_partitions_and_is_idempotent(pg_engine):
+    session.init_schema(pg_engine)
+    session.init_schema(pg_engine)
+    with pg_engine.connect() as conn:
+        assert partitions._pg_is_partitioned(conn) is True
+        assert partitions._pg_partition_years(conn) == [THIS_YEAR - 1, THIS_YEAR, THIS_YEAR + 1]
+        default = conn.execute(text(
+            "SELECT pg_get_expr(c.relpartbound, c.oid) FROM pg_class c WHERE c.relname = :name"
+        ), {"name": partitions.DEFAULT_PARTITION}).scalar()
+    assert default == "DEFAULT"
+
+
+def test_rows_in_default_get_a_partition_of_their_own(pg_engine):
+    session.init_schema(pg_engine)
+    category_id = seed_user(pg_engine)
+    db = session.SessionLocal(bind=pg_engine)
+    repo.create_expenses(db, 1, [(category_id, 1)], date(2015, 6, 1))
+    repo.create_expenses(db, 1, [(category_id, 2)], date(THIS_YEAR, 1, 2))
+    db.close()
+    assert placement(pg_engine) == [(partitions.DEFAULT_PARTITION, 1), (partitions.partition_name(THIS_YEAR), 2)]
+
+    session.init_schema(pg_engine)
+    assert placement(pg_engine) == [(partitions.partition_name(2015), 1), (partitions.partition_name(THIS_YEAR), 2)]
+
+
+def test_queries_bounded_on_expense_date_are_pruned(pg_engine):
+    session.init_schema(pg_engine)
+    with pg_engine.connect() as conn:
+        plan = "\n".join(conn.execute(text(
+            "EXPLAIN SELECT * FROM expenses WHERE user_id = 1 "
+            "AND expense_date >= :start AND expense_date < :end"
+        ), {"start": date(THIS_YEAR, 3, 1), "end": date(THIS_YEAR, 4, 1)}).scalars())
+    assert partitions.partition_name(THIS_YEAR) in plan
+    assert partitions.partition_name(THIS_YEAR - 1) not in plan
+    assert partitions.DEFAULT_PARTITION not in plan
+
+
+def test_compact_rewrites_only_old_years(pg_engine):
+    session.init_schema(pg_engine)
+    assert partitions.compact(pg_engine, THIS_YEAR) == [partitions.partition_name(THIS_YEAR - 1)]
+
+
+def test_convert_partitions_an_existing_table_with_its_rows(pg_engine):
+    Base.metadata.create_all(pg_engine)  # `expenses` as a plain table, as before partitioning
+    category_id = seed_user(pg_engine)
+    db = session.SessionLocal(bind=pg_engine)
+    for year in (2019, THIS_YEAR):
+        db.add(Expense(user_id=1, category_id=category_id, amount=year, expense_date=date(year, 3, 1),
+                       note="", import_ref=f"ref-{year}"))
+    db.commit()
+    db.close()
+
+    assert partitions.convert(pg_engine) is True
+    session.init_schema(pg_engine)
+    assert partitions.convert(pg_engine) is False
+    assert placement(pg_engine) == [(partitions.partition_name(2019), 2019),
+                                    (partitions.partition_name(THIS_YEAR), THIS_YEAR)]
+    db = session.SessionLocal(bind=pg_engine)
+    assert db.query(Expense.note).distinct().all() == [("",)]
+    # The id sequence carries on after the copied rows.
+    assert repo.create_expense(db, 1, category_id, 5, date(THIS_YEAR, 1, 2)).id == 3
+    db.close()
+    with pg_engine.connect() as conn:
+        indexes = set(conn.execute(text("SELECT indexname FROM pg_indexes WHERE tablename = 'expenses'")).scalars())
+    assert {index.name for index in Base.metadata.tables["expenses"].indexes} <= indexes
@@ -0,0 +1,74 @@
+"""shards.rebalance from 3 SQLite shards to 2: every user ends up on its new shard
+with all of its rows, categories keep their order and expenses their category."""
+from datetime import date
+
+import pytest
+from sqlalchemy import func, select
+
+from app.db import repo, session, shards
+from app.db.models import Category, Expense, ImportRef, ServiceMapping, User
+
+USERS = range(1, 13)
+# Not alphabetical, so the order can only survive through the ids.
+CATEGORY_NAMES = ["Rent", "Food", "Taxi", "Books", "Gym"]
+
+
+@pytest.fixture
+def layout(tmp_path, monkeypatch):
+    """Users written with DATABASE_SHARDS=3; yields the 2-shard engines rebalance targets."""
+    url = f"sqlite:///{tmp_path / 'fintrack.db'}"
+    monkeypatch.setattr(shards, "DB_URL", url)
+    old = [session._create_engine(u) for u in session.shard_urls(url, 3)]
+    for engine in old:
+        session.init_schema(engine)
+    for user_id in USERS:
+        db = session.SessionLocal(bind=old[session.shard_index(user_id, 3)])
+        repo.create_user(db, user_id, "Test", None, f"user{user_id}", None)
+        category_ids = [repo.add_category(db, user_id, f"{name} {user_id}").id for name in CATEGORY_NAMES]
+        repo.add_service_mapping(db, user_id, "uber", category_ids[2])
+        for n, category_id in enumerate(category_ids):
+            repo.create_expense(db, user_id, category_id, 100 * (n + 1), date(2025, 4, n + 1))
+        repo.claim_import_ref(db, user_id, f"bank-{user_id}")
+        db.commit()
+        db.close()
+    for engine in old:
+        engine.dispose()
+    new = [session._create_engine(u) for u in session.shard_urls(url, 2)]
+    yield new
+    for engine in new:
+        engine.dispose()
+
+
+def test_rebalance_moves_users_with_their_rows_in_order(layout):
+    expected_moves = sum(session.shard_index(u, 3) != session.shard_index(u, 2) for u in USERS)
+    assert expected_moves > 0
+    assert shards.rebalance(3, 2) == expected_moves
+    assert shards.rebalance(3, 2) == 0  # safe to re-run
+
+    for user_id in USERS:
+        for index, engine in enumerate(layout):
+            db = session.SessionLocal(bind=engine)
+            present = db.get(User, user_id) is not None
+            assert present == (index == session.shard_index(user_id, 2))
+            if present:
+                names = db.scalars(
+                    select(Category.name).where(Category.user_id == user_id).order_by(Category.id)
+                ).all()
+                assert names == [f"{name} {user_id}" for name in CATEGORY_NAMES]
+                spent = db.execute(
+                    select(Category.name, Expense.amount).join(Category, Expense.category_id == Category.id)
+                    .where(Expense.user_id == user_id).order_by(Expense.amount)
+                ).all()
+                assert spent == [(f"{name} {user_id}", 100 * (n + 1)) for n, name in enumerate(CATEGORY_NAMES)]
+                mapping = db.scalars(select(ServiceMapping).where(ServiceMapping.user_id == user_id)).one()
+                assert mapping.category.name == f"Taxi {user_id}"
+                assert repo.import_ref_exists(db, user_id, f"bank-{user_id}")
+                assert repo.get_month_spend(db, user_id, date(2025, 4, 1)) == 1500
+            db.close()
+
+    # Nothing was left behind in the old third shard.
+    leftover = session._create_engine(session.shard_urls(shards.DB_URL, 3)[2])
+    with leftover.connect() as conn:
+        for table in (User, Category, Expense, ImportRef):
+            assert conn.execute(select(func.count()).select_from(table)).scalar() == 0
+    leftover.dispose()